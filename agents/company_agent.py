@@ -1,18 +1,38 @@
 import os
+import sys
 import json
+import time
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 import random
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.mailbox import MailStore, COMPANY, VTUBER
+from utils.checkpoint import JournaledDict
+from configs.settings import COMPANY_REVIEW_WORKERS, SHOOT_PROBABILITY
+from behavior.shoot_scheduler import ShootScheduler
+from ai.prompt_templates import TemplateRegistry
 
 
 class CompanyAgent:
-    def __init__(self, mailbox_company, mailbox_personal, game_time_system, approved_store_path=None, review_mode="A"):
+    def __init__(self, mailbox_company, mailbox_personal, game_time_system, approved_store_path=None, review_mode="A", seed=None,
+                 mailbox=None, llm=None, workers=COMPANY_REVIEW_WORKERS, shoot_scheduler=None,
+                 shoot_probability=SHOOT_PROBABILITY):
         """
         :param mailbox_company:公司邮箱目录（收到的邮件）
         :param mailbox_personal:主播邮箱目录（发送给主播）
         :param game_time_system:GameTime实例，获取虚拟时间
         :param approved_store_path:已经通过的企划的本地存储文件
         :param review_mode:A=宽松审核，B=严格审核
+        :param seed:随机种子（是否安排拍摄），相同种子可复现同一次运行
+        :param mailbox:MailStore实例，默认使用公司邮箱上级目录中的 mailbox.sqlite3（首次打开时导入旧邮件文件）
+        :param llm:严格审核B使用的llm（ask_json），默认QwenLLM
+        :param workers:并行审核的线程数
+        :param shoot_scheduler:ShootScheduler实例（含日历），默认使用 configs/settings.py 的拍摄参数
+        :param shoot_probability:某天决定安排拍摄的概率
         """
         self.mailbox_company = Path(mailbox_company)
         self.mailbox_personal = Path(mailbox_personal)
@@ -20,48 +40,78 @@ class CompanyAgent:
 
         self.mailbox_company.mkdir(parents=True, exist_ok=True)
         self.mailbox_personal.mkdir(parents=True, exist_ok=True)
+        self.mailbox = mailbox or MailStore.open(self.mailbox_company.parent)
+        # 已读到的最后一封公司邮件 id
+        self.cursor = 0
 
         self.review_mode = review_mode
+        self.workers = workers
+        self.llm = llm
+        if review_mode == "B" and self.llm is None:
+            from ai.llm_client import QwenLLM
+            self.llm = QwenLLM()
+        self.last_batch = {}
+        self.shoot_scheduler = shoot_scheduler or ShootScheduler()
+        self.calendar = self.shoot_scheduler.calendar
+        self.shoot_probability = shoot_probability
+        self.rng = random.Random(seed)
         # 保存已经通过审核但未安排拍摄的企划
-        self.approved_projects = {}
-        # 可持久化
+        # 可持久化：快照 + 追加日志，每次通过/删除只追加一行，定期压缩
         self.approved_store_path = approved_store_path
-        if approved_store_path and Path(approved_store_path).exists():
-            try:
-                self.approved_projects = json.load(open(approved_store_path, 'r', encoding='utf-8'))
-            except json.JSONDecodeError:
-                print("[CompanyAgent] approved_projects 文件读取失败或为空，初始化为空字典。")
-                self.approved_projects = {}
+        if approved_store_path:
+            self.approved_projects = JournaledDict(approved_store_path)
+        else:
+            self.approved_projects = {}
 
     # ====================================================
     # 邮件读取
     # ====================================================
     def load_company_mail(self):
+        """
+        返回 [(mail_id, content)]，只读取游标之后的未读邮件
+        """
         mails = []
-        for file in self.mailbox_company.glob("*.json"):
-            try:
-                with open(file, 'r', encoding='utf-8') as f:
-                    content = json.load(f)
-                mails.append((file, content))
-            except:
-                pass
+        for mail in self.mailbox.unread_since(COMPANY, self.cursor):
+            content = mail["body"]
+            if not isinstance(content, dict):
+                # 纯文本邮件
+                content = {"content": content}
+            content.setdefault("type", mail["type"])
+            mails.append((mail["id"], content))
+            self.cursor = mail["id"]
         return mails
 
     # ====================================================
     # 邮件发送
     # ====================================================
-    def send_mail_to_vtuber(self, subject, mail_type, payload):
+    def build_mail_to_vtuber(self, subject, mail_type, payload, game_date=None):
+        """
+        :param game_date:邮件所属的游戏日期（拍摄安排为拍摄当天），默认当天
+        """
         mail = {
             "timestamp": self.game_time_system.now().strftime("%Y-%m-%d %H:%M:%S"),
             "subject": subject,
             "type": mail_type,
             "data": payload
         }
+        return {
+            "recipient": VTUBER,
+            "body": mail,
+            "mail_type": mail_type,
+            "subject": subject,
+            "sender": "company",
+            "timestamp": mail["timestamp"],
+            "game_date": game_date,
+        }
 
-        virtual_dt = self.game_time_system.now()
-        filename = f"mail_{virtual_dt.strftime('%Y%m%d_%H%M%S')}_{random.randint(100, 999)}.json"
-        with open(self.mailbox_personal / filename, 'w', encoding='utf-8') as f:
-            json.dump(mail, f, ensure_ascii=False, indent=2)
+    def send_mail_to_vtuber(self, subject, mail_type, payload, game_date=None):
+        self.mailbox.send(**self.build_mail_to_vtuber(subject, mail_type, payload, game_date))
+
+    def send_mails_to_vtuber(self, mails):
+        """
+        批量发送（build_mail_to_vtuber 的结果），一个事务写入
+        """
+        return self.mailbox.send_many(mails)
 
     # ====================================================
     # 企划审核
@@ -95,40 +145,132 @@ class CompanyAgent:
 
         return {"approved": True, "reason": "宽松审核已通过"}
 
+    def review_project_strict(self, project_json):
+        """
+        严格审核规则B：
+        - 先通过宽松审核A
+        - 再由llm按 configs/prompt_templates/project_review.txt 审核
+        """
+        review = self.review_project(project_json)
+        if not review["approved"]:
+            return review
+
+        data = project_json.get("project", project_json)
+        # 审核规则是固定前缀，可命中llm的上下文缓存；企划JSON放在最后
+        project_text = json.dumps(
+            {"project_name": data["project_name"], "project_content": data["project_content"]},
+            ensure_ascii=False, indent=2)
+        prefix, p = TemplateRegistry.shared().render_split(
+            "project_review.txt", ("project_json",), project_json=project_text)
+
+        response = self.llm.ask_json(p, schema="review", prefix=prefix)
+        if not isinstance(response, dict) or not isinstance(response.get("approved"), bool):
+            raise ValueError(f"unexpected review response: {response}")
+        return {
+            "approved": response["approved"],
+            "reason": response.get("reason") or ("严格审核已通过" if response["approved"] else "严格审核未通过"),
+        }
+
+    def review_batch(self, mails):
+        """
+        一次审核一批企划邮件，B模式把llm审核分发到线程池
+        返回与 mails 对应的审核结果，审核出错的为 None（邮件留到下次再审）
+        """
+        review = self.review_project_strict if self.review_mode == "B" else self.review_project
+
+        def safe_review(mail):
+            try:
+                return review(mail)
+            except (AttributeError, TypeError) as e:
+                # 字段类型不对（例如企划名称不是字符串）
+                return {"approved": False, "reason": f"企划格式错误: {e}"}
+            except Exception as e:
+                print(f"[CompanyAgent] 审核失败，下次重试：{e!r}")
+                return None
+
+        if self.review_mode != "B" or self.workers <= 1 or len(mails) <= 1:
+            return [safe_review(mail) for mail in mails]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(safe_review, mails))
+
     # ====================================================
     # 每日流程
     # ====================================================
-    def daily_update(self):
+    def daily_update(self, schedule=None, day_start=None):
         """
         每天执行一次：
         1.审核企划案
         2.处理广告邮件
         3.安排拍摄（如果需要）
+        整批处理：一次审核、一次批量发信、一次持久化、一次确认
+        :param schedule:主播已排好的日程（normalize 之后的任务），拍摄前先登记到日历，拍摄不会与之冲突
+        :param day_start:schedule 所在游戏日（date 或 08:00 的 datetime），默认明天（最早可安排拍摄的一天）
         """
-
+        t0 = time.perf_counter()
         mails = self.load_company_mail()
 
-        for filepath, mail in mails:
-            mail_type = mail.get("type")
-            if mail_type == "project":
-                self._process_project_mail(filepath, mail)
-
-            elif mail_type == "advertisement":
-                self._process_advertisement_mail(filepath, mail)
-
-            # 处理完删除公司邮箱邮件
-            filepath.unlink()
-
-        # 安排拍摄，如果有已通过的企划
+        projects = [(mail_id, mail) for mail_id, mail in mails if mail.get("type") == "project"]
+        reviews = self.review_batch([mail for _, mail in projects])
+
+        outgoing = []
+        handled = []
+        retry = []
+        approved = 0
+        with self._approved_batch():
+            for (mail_id, mail), review in zip(projects, reviews):
+                if review is None:
+                    retry.append(mail_id)
+                    continue
+                outgoing.append(self._process_project_mail(mail_id, mail, review))
+                approved += review["approved"]
+                handled.append(mail_id)
+
+        for mail_id, mail in mails:
+            if mail.get("type") == "advertisement":
+                outgoing.append(self._process_advertisement_mail(mail_id, mail))
+            if mail.get("type") != "project":
+                handled.append(mail_id)
+
+        self.send_mails_to_vtuber(outgoing)
+        # 保存持久化（整批只 fsync 一次）
+        self._save_approved_projects()
+        # 处理完的公司邮件一次性标记为已处理
+        self.mailbox.ack(handled)
+        if retry:
+            # 审核出错的邮件下次从它们开始重新读取
+            self.cursor = min(retry) - 1
+
+        seconds = time.perf_counter() - t0
+        self.last_batch = {
+            "mails": len(mails),
+            "projects": len(projects),
+            "approved": approved,
+            "retry": len(retry),
+            "sent": len(outgoing),
+            "seconds": seconds,
+            "mails_per_second": len(mails) / seconds if seconds > 0 else 0.0,
+        }
+        if mails:
+            print(f"[CompanyAgent] 本批处理 {len(mails)} 封邮件，{self.last_batch['mails_per_second']:.1f} 封/秒，"
+                  f"通过 {approved}，重试 {len(retry)}")
+
+        # 先登记主播日程，再安排拍摄（如果有已通过的企划）
+        if schedule:
+            if day_start is None:
+                day_start = self.calendar.day_of(self.game_time_system.now()) + timedelta(days=1)
+            self.block_schedule(schedule, day_start)
         self._schedule_shooting()
+        return self.last_batch
 
     # ====================================================
     # 处理企划案
     # ====================================================
-    def _process_project_mail(self, filepath, mail):
-        project_id = mail.get("project_id")
+    def _process_project_mail(self, mail_id, mail, review):
+        """
+        记录审核结果，返回发给主播的审核通知（由 daily_update 批量发送）
+        """
+        project_id = mail.get("project_id") or f"mail-{mail_id}"
 
-        review = self.review_project(mail)
         project_name = mail.get('project', {}).get('project_name', '未命名企划')
 
         payload = {
@@ -142,7 +284,7 @@ class CompanyAgent:
             self.approved_projects[project_id] = mail
             print(f"[CompanyAgent] 企划通过：{project_id}")
 
-            self.send_mail_to_vtuber(
+            return self.build_mail_to_vtuber(
                 subject=f"【企划审核通过】{project_name}",
                 mail_type="project_review",
                 payload=payload
@@ -154,19 +296,16 @@ class CompanyAgent:
             # 如果希望主播收到通知（更友好），则发送邮件。这里选择发送通知（更实用）。
             print(f"[CompanyAgent]企划未通过：{project_id}")
 
-            self.send_mail_to_vtuber(
+            return self.build_mail_to_vtuber(
                 subject=f"【企划审核未通过】{project_name}",
                 mail_type="project_review",
                 payload=payload
             )
 
-        # 保存持久化
-        self._save_approved_projects()
-
     # ====================================================
     # 处理广告邮件
     # ====================================================
-    def _process_advertisement_mail(self, filepath, mail):
+    def _process_advertisement_mail(self, mail_id, mail):
         print("[CompanyAgent] 收到广告，转发给主播。")
 
         # 假设广告邮件中可能包含以下关键信息（如果广告商Agent提供的话）
@@ -183,7 +322,7 @@ class CompanyAgent:
             "raw_content": mail.get("content", "")  # 保留原始文本内容供参考
         }
 
-        self.send_mail_to_vtuber(
+        return self.build_mail_to_vtuber(
             subject=subject,
             mail_type="advertisement",
             payload=payload
@@ -208,98 +347,78 @@ class CompanyAgent:
             "preferred_end": preferred_end
         }
 
+    def _approved_batch(self):
+        if isinstance(self.approved_projects, JournaledDict):
+            return self.approved_projects.batch()
+        return contextlib.nullcontext()
+
     def _save_approved_projects(self):
-        if not self.approved_store_path:
+        """
+        每次修改已写入日志，这里只确保落盘（批处理结束时调用）
+        """
+        if not isinstance(self.approved_projects, JournaledDict):
             return
         try:
-            with open(self.approved_store_path, "w", encoding="utf-8") as f:
-                json.dump(self.approved_projects, f, ensure_ascii=False, indent=2)
-        except Exception as e:
+            self.approved_projects.sync()
+        except OSError as e:
             print(f"[CompanyAgent] 保存 approved_projects 失败：{e}")
 
     # ====================================================
     # 安排拍摄
     # ====================================================
 
+    def block_schedule(self, tasks, day_start):
+        """
+        把主播某天的日程（normalize 之后的任务）登记到日历，拍摄不会与之冲突
+        :param day_start:该游戏日（date）或其 08:00 的 datetime
+        """
+        return self.shoot_scheduler.block_schedule(tasks, day_start)
+
     def _schedule_shooting(self):
+        """
+        一次为所有已通过企划排期：优先满足偏好时间，避开主播日程和其他拍摄
+        排不进去的企划保留到下次决策
+        """
         if not self.approved_projects:
             print("[CompanyAgent] 无已通过企划，无需安排拍摄。")
-            return
+            return []
 
-        if random.random() < 0.5:
+        if self.rng.random() >= self.shoot_probability:
             print("[CompanyAgent] 今天决定不安排拍摄任务，将企划保留至下次决策。")
-            return
-
-        project_id, project_data = next(iter(self.approved_projects.items()))
-        info = self._extract_project_info(project_data)
-
-        current_dt = self.game_time_system.now()
-        shoot_dt = current_dt + timedelta(days=1)
-        shoot_date = shoot_dt.date()
-
-        def parse_time_on_shoot_date(s, fallback_date):
-            if not s or not s.strip:
-                return None
-            try:
-                if len(s.strip()) <= 5 and ":" in s:  # "HH:MM"
-                    hh, mm = map(int, s.strip().split(":"))
-                    return datetime.combine(fallback_date, datetime.min.time()).replace(hour=hh, minute=mm)
-                else:
-                    # 尝试解析为完整格式
-                    return datetime.strptime(s, "%Y-%m-%d %H:%M")
-            except Exception:
-                pass
-            return None
-
-        preferred_start_dt = parse_time_on_shoot_date(info["preferred_start"], shoot_date)
-        preferred_end_dt = parse_time_on_shoot_date(info["preferred_end"], shoot_date)
-
-        # 默认安排时间：虚拟的明天 10:00 - 12:00
-        default_start = datetime.combine(shoot_date, datetime.min.time()).replace(hour=10, minute=0)
-        default_end = default_start + timedelta(hours=2)
-
-        if preferred_start_dt and not preferred_end_dt:
-            # 如果只有开始时间，结束时间默认 +2 小时
-            preferred_end_dt = preferred_start_dt + timedelta(hours=2)
-
-        start_dt = preferred_start_dt or default_start
-        end_dt = preferred_end_dt or (start_dt + timedelta(hours=2) if not preferred_start_dt else preferred_end_dt)
-
-        # 确保 end_dt 晚于 start_dt
-        if end_dt <= start_dt:
-            end_dt = start_dt + timedelta(hours=2)
-
-        subject = f"【拍攝安排】企劃：{info['project_name']}"
-
-        # 结构化拍摄任务的 payload
-        payload = {
-            "category": "shoot",
-            "project_id": info["project_id"] or project_id,
-            "project_name": info["project_name"],
-            "start_time": start_dt.strftime("%Y-%m-%d %H:%M"),
-            "end_time": end_dt.strftime("%Y-%m-%d %H:%M"),
-            "content": info["description"] or f"公司已安排拍攝企劃：{info['project_name']}，請準備相關素材。"
-        }
-
-        self.send_mail_to_vtuber(
-            subject=subject,
-            mail_type="shoot_schedule",  # 使用更具体的类型
-            payload=payload
-        )
-        print(f"[CompanyAgent] 已安排拍攝：{info['project_name']} ({payload['start_time']} - {payload['end_time']})")
-
-        try:
-            del self.approved_projects[project_id]
-        except KeyError:
-            # 也可能 project_id 为 None 或不同键，尝试根据 project_name 找到并删除
-            to_delete = None
-            for k, v in list(self.approved_projects.items()):
-                pd = v.get("project", v) if isinstance(v, dict) else v
-                name = pd.get("project_name") or pd.get("title") or pd.get("name")
-                if name == info["project_name"]:
-                    to_delete = k
-                    break
-            if to_delete:
-                del self.approved_projects[to_delete]
+            return []
+
+        # 最早从明天开始安排
+        first_day = self.calendar.day_of(self.game_time_system.now()) + timedelta(days=1)
+        self.calendar.drop_before(first_day - timedelta(days=1))
+        projects = [(project_id, self._extract_project_info(project_data))
+                    for project_id, project_data in self.approved_projects.items()]
+        booked, unplaced = self.shoot_scheduler.schedule(projects, first_day)
+
+        outgoing = []
+        for project_id, info, start_dt, end_dt in booked:
+            # 结构化拍摄任务的 payload
+            payload = {
+                "category": "shoot",
+                "project_id": info["project_id"] or project_id,
+                "project_name": info["project_name"],
+                "start_time": start_dt.strftime("%Y-%m-%d %H:%M"),
+                "end_time": end_dt.strftime("%Y-%m-%d %H:%M"),
+                "content": info["description"] or f"公司已安排拍攝企劃：{info['project_name']}，請準備相關素材。"
+            }
+            outgoing.append(self.build_mail_to_vtuber(
+                subject=f"【拍攝安排】企劃：{info['project_name']}",
+                mail_type="shoot_schedule",  # 使用更具体的类型
+                payload=payload,
+                game_date=self.calendar.day_of(start_dt).strftime("%Y-%m-%d")
+            ))
+            print(f"[CompanyAgent] 已安排拍攝：{info['project_name']} ({payload['start_time']} - {payload['end_time']})")
+
+        self.send_mails_to_vtuber(outgoing)
+        with self._approved_batch():
+            for project_id, _, _, _ in booked:
+                del self.approved_projects[project_id]
         # 保存
         self._save_approved_projects()
+        if unplaced:
+            print(f"[CompanyAgent] {len(unplaced)} 个企划暂时排不进日程，保留至下次决策。")
+        return booked
@@ -0,0 +1,178 @@
+import os
+import sys
+import time
+import copy
+import contextlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from agents.vtuber_agent import VtuberAgent
+from ai.async_pool import HttpPool
+from behavior.scheduler import TickTimer
+from configs.persona_config import persona as default_persona
+from utils.game_time import GameTime
+from utils.unity_bridge import UnityBridge, NullUnityBridge
+
+
+class FleetRunner:
+    """
+    host many VtuberAgent instances in one process
+    - every agent has its own persona, data root, GameTime and Unity endpoint
+    - all ticks run on one clock thread, task handlers share the AsyncRuntime loop
+    - llm traffic shares HttpPool: one concurrency limit + optional global rate limit
+    - reports per-agent tick latency and aggregate throughput
+    """
+    def __init__(self, specs, tick_interval=1.0, rate_limit=None, llm=None, gm=None, realtime=True,
+                 checkpoint=True):
+        """
+        :param specs: list of dicts, keys:
+            name, persona, root_path, port (None = headless sink), start (datetime), speed_ratio, seed
+        :param rate_limit: llm requests per second shared by the whole fleet
+        :param llm/gm: shared backends (e.g. OfflineLLM), default one QwenLLM/QwenGM per agent
+        :param checkpoint: crash-safe checkpoints in every agent's data root
+        """
+        if rate_limit:
+            HttpPool.get().set_rate_limit(rate_limit)
+
+        self.timer = TickTimer(tick_interval)
+        self.agents = {}
+        self.tick_latency = {}
+        for spec in specs:
+            name = spec["name"]
+            root_path = Path(spec["root_path"])
+            (root_path / "data").mkdir(parents=True, exist_ok=True)
+
+            game_time = GameTime(speed_ratio=spec.get("speed_ratio", 1), root_dir=root_path)
+            if spec.get("start"):
+                game_time.game_datetime = spec["start"]
+
+            port = spec.get("port")
+            unity = UnityBridge(port=port) if port else NullUnityBridge()
+
+            self.agents[name] = VtuberAgent(
+                tick_interval=tick_interval,
+                game_time=game_time,
+                unity=unity,
+                llm=llm,
+                gm=gm,
+                root_path=root_path,
+                realtime=realtime,
+                persona=spec.get("persona"),
+                checkpoint=checkpoint,
+                seed=spec.get("seed"),
+            )
+            self.tick_latency[name] = deque(maxlen=1000)
+
+    @classmethod
+    def from_count(cls, count, root_dir, base_port=None, **kwargs):
+        """
+        build `count` agents from the default persona, agent i lives in root_dir/agent_i
+        and listens on base_port + i (headless sinks when base_port is None)
+        """
+        specs = []
+        for i in range(count):
+            persona = copy.deepcopy(default_persona)
+            persona["name"] = f"{default_persona['name']}_{i}"
+            specs.append({
+                "name": persona["name"],
+                "persona": persona,
+                "root_path": Path(root_dir) / f"agent_{i}",
+                "port": base_port + i if base_port else None,
+                "start": datetime(2077, 1, 1, 8, 0, 0),
+                "seed": i,
+            })
+        return cls(specs, **kwargs)
+
+    def tick_all(self):
+        for name, agent in self.agents.items():
+            t0 = time.perf_counter()
+            agent.tick()
+            self.tick_latency[name].append(time.perf_counter() - t0)
+
+    def run(self, ticks=None):
+        """
+        live mode: tick every agent at a fixed cadence, ticks=None runs forever
+        """
+        print(f"\n[Fleet] Running {len(self.agents)} agents...")
+        t0 = time.perf_counter()
+        count = 0
+        while ticks is None or count < ticks:
+            self.tick_all()
+            self.timer.wait()
+            count += 1
+            if count % 60 == 0:
+                print(f"[Fleet] {self.report(time.perf_counter() - t0)}")
+        return self.report(time.perf_counter() - t0)
+
+    def fast_forward(self, days, workers=8, quiet=True):
+        """
+        headless mode: every agent fast-forwards `days` game days, agents run on a worker pool
+        """
+        def one(agent):
+            until = agent.game_time.now() + timedelta(days=days)
+            t0 = time.perf_counter()
+            events = agent.fast_forward(until)
+            return events, time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            if quiet:
+                devnull = stack.enter_context(open(os.devnull, "w"))
+                stack.enter_context(contextlib.redirect_stdout(devnull))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = dict(zip(self.agents, pool.map(one, self.agents.values())))
+        wall = time.perf_counter() - t0
+
+        events = sum(r[0] for r in results.values())
+        report = {
+            "agents": len(self.agents),
+            "simulated_days": days * len(self.agents),
+            "wall_seconds": wall,
+            "agent_days_per_second": days * len(self.agents) / wall if wall > 0 else float("inf"),
+            "events_per_second": events / wall if wall > 0 else float("inf"),
+            "per_agent_seconds": {name: r[1] for name, r in results.items()},
+        }
+        print(f"[Fleet] {report['agents']} agents x {days} day(s) in {wall:.3f}s "
+              f"-> {report['agent_days_per_second']:.1f} agent-days/s")
+        return report
+
+    def report(self, wall):
+        per_agent = {}
+        total_ticks = 0
+        completed = 0
+        for name, samples in self.tick_latency.items():
+            ordered = sorted(samples)
+            total_ticks += len(ordered)
+            completed += self.agents[name].scheduler.completed
+            if not ordered:
+                continue
+            per_agent[name] = {
+                "tick_mean_ms": sum(ordered) / len(ordered) * 1000,
+                "tick_p99_ms": ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))] * 1000,
+                "tick_max_ms": ordered[-1] * 1000,
+                "jobs": self.agents[name].scheduler.stats(),
+            }
+        limiter = HttpPool.get().rate_limiter
+        return {
+            "agents": len(self.agents),
+            "ticks_per_second": total_ticks / wall if wall > 0 else 0.0,
+            "jobs_completed_per_second": completed / wall if wall > 0 else 0.0,
+            "rate_limit_wait_seconds": limiter.waited if limiter else 0.0,
+            "clock": self.timer.stats(),
+            "per_agent": per_agent,
+        }
+
+
+if __name__ == "__main__":
+    import json
+    import tempfile
+    from ai.offline_llm import OfflineLLM, OfflineGM
+
+    fleet = FleetRunner.from_count(24, tempfile.mkdtemp(prefix="vtuber_fleet_"),
+                                   llm=OfflineLLM(), gm=OfflineGM(), realtime=False,
+                                   checkpoint=False)
+    print(json.dumps(fleet.fast_forward(7), indent=2, ensure_ascii=False))
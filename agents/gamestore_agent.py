@@ -9,6 +9,7 @@ sys.path.insert(0, str(project_root))
 
 from data.game_list import game_list
 from ai.llm_client import QwenLLM
+from utils.game_library import GameLibrary
 
 class GamestoreAgent:
     """
@@ -19,7 +20,9 @@ class GamestoreAgent:
     def __init__(self, api_key=None, base_url=None, model=None):
         self.llm = QwenLLM(api_key, base_url, model)
         self.base_game_list = game_list.get("games", [])
-        self.available_games = self.base_game_list.copy()
+        # 游戏库：按规范化标题/ID哈希索引，类型与时段倒排索引，近似重复标题检测
+        self.library = GameLibrary(self.base_game_list)
+        self.today = GameLibrary()
         self.today_games = []
         
         # 游戏库增删记录
@@ -28,6 +31,10 @@ class GamestoreAgent:
             "removed": []
         }
         
+    @property
+    def available_games(self):
+        return self.library.to_list()
+
     def activate(self, vtuber_action="browse_gamestore"):
         """
         只有当主播执行「逛游戏商城」行为时启动
@@ -46,19 +53,20 @@ class GamestoreAgent:
         try:
             # 使用LLM生成新的游戏推荐
             prompt = self._build_recommendation_prompt()
-            response = self.llm.ask_json(prompt)
+            response = self.llm.ask_json(prompt, schema="games")
             
             if response and "games" in response:
-                new_games = response["games"]
-                self.today_games = new_games
+                # 同一批推荐里的近似重复标题只留第一个
+                self.today = GameLibrary(response["games"])
+                self.today_games = self.today.to_list()
                 
                 # 更新可用游戏库（添加新游戏）
-                self._update_game_library(new_games)
+                self._update_game_library(self.today_games)
                 
-                print(f"[GamestoreAgent] 成功生成 {len(new_games)} 个游戏推荐")
+                print(f"[GamestoreAgent] 成功生成 {len(self.today_games)} 个游戏推荐")
                 return {
                     "success": True,
-                    "games": new_games,
+                    "games": self.today_games,
                     "library_changes": self.game_library_changes,
                     "timestamp": datetime.now().isoformat()
                 }
@@ -149,7 +157,8 @@ class GamestoreAgent:
             }
         ]
         
-        self.today_games = fallback_games
+        self.today = GameLibrary(fallback_games)
+        self.today_games = self.today.to_list()
         self._update_game_library(fallback_games)
         
         return {
@@ -167,40 +176,38 @@ class GamestoreAgent:
         # 重置变化记录
         self.game_library_changes = {"added": [], "removed": []}
         
-        # 添加新游戏到可用游戏库
+        # 添加新游戏到可用游戏库，重复（含近似重复标题）的不再添加
+        keep = set()
         for game in new_games:
-            if not self._is_game_in_library(game):
-                self.available_games.append(game)
+            added, existing = self.library.add(game)
+            keep.add(self.library.key(existing))
+            if added:
                 self.game_library_changes["added"].append(game["title"])
+            elif existing["title"] != game["title"]:
+                print(f"[GamestoreAgent] {game['title']} 与库中的 {existing['title']} 重复，不再添加")
         
-        # 随机移除一些旧游戏（模拟游戏库更新）
-        if len(self.available_games) > 10:  # 保持游戏库大小合理
+        # 随机移除一些旧游戏（模拟游戏库更新），今日推荐的游戏不移除
+        if len(self.library) > 10:  # 保持游戏库大小合理
             remove_count = random.randint(1, 3)
-            removed_games = random.sample(
-                [g for g in self.available_games if g not in new_games], 
-                min(remove_count, len(self.available_games) - len(new_games))
-            )
+            removed_games = self.library.sample(remove_count, exclude=keep)
             
             for game in removed_games:
-                self.available_games.remove(game)
+                self.library.remove(game)
                 self.game_library_changes["removed"].append(game["title"])
     
     def _is_game_in_library(self, game):
         """
-        检查游戏是否已在游戏库中
+        检查游戏是否已在游戏库中（ID、规范化标题或近似重复标题）
         """
-        for existing_game in self.available_games:
-            if existing_game["title"] == game["title"]:
-                return True
-        return False
+        return self.library.find_duplicate(game) is not None
     
     def get_current_library(self):
         """
         获取当前可用的游戏库
         """
         return {
-            "total_games": len(self.available_games),
-            "games": self.available_games
+            "total_games": len(self.library),
+            "games": self.library.to_list()
         }
     
     def get_today_recommendations(self):
@@ -214,13 +221,8 @@ class GamestoreAgent:
         处理主播选择游戏的行为
         修改：只能从今日推荐列表中选择游戏
         """
-        selected_game = None
-        
-        # 只从今日推荐列表中搜索
-        for game in self.today_games:
-            if game["title"] == selected_game_title:
-                selected_game = game
-                break
+        # 只从今日推荐列表中查找（规范化标题哈希查找）
+        selected_game = self.today.get(selected_game_title)
         
         if selected_game:
             print(f"[GamestoreAgent] 主播选择了今日推荐游戏: {selected_game_title}")
@@ -0,0 +1,99 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import tempfile
+import contextlib
+from datetime import datetime, timedelta
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from agents.vtuber_agent import VtuberAgent
+from ai.offline_llm import OfflineLLM, OfflineGM
+from utils.clock import ManualClock
+from utils.game_time import GameTime
+from utils.unity_bridge import RecordingUnityBridge
+
+
+class HeadlessSimulation:
+    """
+    fast-forward VtuberAgent without Unity and without waiting for the wall clock
+    - game time jumps straight to the next scheduled event
+    - Unity messages go to a recording sink
+    - llm/gm are pluggable, OfflineLLM/OfflineGM by default (no api cost)
+    - data is written under root_path (a temp dir by default), never into ./data
+    - ManualClock + seeded rng: the same seed replays the same run, see report["digest"]
+    - corrupt: share of malformed OfflineLLM answers, exercises the JSON repair / retry path
+    """
+    def __init__(self, root_path=None, llm=None, gm=None, unity=None,
+                 start=datetime(2077, 1, 1, 8, 0, 0), quiet=True, seed=0, corrupt=0.0):
+        if root_path is None:
+            root_path = tempfile.mkdtemp(prefix="vtuber_sim_")
+        self.root_path = Path(root_path)
+        (self.root_path / "data").mkdir(parents=True, exist_ok=True)
+        self.clock = ManualClock()
+        self.llm = llm or OfflineLLM(corrupt=corrupt, seed=seed, clock=self.clock)
+        self.gm = gm or OfflineGM()
+        self.unity = unity or RecordingUnityBridge(limit=10000)
+        self.quiet = quiet
+
+        # speed_ratio 0: game time only moves by fast-forward jumps, never by wall time
+        game_time = GameTime(speed_ratio=0, root_dir=self.root_path, clock=self.clock)
+        game_time.game_datetime = start
+        self.agent = VtuberAgent(
+            game_time=game_time,
+            unity=self.unity,
+            llm=self.llm,
+            gm=self.gm,
+            root_path=self.root_path,
+            checkpoint=False,
+            clock=self.clock,
+            seed=seed,
+        )
+
+    def run(self, days):
+        start = self.agent.game_time.now()
+        until = start + timedelta(days=days)
+
+        t0 = time.perf_counter()
+        if self.quiet:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                events = self.agent.fast_forward(until)
+        else:
+            events = self.agent.fast_forward(until)
+        wall = time.perf_counter() - t0
+
+        report = {
+            "simulated_days": days,
+            "wall_seconds": wall,
+            "simulated_days_per_second": days / wall if wall > 0 else float("inf"),
+            "events": events,
+            "jobs": self.agent.scheduler.stats(),
+            "unity_messages": self.unity.sent,
+            "llm_calls": getattr(self.llm, "calls", None),
+            "gm_calls": getattr(self.gm, "calls", None),
+            "llm_output": self.llm.output.stats() if hasattr(self.llm, "output") else None,
+            "prefix_cache": self.llm.prefix_stats.stats() if hasattr(self.llm, "prefix_stats") else None,
+            "talk_streams": self.agent.planner.executor.stream_stats.stats(),
+            "assets": self.agent.planner.executor.assets.stats(),
+            "prefetch": self.agent.planner.executor.results.stats(),
+            "game_time": self.agent.game_time.now().isoformat(),
+            "digest": self.digest(),
+        }
+        print(f"[Headless] {days} day(s) in {wall:.3f}s -> {report['simulated_days_per_second']:.1f} simulated days/s")
+        return report
+
+    def digest(self):
+        """
+        sha256 over every recorded Unity message, equal digests = identical runs
+        (asset paths are taken relative to the data root, which is a fresh temp dir per run)
+        """
+        h = hashlib.sha256()
+        root = str(self.root_path.resolve())
+        for message in getattr(self.unity, "messages", []):
+            text = json.dumps(message, sort_keys=True, ensure_ascii=False,
+                              default=lambda b: hashlib.sha256(b).hexdigest())
+            h.update(text.replace(root, "<root>").encode("utf-8"))
+        return h.hexdigest()
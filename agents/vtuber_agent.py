@@ -1,5 +1,5 @@
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 import sys
 import os
 from pathlib import Path
@@ -10,6 +10,11 @@ from utils.game_time import GameTime
 from utils.loader import TodoListLoader
 from utils.unity_bridge import UnityBridge
 from behavior.planner import Planner
+from behavior.prefetch import Prefetcher
+from behavior.scheduler import TaskScheduler, TickTimer, EventQueue, task_window, DAY_START_HOUR
+from configs.settings import CHECKPOINT_INTERVAL
+from utils.checkpoint import Checkpointer
+from utils.clock import REAL_CLOCK, ManualClock
 import random
 
 class VtuberAgent:
@@ -21,58 +26,238 @@ class VtuberAgent:
     - Unity Tcp
     - LLM decision
     """
-    def __init__(self):
-        self.game_time = GameTime(speed_ratio=1) # initialize gametime 
-        self.todolist_loader = TodoListLoader() # update everyday
-        self.day_started = False
+    def __init__(self, tick_interval=1.0, game_time=None, unity=None, llm=None, gm=None,
+                 root_path=None, realtime=True, persona=None, checkpoint=True, clock=None, seed=None):
+        """
+        defaults build the live setup, headless runs inject their own pieces:
+        :param game_time: GameTime instance
+        :param unity: UnityBridge or a headless sink (NullUnityBridge / RecordingUnityBridge)
+        :param llm/gm: llm backends, default QwenLLM / QwenGM
+        :param root_path: data root for todolists, mails and game time
+        :param realtime: shorthand for the clock, False = ManualClock (no pacing pauses)
+        :param persona: persona dict, defaults to configs/persona_config.py
+        :param checkpoint: True = crash-safe checkpoints in <root>/data, False = none,
+                           or a Checkpointer instance
+        :param clock: RealClock / ScaledClock / ManualClock for game time, tick pacing and executor pauses
+        :param seed: seeds the agent's random rolls (weather), same seed = same run
+        """
+        self.clock = clock or (REAL_CLOCK if realtime else ManualClock())
+        self.rng = random.Random(seed)
+        self.game_time = game_time or GameTime(speed_ratio=1, root_dir=root_path, clock=self.clock) # initialize gametime 
+        self.todolist_loader = TodoListLoader(root_path) # update everyday
         self.weather = "sunshine"
-        self.unity = UnityBridge()
-        self.planner = Planner(self.unity)
+        self.schedule = []
+        self.day_start = None
+        self.unity = unity or UnityBridge()
+        self.planner = Planner(self.unity, llm=llm, gm=gm, root_path=root_path, clock=self.clock,
+                               persona=persona, rng=self.rng)
+        # llm work runs in the scheduler, the clock only dispatches and collects
+        self.scheduler = TaskScheduler()
+        self.timer = TickTimer(tick_interval, clock=self.clock)
+        # llm output of upcoming tasks is generated ahead, the executor picks it up at start time
+        self.prefetcher = Prefetcher(self.planner.executor, self.scheduler)
+        # start/end of every task + day boundaries, ordered by game datetime
+        self.events = EventQueue()
+        self.awaiting_schedule = False
+
+        if checkpoint is True:
+            data_dir = Path(root_path) / "data" if root_path else project_root / "data"
+            checkpoint = Checkpointer(data_dir, CHECKPOINT_INTERVAL)
+        self.checkpointer = checkpoint or None
+        if self.checkpointer is None or not self.restore():
+            self.events.push(self.next_day_start(self.game_time.now()), "day_start")
         
+
     def start_daily_loop(self):
         # Time Controller(CPU Clock mitai)
         print("\n[Agent] Daily loop started!")
         while True:
-            self.game_time.update()
-            current_hour = self.game_time.get_hour()
-            current_game_time = self.game_time.now()
-            current_time_str = current_game_time.strftime("%H:%M")
-            current_hours, current_minutes = current_time_str.split(":")
-            current_total_minutes = int(current_hours) * 60 + int(current_minutes)
-            print(f"[时间测试] 游戏时间: {current_game_time.strftime('%Y-%m-%d %H:%M:%S')} | ")
-            self.unity.send_time(current_time_str)
-            self.unity.update_background(current_game_time, self.weather)
-            # Work start from 8:00 am every day(includeing weekends)
-            if self.day_started == False and current_hour == 8:
+            self.tick()
+            self.timer.wait(self.idle_interval())
+            if self.timer.ticks % 60 == 0:
+                print(f"[Agent] tick stats: {self.timer.stats()} | jobs: {self.scheduler.stats()} "
+                      f"| unity: {self.unity.stats()}")
+                if self.checkpointer:
+                    print(f"[Agent] checkpoint latency: {self.checkpointer.stats()}")
+
+    def idle_interval(self):
+        """
+        real seconds until the loop has to wake up again:
+        - every tick while Unity shows the clock or a job is running
+        - otherwise sleep straight to the next game event
+        """
+        if self.unity.conn is not None or self.scheduler.pending():
+            return self.timer.interval
+        next_time = self.events.next_time()
+        if next_time is None:
+            return self.timer.interval
+        game_minutes = (next_time - self.game_time.now()).total_seconds() / 60
+        return max(self.timer.interval, game_minutes / self.game_time.speed_ratio)
+
+    @staticmethod
+    def next_day_start(now):
+        # Work start from 8:00 am every day(includeing weekends)
+        day_start = now.replace(hour=DAY_START_HOUR, minute=0, second=0, microsecond=0)
+        if now.hour > DAY_START_HOUR:
+            day_start += timedelta(days=1)
+        return day_start
+
+    def tick(self):
+        self.game_time.update()
+        current_game_time = self.game_time.now()
+        current_time_str = current_game_time.strftime("%H:%M")
+        print(f"[时间测试] 游戏时间: {current_game_time.strftime('%Y-%m-%d %H:%M:%S')} | ")
+        self.unity.send_time(current_time_str)
+        self.unity.update_background(current_game_time, self.weather)
+
+        # finished task handlers report back here
+        self.scheduler.poll()
+        self.prefetcher.poll(current_game_time)
+
+        # every event due by now, in game time order (tasks may overlap)
+        for kind, task, when in self.events.pop_due(current_game_time):
+            if kind == "day_start":
                 """
                 initialize the day
                 - check email
                 - generate todolist
                 """
+                self.day_start = when
+                self.events.push(when + timedelta(days=1), "day_start")
+                self.journal("day_start", day_start=when.isoformat())
                 self.start_new_day()
-                self.day_started = True
-            
-            if self.schedule:
-                next_task = self.schedule[0]
+            elif kind == "start":
+                self.journal("start", event_id=task["event_id"])
+                task["start_job"] = self.scheduler.submit(
+                    f"start {task.get('type','')}",
+                    self.planner.classifier_async(task, current_game_time, True)
+                )
+            elif kind == "end":
+                self.journal("end", event_id=task["event_id"])
+                # end handler waits for the start handler of the same task
+                self.scheduler.submit(
+                    f"end {task.get('type','')}",
+                    self.planner.classifier_async(task, current_game_time, False),
+                    after=[task.get("start_job")]
+                )
 
-                start_h, start_m = next_task["start_time"].split(":")
-                end_h, end_m = next_task["end_time"].split(":")
+        if self.checkpointer and self.checkpointer.due():
+            self.checkpoint()
 
-                start_minutes = int(start_h) * 60 + int(start_m)
-                end_minutes   = int(end_h) * 60 + int(end_m)
+    # ====================================================
+    # checkpoint / restore
+    # ====================================================
+    def journal(self, op, **fields):
+        if self.checkpointer:
+            self.checkpointer.record(op, t=self.game_time.now().isoformat(), **fields)
 
-                if (not next_task.get("started", False)) and current_total_minutes >= start_minutes:
-                    next_task["started"] = True
-                    self.planner.classifier(next_task, current_game_time, True)
+    @staticmethod
+    def plain_task(task):
+        return {k: v for k, v in task.items() if k != "start_job"}
 
-                if current_total_minutes >= end_minutes:
-                    self.planner.classifier(next_task, current_game_time, False)
-                    self.schedule.pop(0)
-            # end the day at 3:00 am
-            if current_hour == 3:
-                self.day_started = False
+    def checkpoint(self):
+        next_day = self.events.next_time_of("day_start")
+        state = {
+            "game_time": self.game_time.now().isoformat(),
+            "day_start": self.day_start.isoformat() if self.day_start else None,
+            "next_day_start": next_day.isoformat() if next_day else None,
+            "awaiting_schedule": self.awaiting_schedule,
+            "weather": self.weather,
+            "tasks": [{"task": self.plain_task(t), "started": started}
+                      for t, started in self.events.pending_tasks()],
+        }
+        self.game_time.save()
+        self.checkpointer.snapshot(state)
+
+    def restore(self):
+        """
+        rebuild clock, day and pending tasks from snapshot + journal, False if there is nothing to restore
+        """
+        state, entries = self.checkpointer.restore()
+        if state is None and not entries:
+            return False
+        state = state or {}
 
-            time.sleep(1)
+        clock = state.get("game_time")
+        day_start = state.get("day_start")
+        next_day = state.get("next_day_start")
+        self.awaiting_schedule = state.get("awaiting_schedule", False)
+        self.weather = state.get("weather", self.weather)
+        tasks = {}
+        for item in state.get("tasks", []):
+            tasks[item["task"]["event_id"]] = item
+
+        for entry in entries:
+            clock = max(clock or entry["t"], entry["t"])
+            op = entry["op"]
+            if op == "day_start":
+                day_start = entry["day_start"]
+                next_day = (datetime.fromisoformat(day_start) + timedelta(days=1)).isoformat()
+                self.awaiting_schedule = True
+            elif op == "start" and entry["event_id"] in tasks:
+                tasks[entry["event_id"]]["started"] = True
+            elif op in ("end", "cancel"):
+                tasks.pop(entry["event_id"], None)
+            elif op == "reschedule" and entry["event_id"] in tasks:
+                tasks[entry["event_id"]]["task"]["start_time"] = entry["start_time"]
+                tasks[entry["event_id"]]["task"]["end_time"] = entry["end_time"]
+
+        if clock:
+            self.game_time.advance_to(datetime.fromisoformat(clock))
+        self.day_start = datetime.fromisoformat(day_start) if day_start else None
+        if self.day_start:
+            self.schedule = [item["task"] for item in tasks.values()]
+            for item in tasks.values():
+                self.add_task(item["task"], started=item["started"])
+            self.prefetcher.plan([item["task"] for item in tasks.values() if not item["started"]], self.day_start)
+        next_day = datetime.fromisoformat(next_day) if next_day else self.next_day_start(self.game_time.now())
+        self.events.push(next_day, "day_start")
+        print(f"[Agent] Restored checkpoint: {self.game_time.now()} | {len(tasks)} pending task(s)")
+
+        if self.awaiting_schedule:
+            # crashed while the todolist was being generated
+            self.start_new_day()
+        # restored state gets fresh event ids, start a new snapshot + journal from here
+        self.checkpoint()
+        return True
+
+    def fast_forward(self, until):
+        """
+        headless: jump game time from event to event and run every handler to
+        completion before the next jump, stops at the first event after `until`
+        """
+        handled = 0
+        while True:
+            next_time = self.events.next_time()
+            if next_time is None or next_time > until:
+                break
+            self.game_time.advance_to(next_time)
+            self.tick()
+            self.scheduler.drain()
+            handled += 1
+        self.game_time.advance_to(until)
+        return handled
+
+    def add_task(self, task, started=False):
+        try:
+            start_dt, end_dt = task_window(task, self.day_start)
+        except (KeyError, ValueError, AttributeError) as e:
+            print(f"[Agent] Skip task with bad time {task}: {e}")
+            return None
+        return self.events.add_task(task, start_dt, end_dt, started=started)
+
+    def cancel_task(self, task):
+        self.journal("cancel", event_id=task.get("event_id"))
+        return self.events.cancel(task.get("event_id"))
+
+    def reschedule_task(self, task, start_time, end_time):
+        """
+        start_time / end_time: "HH:MM" of the current game day
+        """
+        task["start_time"], task["end_time"] = start_time, end_time
+        start_dt, end_dt = task_window(task, self.day_start)
+        self.journal("reschedule", event_id=task.get("event_id"), start_time=start_time, end_time=end_time)
+        return self.events.reschedule(task.get("event_id"), start_dt, end_dt)
 
     def start_new_day(self):
         print("\n===== New Day Started =====")
@@ -84,10 +269,26 @@ class VtuberAgent:
         
         self.planner.classifier(self.todolist)
         """
-        self.todolist = self.planner.generate_todolist(current_date)
+        self.awaiting_schedule = True
+        self.scheduler.submit(
+            "generate todolist",
+            self.planner.generate_todolist_async(current_date),
+            on_done=self.set_todolist
+        )
+
+    def set_todolist(self, todolist):
+        self.todolist = todolist
         self.schedule = self.planner.normalize(self.todolist)
+        for task in self.schedule:
+            self.add_task(task)
+        self.prefetcher.plan(self.schedule, self.day_start)
+        self.prefetcher.poll(self.game_time.now())
         print(self.todolist)
-        self.weather = "sunshine" if random.random() < 0.6 else "rain"
+        self.weather = "sunshine" if self.rng.random() < 0.6 else "rain"
+        self.awaiting_schedule = False
+        if self.checkpointer:
+            # new day fully planned: compact the journal into a snapshot
+            self.checkpoint()
 
         print(f"\n[Weather] Today's weather: {self.weather}\n")
 
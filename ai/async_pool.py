@@ -0,0 +1,208 @@
+import time
+import asyncio
+import threading
+
+import aiohttp
+
+import sys
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from configs.settings import (
+    LLM_MAX_CONCURRENCY,
+    LLM_HTTP_TIMEOUT,
+    LLM_KEEPALIVE_TIMEOUT,
+    LLM_RATE_LIMIT,
+)
+
+
+class AsyncRuntime:
+    """
+    background event loop shared by all sync callers:
+    - agent loop / planner / executor stay synchronous
+    - coroutines are submitted here and run concurrently
+    - one loop => one keep-alive session per process
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="llm-runtime", daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def get(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def submit(self, coro):
+        """
+        schedule coroutine on the runtime loop, return concurrent.futures.Future
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """
+        run coroutine on the runtime loop and block the caller until it finishes
+        """
+        if threading.current_thread() is self.thread:
+            raise RuntimeError("AsyncRuntime.run() called from inside the runtime loop, await the coroutine instead")
+        return self.submit(coro).result(timeout)
+
+    def shutdown(self):
+        self.run(HttpPool.get().close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+        with AsyncRuntime._lock:
+            AsyncRuntime._instance = None
+
+
+class RateLimiter:
+    """
+    token bucket shared by every request of the process (all agents of a fleet)
+    - rate: requests per second
+    - burst: requests allowed back to back after an idle period
+    thread safe, can be awaited from any event loop
+    """
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.waited = 0.0
+
+    async def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+                self.waited += wait
+            await asyncio.sleep(wait)
+
+
+class HttpPool:
+    """
+    shared aiohttp session with keep-alive connections and bounded concurrency
+    - sessions / semaphores are bound to an event loop, so keep one per loop
+    - every LLM client in the process shares the same limit
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_HTTP_TIMEOUT,
+                 keepalive_timeout=LLM_KEEPALIVE_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.keepalive_timeout = keepalive_timeout
+        self._sessions = {}
+        self._semaphores = {}
+        self.rate_limiter = RateLimiter(LLM_RATE_LIMIT) if LLM_RATE_LIMIT else None
+
+    def set_rate_limit(self, rate, burst=None):
+        self.rate_limiter = RateLimiter(rate, burst) if rate else None
+
+    @classmethod
+    def get(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def _session(self):
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._sessions[loop] = session
+        return session
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def post_json(self, url, payload, headers=None):
+        session = self._session()
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+        async with self._semaphore():
+            async with session.post(url, json=payload, headers=headers) as resp:
+                body = await resp.json(content_type=None)
+                if resp.status >= 400:
+                    print(f"[HttpPool] HTTP {resp.status} from {url}: {body}")
+                return body
+
+    async def get_json(self, url, params=None, headers=None):
+        session = self._session()
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+        async with self._semaphore():
+            async with session.get(url, params=params, headers=headers) as resp:
+                body = await resp.json(content_type=None)
+                if resp.status >= 400:
+                    print(f"[HttpPool] HTTP {resp.status} from {url}: {body}")
+                return body
+
+    async def get_bytes(self, url, headers=None):
+        """
+        raw response body (image downloads), raises on HTTP errors; not rate limited,
+        the limit is for llm requests
+        """
+        session = self._session()
+        async with self._semaphore():
+            async with session.get(url, headers=headers) as resp:
+                resp.raise_for_status()
+                return await resp.read()
+
+    async def stream_lines(self, method, url, json=None, params=None, headers=None):
+        """
+        async generator over the response body, one decoded non-empty line at a time
+        as it arrives (SSE / newline delimited JSON), the concurrency slot is held until
+        the stream ends
+        """
+        session = self._session()
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+        async with self._semaphore():
+            async with session.request(method, url, json=json, params=params, headers=headers) as resp:
+                if resp.status >= 400:
+                    print(f"[HttpPool] HTTP {resp.status} from {url}: {await resp.text()}")
+                    return
+                async for raw in resp.content:
+                    line = raw.decode("utf-8").strip()
+                    if line:
+                        yield line
+
+    async def close(self):
+        """
+        close the session that belongs to the current loop
+        """
+        loop = asyncio.get_running_loop()
+        session = self._sessions.pop(loop, None)
+        self._semaphores.pop(loop, None)
+        if session is not None and not session.closed:
+            await session.close()
+
+
+def run_sync(coro, timeout=None):
+    return AsyncRuntime.get().run(coro, timeout)
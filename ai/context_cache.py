@@ -0,0 +1,108 @@
+import re
+import threading
+
+import sys
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from configs.settings import LLM_CONTEXT_CACHE, LLM_PREFILL_SECONDS_PER_KTOKEN
+
+# CJK characters are about one token each, everything else about four characters per token
+CJK = re.compile(r"[　-鿿豈-﫿＀-￯]")
+
+
+def estimate_tokens(text):
+    """
+    rough token count for backends that report no usage (offline llm)
+    """
+    if not text:
+        return 0
+    cjk = len(CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def prefix_messages(prefix, prompt, mode=LLM_CONTEXT_CACHE):
+    """
+    chat messages for a stable prefix + variable prompt
+    - the prefix is its own system message in front, so every call with the same prefix
+      starts with the same bytes (DashScope implicit cache matches on that)
+    - "explicit": the prefix block is also marked cache_control ephemeral (explicit context cache)
+    - no prefix or mode None: the old single user message
+    """
+    if not prefix or mode is None:
+        return [{"role": "user", "content": (prefix or "") + prompt}]
+    if mode == "explicit":
+        system = [{"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}}]
+    else:
+        system = prefix
+    return [{"role": "system", "content": system}, {"role": "user", "content": prompt}]
+
+
+def usage_tokens(usage):
+    """
+    (prompt tokens, cached prompt tokens) from a DashScope / OpenAI style usage dict
+    """
+    if not isinstance(usage, dict):
+        return 0, 0
+    prompt = usage.get("input_tokens") or usage.get("prompt_tokens") or 0
+    details = usage.get("prompt_tokens_details") or usage.get("input_tokens_details") or {}
+    cached = details.get("cached_tokens") or usage.get("cached_tokens") or 0
+    return int(prompt), int(cached)
+
+
+class PrefixStats:
+    """
+    prompt prefix reuse per call site (the schema label of the call)
+    - prompt_tokens / cached_tokens: what the backend reported (or estimated)
+    - saved_seconds: prefill time not spent on the cached part, measured by the local
+      server, estimated from LLM_PREFILL_SECONDS_PER_KTOKEN for the cloud model
+    """
+    def __init__(self, prefill_seconds_per_ktoken=LLM_PREFILL_SECONDS_PER_KTOKEN):
+        self.prefill_seconds_per_ktoken = prefill_seconds_per_ktoken
+        self.labels = {}
+        self.lock = threading.Lock()
+
+    def record(self, label, prompt_tokens, cached_tokens, saved_seconds=None):
+        if saved_seconds is None:
+            saved_seconds = cached_tokens / 1000 * self.prefill_seconds_per_ktoken
+        with self.lock:
+            counts = self.labels.setdefault(label, {
+                "calls": 0, "hits": 0, "prompt_tokens": 0, "cached_tokens": 0, "saved_seconds": 0.0,
+            })
+            counts["calls"] += 1
+            counts["hits"] += 1 if cached_tokens else 0
+            counts["prompt_tokens"] += prompt_tokens
+            counts["cached_tokens"] += cached_tokens
+            counts["saved_seconds"] += saved_seconds
+
+    def record_usage(self, label, usage):
+        prompt, cached = usage_tokens(usage)
+        saved = usage.get("prefill_saved") if isinstance(usage, dict) else None
+        self.record(label, prompt, cached, saved)
+
+    def stats(self):
+        with self.lock:
+            labels = {label: dict(counts) for label, counts in self.labels.items()}
+        for counts in labels.values():
+            counts["hit_tokens_rate"] = (counts["cached_tokens"] / counts["prompt_tokens"]
+                                         if counts["prompt_tokens"] else 0.0)
+        prompt = sum(c["prompt_tokens"] for c in labels.values())
+        cached = sum(c["cached_tokens"] for c in labels.values())
+        return {
+            "calls": sum(c["calls"] for c in labels.values()),
+            "prompt_tokens": prompt,
+            "cached_tokens": cached,
+            "hit_tokens_rate": cached / prompt if prompt else 0.0,
+            "saved_seconds": sum(c["saved_seconds"] for c in labels.values()),
+            "by_label": labels,
+        }
+
+
+if __name__ == "__main__":
+    stats = PrefixStats()
+    header = "主播名字：Mika\n說話風格：可愛\n\n" + "規則。" * 200
+    for i in range(3):
+        stats.record("tweet", estimate_tokens(header) + 10, estimate_tokens(header) if i else 0)
+    print(prefix_messages(header[:20], "今晚直播預告", "explicit"))
+    print(stats.stats())
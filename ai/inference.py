@@ -0,0 +1,408 @@
+import copy
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+from transformers import DynamicCache, TextStreamer
+
+import sys
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from ai.streaming import percentile
+from ai.prompt_templates import persona_header
+from configs.settings import (
+    SERVER_MAX_BATCH,
+    SERVER_BATCH_WAIT,
+    SERVER_MAX_NEW_TOKENS,
+    SERVER_PREFIX_CACHE_SIZE,
+)
+
+
+def persona_prefix(persona):
+    """
+    the persona header QwenLLM.build_prompt and the Executor put in front of their prompts
+    """
+    return persona_header(persona)
+
+
+class PrefixCache:
+    """
+    KV cache of shared prompt prefixes (the persona header)
+    - one forward pass per prefix, LRU over max_entries prefixes
+    - a batch gets a copy repeated to its size, prefix tokens are never run through the model again
+    - the forward pass of each prefix is timed, a reuse saves about that much prefill
+    """
+    def __init__(self, model, tokenizer, device, max_entries=SERVER_PREFIX_CACHE_SIZE):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.max_entries = max_entries
+        self.entries = OrderedDict()        # prefix -> (input_ids [1, P], DynamicCache, prefill seconds)
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, prefix):
+        """
+        (input_ids, cache, prefill seconds, hit)
+        """
+        entry = self.entries.get(prefix)
+        if entry is not None:
+            self.entries.move_to_end(prefix)
+            self.hits += 1
+            return entry + (True,)
+        return self._build(prefix) + (False,)
+
+    def get(self, prefix):
+        return self.lookup(prefix)[:3]
+
+    @torch.no_grad()
+    def _build(self, prefix):
+        self.misses += 1
+        started = time.perf_counter()
+        ids = self.tokenizer(prefix, return_tensors="pt").input_ids.to(self.device)
+        cache = self.model(input_ids=ids, past_key_values=DynamicCache(), use_cache=True).past_key_values
+        self.entries[prefix] = entry = (ids, cache, time.perf_counter() - started)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return entry
+
+    def for_batch(self, prefix, size):
+        """
+        (input_ids [size, P], cache repeated to size, prefill seconds, hit)
+        """
+        ids, cache, seconds, hit = self.lookup(prefix)
+        cache = copy.deepcopy(cache)
+        if size > 1:
+            cache.batch_repeat_interleave(size)
+        return ids.expand(size, -1), cache, seconds, hit
+
+
+class ServerStats:
+    """
+    request latency (queue wait + generation) over the last `window` requests
+    """
+    def __init__(self, window=2000):
+        self.started = time.monotonic()
+        self.latencies = deque(maxlen=window)
+        self.finished = deque(maxlen=window)     # monotonic finish times, for the recent rate
+        self.requests = 0
+        self.batches = 0
+        self.tokens = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.prefill_saved = 0.0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def record(self, latencies, tokens, usages=()):
+        now = time.monotonic()
+        with self.lock:
+            self.batches += 1
+            self.requests += len(latencies)
+            self.tokens += tokens
+            self.latencies.extend(latencies)
+            self.finished.extend([now] * len(latencies))
+            for usage in usages:
+                self.prompt_tokens += usage["prompt_tokens"]
+                self.cached_tokens += usage["cached_tokens"]
+                self.prefill_saved += usage["prefill_saved"]
+
+    def record_error(self, count):
+        with self.lock:
+            self.errors += count
+
+    def stats(self):
+        with self.lock:
+            uptime = time.monotonic() - self.started
+            latencies = list(self.latencies)
+            recent = (self.finished[-1] - self.finished[0]) if len(self.finished) > 1 else 0.0
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "batches": self.batches,
+                "mean_batch": self.requests / self.batches if self.batches else 0.0,
+                "requests_per_second": self.requests / uptime if uptime > 0 else 0.0,
+                "recent_requests_per_second": (len(self.finished) - 1) / recent if recent > 0 else None,
+                "tokens_per_second": self.tokens / uptime if uptime > 0 else 0.0,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "prefill_saved_seconds": self.prefill_saved,
+                "latency_p50": percentile(latencies, 0.5),
+                "latency_p99": percentile(latencies, 0.99),
+            }
+
+
+class _QueueStreamer(TextStreamer):
+    """
+    hands decoded text from the generation thread to an asyncio queue
+    """
+    def __init__(self, tokenizer, loop, queue):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.loop = loop
+        self.queue = queue
+
+    def on_finalized_text(self, text, stream_end=False):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, (text, stream_end))
+
+
+class BatchedGenerator:
+    """
+    dynamic batching in front of one causal LM
+    - requests wait in a queue, the worker takes what arrived within batch_wait seconds
+      (at most max_batch) and runs them as one left padded generate()
+    - prompts starting with a known prefix (or sent with an explicit one) reuse its KV cache,
+      requests of a batch are grouped by prefix; every answer carries a usage dict
+      (prompt_tokens, cached_tokens, prefill_saved seconds)
+    - max_new_tokens caps every request
+    - generate() runs on one worker thread, the event loop only queues and answers
+    """
+    def __init__(self, model, tokenizer, device="cpu", max_batch=SERVER_MAX_BATCH,
+                 batch_wait=SERVER_BATCH_WAIT, max_new_tokens=SERVER_MAX_NEW_TOKENS, prefixes=()):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait
+        self.max_new_tokens = max_new_tokens
+        self.prefixes = [p for p in prefixes if p]
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        tokenizer.padding_side = "left"
+        self.prefix_cache = PrefixCache(model, tokenizer, device)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="generate")
+        self.server_stats = ServerStats()
+        self.queue = None
+        self.worker = None
+
+    # ---------------- lifecycle ----------------
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.worker = asyncio.create_task(self._run())
+        if self.prefixes:
+            # warm the persona prefix before the first request
+            loop = asyncio.get_running_loop()
+            for prefix in self.prefixes:
+                await loop.run_in_executor(self.executor, self.prefix_cache.get, prefix)
+
+    async def stop(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=False)
+
+    # ---------------- requests ----------------
+    def _split(self, prompt, prefix):
+        if prefix is None:
+            prefix = next((p for p in self.prefixes if prompt.startswith(p) and len(prompt) > len(p)), None)
+            if prefix is not None:
+                prompt = prompt[len(prefix):]
+        return prefix or None, prompt
+
+    def _cap(self, max_new_tokens):
+        return min(self.max_new_tokens, max_new_tokens or self.max_new_tokens)
+
+    async def generate(self, prompt, max_new_tokens=None, prefix=None):
+        """
+        completion text of prefix + prompt (the prompt is not repeated)
+        """
+        return (await self.complete(prompt, max_new_tokens, prefix))[0]
+
+    async def complete(self, prompt, max_new_tokens=None, prefix=None):
+        """
+        (completion text, usage)
+        """
+        prefix, suffix = self._split(prompt, prefix)
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put({
+            "prefix": prefix,
+            "suffix": suffix,
+            "max_new_tokens": self._cap(max_new_tokens),
+            "future": future,
+            "queued": time.monotonic(),
+        })
+        return await future
+
+    async def stream(self, prompt, max_new_tokens=None, prefix=None, usage=None):
+        """
+        async generator over decoded chunks, runs alone (streamers are batch size 1)
+        on the same worker thread as the batches
+        usage: dict filled with the request's usage once the stream ended
+        """
+        prefix, suffix = self._split(prompt, prefix)
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue()
+        streamer = _QueueStreamer(self.tokenizer, loop, chunks)
+        request = {"prefix": prefix, "suffix": suffix, "max_new_tokens": self._cap(max_new_tokens),
+                   "queued": time.monotonic()}
+        job = loop.run_in_executor(self.executor, self._generate_stream, prefix, request, streamer)
+        while True:
+            text, end = await chunks.get()
+            if text:
+                yield text
+            if end:
+                break
+        try:
+            texts, tokens, usages = await job
+        except Exception as e:
+            print(f"[Server] Stream failed: {e!r}")
+            self.server_stats.record_error(1)
+            raise
+        self.server_stats.record([time.monotonic() - request["queued"]], tokens, usages)
+        if usage is not None:
+            usage.update(usages[0])
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            groups = OrderedDict()
+            for request in batch:
+                groups.setdefault(request["prefix"], []).append(request)
+            for prefix, group in groups.items():
+                try:
+                    texts, tokens, usages = await loop.run_in_executor(self.executor, self._generate, prefix, group)
+                except Exception as e:
+                    print(f"[Server] Batch of {len(group)} failed: {e!r}")
+                    self.server_stats.record_error(len(group))
+                    for request in group:
+                        if not request["future"].done():
+                            request["future"].set_exception(e)
+                    continue
+                now = time.monotonic()
+                for request, text, usage in zip(group, texts, usages):
+                    if not request["future"].done():
+                        request["future"].set_result((text, usage))
+                self.server_stats.record([now - r["queued"] for r in group], tokens, usages)
+
+    # ---------------- generation (worker thread) ----------------
+    def _generate_stream(self, prefix, request, streamer):
+        """
+        _generate for one streamed request, the end of the stream is posted even when it raises
+        so stream() never waits on a chunk that will not come
+        """
+        try:
+            return self._generate(prefix, [request], streamer)
+        finally:
+            streamer.loop.call_soon_threadsafe(streamer.queue.put_nowait, ("", True))
+
+    @torch.no_grad()
+    def _generate(self, prefix, group, streamer=None):
+        """
+        :return: ([completion per request], generated token count, [usage per request])
+        """
+        tokenizer = self.tokenizer
+        max_new = max(r["max_new_tokens"] for r in group)
+        kwargs = {"max_new_tokens": max_new, "do_sample": False, "pad_token_id": tokenizer.pad_token_id}
+        if streamer is not None:
+            kwargs["streamer"] = streamer
+
+        suffixes = [tokenizer(r["suffix"], add_special_tokens=False).input_ids for r in group]
+        if prefix is not None and all(suffixes):
+            # [prefix][pad..][suffix]: the cached prefix keeps positions 0..P-1,
+            # padding sits in the middle and is masked out
+            prefix_ids, cache, seconds, hit = self.prefix_cache.for_batch(prefix, len(group))
+            # on a miss the first request paid the prefix prefill, the rest of the batch reuses it
+            prefix_len = prefix_ids.shape[1]
+            usages = [{"prompt_tokens": prefix_len + len(s),
+                       "cached_tokens": prefix_len if hit or i else 0,
+                       "prefill_saved": seconds if hit or i else 0.0} for i, s in enumerate(suffixes)]
+            width = max(len(s) for s in suffixes)
+            pad = tokenizer.pad_token_id
+            rows = [[pad] * (width - len(s)) + s for s in suffixes]
+            suffix_ids = torch.tensor(rows, device=self.device)
+            input_ids = torch.cat([prefix_ids, suffix_ids], dim=1)
+            mask = torch.tensor([[0] * (width - len(s)) + [1] * len(s) for s in suffixes], device=self.device)
+            attention_mask = torch.cat([torch.ones_like(prefix_ids), mask], dim=1)
+            kwargs["past_key_values"] = cache
+        else:
+            prompts = [(r["prefix"] or "") + r["suffix"] for r in group]
+            encoded = tokenizer(prompts, return_tensors="pt", padding=True).to(self.device)
+            input_ids, attention_mask = encoded.input_ids, encoded.attention_mask
+            usages = [{"prompt_tokens": int(row.sum()), "cached_tokens": 0, "prefill_saved": 0.0}
+                      for row in attention_mask]
+
+        output = self.model.generate(input_ids=input_ids, attention_mask=attention_mask, **kwargs)
+        new_tokens = output[:, input_ids.shape[1]:]
+        texts, tokens = [], 0
+        for request, row in zip(group, new_tokens):
+            row = row[:request["max_new_tokens"]]
+            tokens += int((row != tokenizer.pad_token_id).sum())
+            texts.append(tokenizer.decode(row, skip_special_tokens=True))
+        return texts, tokens, usages
+
+    def stats(self):
+        stats = self.server_stats.stats()
+        stats.update({
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "max_batch": self.max_batch,
+            "max_new_tokens": self.max_new_tokens,
+            "prefix_hits": self.prefix_cache.hits,
+            "prefix_misses": self.prefix_cache.misses,
+        })
+        return stats
+
+
+def tiny_model(text="", seed=0):
+    """
+    a randomly initialised 2 layer GPT-2 with a character level tokenizer over `text`,
+    builds offline, for demos and server benchmarks without a model download
+    """
+    from tokenizers import Tokenizer, models, pre_tokenizers, decoders
+    from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+    chars = sorted(set(text) | set("abcdefghijklmnopqrstuvwxyz0123456789 ,.!?:"))
+    vocab = {"<eos>": 0, "<unk>": 1}
+    vocab.update({c: i + 2 for i, c in enumerate(chars)})
+    core = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    core.pre_tokenizer = pre_tokenizers.Split("", "isolated")
+    core.decoder = decoders.Fuse()
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=core, eos_token="<eos>", unk_token="<unk>")
+    torch.manual_seed(seed)
+    config = GPT2Config(vocab_size=len(vocab), n_positions=1024, n_embd=64, n_layer=2, n_head=2,
+                        bos_token_id=0, eos_token_id=0)
+    return GPT2LMHeadModel(config).eval(), tokenizer
+
+
+if __name__ == "__main__":
+    from configs.persona_config import persona
+
+    prefix = persona_prefix(persona)
+    model, tokenizer = tiny_model(prefix + "晚上好喵今天玩什麽遊戲？")
+
+    async def main():
+        generator = BatchedGenerator(model, tokenizer, max_new_tokens=8, prefixes=[prefix])
+        await generator.start()
+        print(await generator.complete(prefix + "晚上好喵"))
+        usage = {}
+        print([text async for text in generator.stream(prefix + "今天玩什麽遊戲？", usage=usage)], usage)
+
+        # a generation error (OOM, tokenizer) must end the stream with the exception, not hang it
+        def broken(*args, **kwargs):
+            raise RuntimeError("CUDA out of memory")
+        model.generate = broken
+        try:
+            await asyncio.wait_for(generator.stream("晚上好喵").__anext__(), timeout=10)
+        except RuntimeError as e:
+            print(f"[Server] stream re-raised: {e}")
+        print(generator.stats())
+        await generator.stop()
+
+    asyncio.run(main())
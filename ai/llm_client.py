@@ -1,5 +1,6 @@
 import json
 import os
+import asyncio
 import dashscope
 from dashscope import MultiModalConversation
 
@@ -12,33 +13,62 @@ sys.path.insert(0, str(project_root))
 
 
 from configs.settings import (
+    DEEPSEEK_URL,
+    DEEPSEEK_MAX_CONCURRENCY,
+    DEEPSEEK_TIMEOUT,
+    DEEPSEEK_MAX_NEW_TOKENS,
+    DEEPSEEK_RETRY_AFTER,
     QWEN_API_KEY,
     QWEN_API_URL,
     QWEN_TEXT_MODEL,
     QWEN_IMAGE_MODEL,
     DEFAULT_RESPONSE_FORMAT,
+    LLM_CACHE_ENABLED,
 )
-from configs.persona_config import persona
+from configs.persona_config import persona as default_persona
+from ai.async_pool import HttpPool, run_sync
+from ai.response_cache import ResponseCache
+from ai.structured_output import SCHEMAS, StructuredOutput, StructuredOutputError
+from ai.streaming import sse_data
+from ai.context_cache import PrefixStats, prefix_messages
+from ai.prompt_templates import TemplateRegistry
+from utils.clock import REAL_CLOCK
+
+TEXT_GENERATION_PATH = "/services/aigc/text-generation/generation"
+MULTIMODAL_GENERATION_PATH = "/services/aigc/multimodal-generation/generation"
 
 class QwenLLM:
     """
     text2text: 
+    cache: ResponseCache for byte-identical prompts, defaults to the shared
+           cache when LLM_CACHE_ENABLED, pass False to always hit the api
+    output: StructuredOutput, repairs / validates / retries JSON answers,
+            its backoff sleeps on `clock`
+    prefix: ask_json / chat take the stable part of a prompt (persona, rules) separately,
+            it goes first as its own message so the provider's context cache can reuse it,
+            reported cached tokens are counted per schema in prefix_stats
     """
-    def __init__(self, api_key=None, base_url=None, model=None):
+    def __init__(self, api_key=None, base_url=None, model=None, cache=None, clock=None, output=None):
         self.api_key = api_key or QWEN_API_KEY
         self.base_url = base_url or QWEN_API_URL
         self.model = model or QWEN_TEXT_MODEL
         self.project_root = Path(__file__).resolve().parent.parent  # chat/
-        self.template_dir = self.project_root / "configs" / "prompt_templates"
+        self.templates = TemplateRegistry.shared()
+        self.template_dir = self.templates.template_dir
+        self.pool = HttpPool.get()
+        if cache is None and LLM_CACHE_ENABLED:
+            cache = ResponseCache.shared()
+        self.cache = cache or None
+        self.output = output or StructuredOutput(clock=clock)
+        self.prefix_stats = PrefixStats()
 
         dashscope.base_http_api_url = self.base_url
 
     def load_template(self, template_path: str):
-        p = self.template_dir / template_path
-        print(p)
-        if p.exists():
-            return p.read_text(encoding="utf-8")
-        return ""
+        """
+        compiled once by the shared TemplateRegistry, "" for a missing file
+        """
+        return self.templates.text(template_path)
 
     def build_prompt(
             self,
@@ -47,16 +77,13 @@ class QwenLLM:
             output_format: dict = None,
             template_path: str = None,
             file_prompts: str = None,
+            persona: dict = None,
     ):
         final_prompt = ""
+        persona = persona or default_persona
 
         if include_persona:
-            final_prompt += (
-                f"主播名字：{persona['name']}\n"
-                f"說話風格：{persona['style']}\n"
-                f"行為特徵：{persona['behavior_traits']}\n"
-                "\n"
-            )
+            final_prompt += self.templates.persona_header(persona)
         
         if template_path:
             template = self.load_template(template_path)
@@ -79,10 +106,8 @@ class QwenLLM:
 
         return final_prompt
 
-    def chat(self, prompt:str, response_format:dict=None):
-        messages = [
-            {"role": "user", "content": prompt}
-        ]
+    def chat(self, prompt:str, response_format:dict=None, prefix:str=None):
+        messages = prefix_messages(prefix, prompt)
 
         try:
             return dashscope.Generation.call(
@@ -97,24 +122,153 @@ class QwenLLM:
             print("[QwenLLM.chat] ERROR:", e)
             return None
         
-    def ask_json(self, prompt: str):
-        resp = self.chat(prompt, response_format={"type": "json_object"})
+    def _cache_key(self, prompt, response_format, prefix=None):
+        if self.cache is None:
+            return None
+        return self.cache.make_key(self.model, (prefix or "") + prompt, response_format)
+
+    def _cached(self, key, schema):
+        if key is None:
+            return None
+        text = self.cache.get(key)
+        if text is None:
+            return None
         try:
-            content = resp["output"]["text"]
-            return json.loads(content)
-        except:
-            print("[QwenLLM.ask_json] JSON decode error:", resp)
+            return self.output.parse(text, schema)[0]
+        except StructuredOutputError:
+            return None
+
+    def _parse(self, schema):
+        label = schema if isinstance(schema, str) else "json"
+
+        def parse(resp):
+            try:
+                self.prefix_stats.record_usage(label, resp["usage"])
+            except (KeyError, TypeError):
+                pass
+            try:
+                text = resp["output"]["text"]
+            except (KeyError, TypeError):
+                raise StructuredOutputError(f"unexpected response: {str(resp)[:120]}")
+            return self.output.parse(text, schema)
+        return parse
+
+    def _finish(self, key, result):
+        if result is None:
             return {}
-        
+        if key is not None:
+            self.cache.put_json(key, result)
+        return result
+
+    def ask_json(self, prompt: str, schema=None, prefix=None):
+        """
+        :param schema: name in ai/structured_output.SCHEMAS (or a spec) the answer must match,
+                       None only requires valid JSON
+        :param prefix: stable prompt part sent in front of prompt, kept byte-identical between calls
+        :return: parsed answer, {} once the retries are used up (logged and counted in output.stats())
+        """
+        response_format = {"type": "json_object"}
+        key = self._cache_key(prompt, response_format, prefix)
+        cached = self._cached(key, schema)
+        if cached is not None:
+            return cached
+
+        result = self.output.call(
+            lambda: self.chat(prompt, response_format=response_format, prefix=prefix),
+            self._parse(schema),
+            label=schema if isinstance(schema, str) else "json",
+        )
+        return self._finish(key, result)
+
+    async def chat_async(self, prompt:str, response_format:dict=None, prefix:str=None):
+        payload = {
+            "model": self.model,
+            "input": {
+                "messages": prefix_messages(prefix, prompt)
+            },
+            "parameters": {
+                "result_format": "text",
+                "response_format": response_format or DEFAULT_RESPONSE_FORMAT,
+            }
+        }
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+
+        try:
+            return await self.pool.post_json(self.base_url + TEXT_GENERATION_PATH, payload, headers)
+
+        except Exception as e:
+            print("[QwenLLM.chat_async] ERROR:", e)
+            return None
+
+    async def ask_json_async(self, prompt: str, schema=None, prefix=None):
+        response_format = {"type": "json_object"}
+        key = self._cache_key(prompt, response_format, prefix)
+        cached = self._cached(key, schema)
+        if cached is not None:
+            return cached
+
+        result = await self.output.acall(
+            lambda: self.chat_async(prompt, response_format=response_format, prefix=prefix),
+            self._parse(schema),
+            label=schema if isinstance(schema, str) else "json",
+        )
+        return self._finish(key, result)
+
+    async def stream_text_async(self, prompt: str, prefix=None):
+        """
+        yield the answer as plain text chunks while it is generated
+        (DashScope SSE with incremental_output, every event carries only the new text)
+        """
+        payload = {
+            "model": self.model,
+            "input": {
+                "messages": prefix_messages(prefix, prompt)
+            },
+            "parameters": {
+                "result_format": "text",
+                "incremental_output": True,
+            }
+        }
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Accept": "text/event-stream",
+            "X-DashScope-SSE": "enable",
+        }
+
+        try:
+            async for line in self.pool.stream_lines("POST", self.base_url + TEXT_GENERATION_PATH,
+                                                     json=payload, headers=headers):
+                event = sse_data(line)
+                if event is None:
+                    continue
+                text = (event.get("output") or {}).get("text")
+                if text:
+                    yield text
+
+        except Exception as e:
+            print("[QwenLLM.stream_text_async] ERROR:", e)
+
+    async def ask_json_many(self, prompts, schema=None, prefix=None):
+        """
+        send all prompts concurrently (bounded by HttpPool), results keep prompt order
+        """
+        return await asyncio.gather(*(self.ask_json_async(p, schema, prefix) for p in prompts))
+
+    def ask_json_batch(self, prompts, schema=None, prefix=None):
+        return run_sync(self.ask_json_many(prompts, schema, prefix))
+
 
 class QwenGM:
     """
     text2img:
+    output: StructuredOutput, answers without an image url are retried with backoff
     """
-    def __init__(self, api_key=None, base_url=None, model=None):
+    def __init__(self, api_key=None, base_url=None, model=None, clock=None, output=None):
         self.api_key = api_key or QWEN_API_KEY
         self.base_url = base_url or QWEN_API_URL
         self.model = model or QWEN_IMAGE_MODEL
+        self.pool = HttpPool.get()
+        self.output = output or StructuredOutput(clock=clock)
 
     def chat(self, prompt:str, response_format:dict=None):
         messages = [
@@ -138,25 +292,198 @@ class QwenGM:
             print("[QwenLLM.chat] ERROR:", e)
             return None
         
+    @staticmethod
+    def _parse_image(resp):
+        try:
+            url = resp["output"]["choices"][0]["message"]["content"][0]["image"]
+        except (KeyError, IndexError, TypeError):
+            raise StructuredOutputError(f"no image in response: {str(resp)[:120]}")
+        if not isinstance(url, str) or not url:
+            raise StructuredOutputError(f"bad image url: {url!r}")
+        return url, False
+
     def ask_json(self, prompt: str):
-        resp = self.chat(prompt, response_format={"type": "json_object"})
+        """
+        :return: image url, None once the retries are used up
+        """
+        return self.output.call(
+            lambda: self.chat(prompt, response_format={"type": "json_object"}),
+            self._parse_image,
+            label="image",
+        )
+
+    async def chat_async(self, prompt:str, response_format:dict=None):
+        payload = {
+            "model": self.model,
+            "input": {
+                "messages": [{"role": "user", "content": [{"text": prompt}]}]
+            },
+            "parameters": {
+                "watermark": False,
+                "prompt_extend": True,
+                "negative_prompt": "",
+                "size": "1664*928",
+            }
+        }
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+
         try:
-            content = resp["output"]["choices"][0]["message"]["content"][0]["image"]
-            return content
-        except:
-            print("[QwenLLM.ask_json] JSON decode error:", resp)
-            return {}
+            return await self.pool.post_json(self.base_url + MULTIMODAL_GENERATION_PATH, payload, headers)
+
+        except Exception as e:
+            print("[QwenGM.chat_async] ERROR:", e)
+            return None
+
+    async def ask_json_async(self, prompt: str):
+        return await self.output.acall(lambda: self.chat_async(prompt), self._parse_image, label="image")
+
+    async def fetch_bytes_async(self, url: str):
+        """
+        download a generated image, the url expires after a while so keep the bytes
+        """
+        return await self.pool.get_bytes(url)
+
+    def fetch_bytes(self, url: str):
+        return run_sync(self.fetch_bytes_async(url))
 
 
 class DeepseekVtuber:
     """
-    identity small language model
+    identity small language model (ai/server.py), same interface as QwenLLM
+    - own keep-alive HttpPool: at most max_concurrency requests in flight, `timeout` seconds each
+    - answers go through StructuredOutput: R1 <think> blocks are dropped, the JSON is cut out
+      of the text, a plain text answer fills a one-field schema ({"talk": ...})
+    - a failed connection marks the server down for retry_after seconds, calls return {} at once
+      meanwhile so callers can fall back to the cloud model without waiting on retries
+    - prefix is sent separately, the server keeps its KV cache and reports the prefix tokens
+      it did not recompute (prefix_stats, per schema label)
     """
-    def __init__(self, url):
-        self.url = url
+    def __init__(self, url=None, max_concurrency=DEEPSEEK_MAX_CONCURRENCY, timeout=DEEPSEEK_TIMEOUT,
+                 max_new_tokens=DEEPSEEK_MAX_NEW_TOKENS, retry_after=DEEPSEEK_RETRY_AFTER,
+                 clock=None, output=None):
+        self.url = (url or DEEPSEEK_URL).rstrip("/")
+        self.pool = HttpPool(max_concurrency=max_concurrency, timeout=timeout)
+        self.pool.set_rate_limit(None)
+        self.max_new_tokens = max_new_tokens
+        self.retry_after = retry_after
+        self.clock = clock or REAL_CLOCK
+        self.output = output or StructuredOutput(clock=self.clock)
+        self.prefix_stats = PrefixStats()
+        self.down_until = None
+        self.calls = 0
+        self.errors = 0
+
+    def available(self):
+        return self.down_until is None or self.clock.monotonic() >= self.down_until
+
+    def _mark_down(self, where, error):
+        self.errors += 1
+        self.down_until = self.clock.monotonic() + self.retry_after
+        print(f"[DeepseekVtuber.{where}] ERROR: {error!r}, server marked down for {self.retry_after}s")
+
+    async def generate_async(self, prompt: str, max_new_tokens=None, prefix=None, label="text"):
+        """
+        completion text of prefix + prompt, None when the server is down or answered garbage
+        """
+        if not self.available():
+            return None
+        payload = {"prompt": prompt, "max_new_tokens": max_new_tokens or self.max_new_tokens}
+        if prefix:
+            payload["prefix"] = prefix
+        try:
+            resp = await self.pool.post_json(self.url + "/generate", payload)
+        except Exception as e:
+            self._mark_down("generate_async", e)
+            return None
+        self.calls += 1
+        if not isinstance(resp, dict) or not isinstance(resp.get("generated_text"), str):
+            print("[DeepseekVtuber.generate_async] unexpected response:", resp)
+            return None
+        if isinstance(resp.get("usage"), dict):
+            self.prefix_stats.record_usage(label, resp["usage"])
+        return resp["generated_text"]
+
+    @staticmethod
+    def strip_think(text):
+        return text.rsplit("</think>", 1)[-1].strip()
+
+    def _parse(self, schema):
+        spec = SCHEMAS.get(schema) if isinstance(schema, str) else schema
+
+        def parse(text):
+            text = self.strip_think(text)
+            try:
+                return self.output.parse(text, schema)
+            except StructuredOutputError:
+                # the fine-tuned model often just talks: plain text fills a single text field
+                if isinstance(spec, dict) and len(spec) == 1 and list(spec.values()) == [str] \
+                        and text and "{" not in text:
+                    return {next(iter(spec)): text}, True
+                raise
+        return parse
+
+    async def ask_json_async(self, prompt: str, schema=None, prefix=None):
+        if not self.available():
+            return {}
+        label = schema if isinstance(schema, str) else "json"
+        result = await self.output.acall(
+            lambda: self.generate_async(prompt, prefix=prefix, label=label),
+            self._parse(schema),
+            label=label,
+            abort=lambda: not self.available(),
+        )
+        return {} if result is None else result
+
+    def ask_json(self, prompt: str, schema=None, prefix=None):
+        return run_sync(self.ask_json_async(prompt, schema, prefix))
+
+    async def ask_json_many(self, prompts, schema=None, prefix=None):
+        return await asyncio.gather(*(self.ask_json_async(p, schema, prefix) for p in prompts))
+
+    async def stream_text_async(self, prompt: str, max_new_tokens=None, prefix=None):
+        """
+        yield chunks from the server's /generate_stream (one {"delta": str} JSON per line),
+        a leading <think> block is held back and dropped, a final {"usage": ...} line goes to prefix_stats
+        """
+        if not self.available():
+            return
+        params = {"prompt": prompt, "max_new_tokens": max_new_tokens or self.max_new_tokens}
+        if prefix:
+            params["prefix"] = prefix
+        pending, thinking = "", None
+        try:
+            async for line in self.pool.stream_lines("GET", self.url + "/generate_stream", params=params):
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(event, dict):
+                    continue
+                if isinstance(event.get("usage"), dict):
+                    self.prefix_stats.record_usage("stream", event["usage"])
+                delta = event.get("delta")
+                if not delta:
+                    continue
+                if thinking is None:
+                    pending += delta
+                    head = pending.lstrip()
+                    if "<think>".startswith(head):
+                        continue            # too short to tell yet
+                    thinking = head.startswith("<think>")
+                    delta = "" if thinking else pending
+                if thinking:
+                    pending += delta
+                    if "</think>" not in pending:
+                        continue
+                    delta, thinking = self.strip_think(pending), False
+                if delta:
+                    yield delta
+
+        except Exception as e:
+            self._mark_down("stream_text_async", e)
 
-    def ask_json(self, url):
-        pass
+    async def close(self):
+        await self.pool.close()
 
 # for test, please ignore...
 if __name__ == "__main__":
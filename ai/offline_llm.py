@@ -0,0 +1,177 @@
+import re
+import json
+import time
+import zlib
+import struct
+import hashlib
+import random
+import asyncio
+import threading
+
+import sys
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from ai.structured_output import StructuredOutput
+from ai.context_cache import PrefixStats, estimate_tokens
+
+
+class OfflineLLM:
+    """
+    offline backend with the QwenLLM interface (ask_json / ask_json_async / stream_text_async)
+    - recognises the prompt kind (todolist, review, tweet, project, email, talk) and
+      returns a canned but well-formed answer
+    - latency: optional fake delay in seconds per call
+    - corrupt: share of answers sent back malformed (fenced, trailing commas or cut off),
+      they go through the same StructuredOutput repair / retry path as QwenLLM
+    - prefix: answered as prefix + prompt, a prefix seen before counts as a provider cache hit
+      (estimated tokens) in prefix_stats
+    used by the headless simulation so a simulated week costs no api calls
+    """
+    def __init__(self, latency=0.0, corrupt=0.0, seed=None, clock=None):
+        self.latency = latency
+        self.corrupt = corrupt
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.output = StructuredOutput(clock=clock)
+        self.prefix_stats = PrefixStats()
+        self.prefixes = set()
+
+    def respond(self, prompt: str):
+        with self.lock:
+            self.calls += 1
+
+        if "ToDoList" in prompt:
+            date = re.search(r"\[date\] (\d{4}-\d{2}-\d{2})", prompt)
+            return {
+                "date": date.group(1) if date else "",
+                "tasks": [
+                    {"type": "cover", "start_time": "10:00", "end_time": "11:00", "content": "製作直播封面"},
+                    {"type": "tweet", "category": "preview", "start_time": "13:00", "end_time": "13:30",
+                     "content": "今晚20:00直播預告"},
+                    {"type": "project", "start_time": "15:00", "end_time": "16:00", "content": "新企劃"},
+                    {"type": "stream", "start_time": "20:00", "end_time": "22:00", "content": "一起來玩Silent Hill f!"},
+                ]
+            }
+        if '"contents"' in prompt:
+            count = len(re.findall(r"^\d+\. \[", prompt, flags=re.M))
+            return {"contents": [f"離線任務內容{i + 1}喵" for i in range(count)]}
+        if '"approved"' in prompt:
+            return {"approved": True, "reason": "離線審核通過"}
+        if '"email"' in prompt:
+            return {"email": "您好，附上新企劃，請審核。"}
+        if "project_name" in prompt:
+            return {"project_name": "離線企劃", "project_content": "這是一個離線模擬生成的企劃內容，用於測試整個流程。"}
+        if '"tweet"' in prompt:
+            return {"tweet": "今晚一起玩游戏喵！"}
+        if "talk" in prompt:
+            return {"talk": "大家好喵～"}
+        return {}
+
+    def answer_text(self, prompt: str):
+        """
+        respond() as the raw text an api would return
+        """
+        text = json.dumps(self.respond(prompt), ensure_ascii=False)
+        if not self.corrupt:
+            return text
+        with self.lock:
+            roll, kind = self.rng.random(), self.rng.choice(("fence", "comma", "cut"))
+        if roll >= self.corrupt:
+            return text
+        if kind == "fence":
+            return f"好的喵～\n```json\n{text}\n```"
+        if kind == "comma":
+            return text[:-1] + ",}"
+        return text[:len(text) // 2]
+
+    def _label(self, schema):
+        return schema if isinstance(schema, str) else "json"
+
+    def _send(self, prompt, prefix, label):
+        """
+        the full prompt as the api would see it, prefix reuse recorded like a provider reports it
+        """
+        prefix = prefix or ""
+        with self.lock:
+            hit = prefix in self.prefixes
+            if prefix:
+                self.prefixes.add(prefix)
+        cached = estimate_tokens(prefix) if hit else 0
+        self.prefix_stats.record(label, estimate_tokens(prefix) + estimate_tokens(prompt), cached)
+        return prefix + prompt
+
+    def ask_json(self, prompt: str, schema=None, prefix=None):
+        def fetch():
+            if self.latency:
+                time.sleep(self.latency)
+            return self.answer_text(self._send(prompt, prefix, self._label(schema)))
+        result = self.output.call(fetch, lambda text: self.output.parse(text, schema), self._label(schema))
+        return {} if result is None else result
+
+    async def ask_json_async(self, prompt: str, schema=None, prefix=None):
+        async def fetch():
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return self.answer_text(self._send(prompt, prefix, self._label(schema)))
+        result = await self.output.acall(fetch, lambda text: self.output.parse(text, schema), self._label(schema))
+        return {} if result is None else result
+
+    async def stream_text_async(self, prompt: str, prefix=None):
+        """
+        plain text talk in two-character chunks, `latency` is the time to the first one
+        """
+        with self.lock:
+            self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        text = "大家好喵～今天也要開心喵"
+        for i in range(0, len(text), 2):
+            yield text[i:i + 2]
+
+    async def ask_json_many(self, prompts, schema=None, prefix=None):
+        return await asyncio.gather(*(self.ask_json_async(p, schema, prefix) for p in prompts))
+
+
+def stub_png(width, height, rgb):
+    """
+    a single colour PNG built with zlib only, stands in for a downloaded cover
+    """
+    def chunk(kind, body):
+        return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+    row = b"\x00" + bytes(rgb) * width
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(row * height))
+            + chunk(b"IEND", b""))
+
+
+class OfflineGM:
+    """
+    offline backend with the QwenGM interface, returns a fake image url
+    fetch_bytes(url) "downloads" it: a small PNG whose colour depends on the url
+    """
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def ask_json(self, prompt: str):
+        with self.lock:
+            self.calls += 1
+            return f"offline://cover/{self.calls}.png"
+
+    async def ask_json_async(self, prompt: str):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.ask_json(prompt)
+
+    def fetch_bytes(self, url: str):
+        if not url.startswith("offline://"):
+            raise ValueError(f"not an offline url: {url}")
+        return stub_png(416, 232, hashlib.sha256(url.encode("utf-8")).digest()[:3])
+
+    async def fetch_bytes_async(self, url: str):
+        return self.fetch_bytes(url)
@@ -0,0 +1,151 @@
+import re
+import time
+import threading
+
+import sys
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from configs.settings import PROMPT_TEMPLATE_CHECK_INTERVAL
+
+TEMPLATE_DIR = project_root / "configs" / "prompt_templates"
+
+# {name} placeholders; JSON examples in the templates ({"tweet": ...}) never match
+PLACEHOLDER = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+
+def persona_header(persona, traits=True):
+    """
+    the persona block every persona prompt starts with
+    """
+    header = (
+        f"主播名字：{persona['name']}\n"
+        f"說話風格：{persona['style']}\n"
+    )
+    if traits:
+        header += f"行為特徵：{persona['behavior_traits']}\n"
+    return header + "\n"
+
+
+class Template:
+    """
+    a template split once into literal chunks and placeholder names
+    - render() is one pass: values are never scanned for placeholders again
+    - placeholders without a value stay as written
+    """
+    def __init__(self, name, text, mtime_ns=None):
+        self.name = name
+        self.text = text
+        self.mtime_ns = mtime_ns
+        parts = PLACEHOLDER.split(text)
+        self.literals = parts[0::2]
+        self.names = parts[1::2]
+        self.checked = time.monotonic()
+
+    def render(self, values=None, **kwargs):
+        if not self.names:
+            return self.text
+        return self.render_split((), values, **kwargs)[0]
+
+    def render_split(self, variable, values=None, **kwargs):
+        """
+        (prefix, suffix): the prefix ends right before the first placeholder named in
+        `variable`, so it stays byte-identical between calls and a provider can cache it
+        """
+        if values:
+            kwargs.update(values)
+        out, prefix = [self.literals[0]], None
+        for name, literal in zip(self.names, self.literals[1:]):
+            if prefix is None and name in variable:
+                prefix, out = "".join(out), []
+            value = kwargs.get(name)
+            out.append("{" + name + "}" if value is None else str(value))
+            out.append(literal)
+        if prefix is None:
+            return "".join(out), ""
+        return prefix, "".join(out)
+
+
+class TemplateRegistry:
+    """
+    configs/prompt_templates compiled once per process
+    - get(name) returns the compiled Template, a file is only re-read when its mtime changed,
+      and its mtime is checked at most every check_interval seconds
+    - persona headers are cached per persona dict (persona dicts are never mutated at runtime)
+    """
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, template_dir=TEMPLATE_DIR, check_interval=PROMPT_TEMPLATE_CHECK_INTERVAL):
+        self.template_dir = Path(template_dir)
+        self.check_interval = check_interval
+        self.templates = {}
+        self.personas = {}              # (id(persona), traits) -> (persona, header)
+        self.lock = threading.Lock()
+        self.reloads = 0
+        self.load_all()
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def load_all(self):
+        for path in sorted(self.template_dir.glob("*.txt")):
+            self._load(path.name)
+
+    def _load(self, name):
+        path = self.template_dir / name
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+            template = Template(name, path.read_text(encoding="utf-8"), mtime_ns)
+        except OSError:
+            template = Template(name, "", None)
+        with self.lock:
+            if name in self.templates:
+                self.reloads += 1
+                print(f"[Templates] Reloaded {name}")
+            self.templates[name] = template
+        return template
+
+    def get(self, name):
+        template = self.templates.get(name)
+        if template is None:
+            return self._load(name)
+        now = time.monotonic()
+        if now - template.checked >= self.check_interval:
+            template.checked = now
+            try:
+                mtime_ns = (self.template_dir / name).stat().st_mtime_ns
+            except OSError:
+                mtime_ns = None
+            if mtime_ns != template.mtime_ns:
+                return self._load(name)
+        return template
+
+    def text(self, name):
+        return self.get(name).text
+
+    def render(self, name, values=None, **kwargs):
+        return self.get(name).render(values, **kwargs)
+
+    def render_split(self, name, variable, values=None, **kwargs):
+        return self.get(name).render_split(variable, values, **kwargs)
+
+    def persona_header(self, persona, traits=True):
+        key = (id(persona), traits)
+        entry = self.personas.get(key)
+        if entry is None or entry[0] is not persona:
+            entry = (persona, persona_header(persona, traits))
+            with self.lock:
+                self.personas[key] = entry
+        return entry[1]
+
+
+if __name__ == "__main__":
+    registry = TemplateRegistry()
+    for name, template in sorted(registry.templates.items()):
+        print(f"{name:<24} {len(template.text):>6} chars  placeholders={template.names}")
@@ -0,0 +1,174 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import sys
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from configs.settings import (
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_TTL,
+    LLM_CACHE_DB,
+    LLM_CACHE_MAX_DISK_ENTRIES,
+)
+
+
+class ResponseCache:
+    """
+    content-addressed cache for llm responses
+    - key: sha256 of (model, prompt, response_format)
+    - memory tier: LRU, at most max_entries
+    - disk tier (optional): sqlite file, at most max_disk_entries, survives restarts
+    - ttl: seconds an entry stays valid, None = forever
+    values are stored as raw text, every hit returns a fresh object so callers
+    can mutate the result (normalize / started flags) without touching the cache.
+    """
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_entries=LLM_CACHE_MAX_ENTRIES, ttl=LLM_CACHE_TTL, db_path=None,
+                 max_disk_entries=LLM_CACHE_MAX_DISK_ENTRIES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.memory = OrderedDict()     # key -> (created, text)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.db = None
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self.db = sqlite3.connect(str(db_path), check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed)")
+            self.db.commit()
+
+    @classmethod
+    def shared(cls):
+        """
+        process wide cache built from configs/settings.py
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(db_path=LLM_CACHE_DB)
+            return cls._shared
+
+    @staticmethod
+    def make_key(model, prompt, response_format=None):
+        raw = json.dumps([model, prompt, response_format], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key):
+        """
+        return cached text or None
+        """
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                created, text = entry
+                if not self._expired(created, now):
+                    self.memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return text
+                del self.memory[key]
+
+            if self.db is not None:
+                row = self.db.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    text, created = row
+                    if not self._expired(created, now):
+                        self.db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                        self.db.commit()
+                        self._remember(key, created, text)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return text
+                    self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.db.commit()
+
+            self.misses += 1
+            return None
+
+    def put(self, key, text):
+        now = time.time()
+        with self.lock:
+            self._remember(key, now, text)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, text, now, now)
+                )
+                self._trim_disk()
+                self.db.commit()
+
+    def get_json(self, key):
+        text = self.get(key)
+        if text is None:
+            return None
+        return json.loads(text)
+
+    def put_json(self, key, value):
+        self.put(key, json.dumps(value, ensure_ascii=False))
+
+    def _remember(self, key, created, text):
+        self.memory[key] = (created, text)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+            self.evictions += 1
+
+    def _trim_disk(self):
+        count = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        overflow = count - self.max_disk_entries
+        if overflow > 0:
+            self.db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                (overflow,)
+            )
+            self.evictions += overflow
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM responses")
+                self.db.commit()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            disk_size = 0
+            if self.db is not None:
+                disk_size = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_size": len(self.memory),
+                "disk_size": disk_size,
+            }
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
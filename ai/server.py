@@ -1,28 +1,83 @@
+import os
+import sys
+import json
+from contextlib import asynccontextmanager
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from transformers import AutoModelForCausalLM, AutoTokenizer
 import torch
 
-app = FastAPI()
+from ai.inference import BatchedGenerator, persona_prefix
+from configs.persona_config import persona
+from configs.settings import SERVER_MODEL_PATH
 
-# 模型路径
-model_path = "/Models/Deepseek-r1-1.5b-wenyehuan"
+# 模型路径，可用环境变量 VTUBER_MODEL_PATH 覆盖（例如换成小模型做压测）
+model_path = os.environ.get("VTUBER_MODEL_PATH", SERVER_MODEL_PATH)
 
 # 加载 tokenizer （分词器）
 tokenizer = AutoTokenizer.from_pretrained(model_path)
 
 # 加载模型并移动到可用设备（GPU/CPU）
 device = "cuda" if torch.cuda.is_available() else "cpu"
-model = AutoModelForCausalLM.from_pretrained(model_path).to(device)
+model = AutoModelForCausalLM.from_pretrained(model_path).to(device).eval()
+
+# 请求排队、动态合批，人设前缀的 KV cache 只算一次
+generator = BatchedGenerator(model, tokenizer, device, prefixes=[persona_prefix(persona)])
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await generator.start()
+    yield
+    await generator.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+
+class GenerateRequest(BaseModel):
+    prompt: str
+    max_new_tokens: int | None = None
+    prefix: str | None = None
+
 
 @app.get("/generate")
-async def generate_text(prompt: str):
-    # 使用 tokenizer 编码输入的 prompt
-    inputs = tokenizer(prompt, return_tensors="pt").to(device)
-    
-    # 使用模型生成文本
-    outputs = model.generate(inputs["input_ids"], max_length=1000)
-    
-    # 解码生成的输出
-    generated_text = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    
-    return {"generated_text": generated_text}
\ No newline at end of file
+async def generate_text(prompt: str, max_new_tokens: int | None = None, prefix: str | None = None):
+    """
+    只返回新生成的文本（不含 prompt）
+    usage: prompt_tokens / cached_tokens（前缀命中 KV cache 的 token 数）/ prefill_saved（省下的预填充秒数）
+    """
+    text, usage = await generator.complete(prompt, max_new_tokens, prefix)
+    return {"generated_text": text, "usage": usage}
+
+
+@app.post("/generate")
+async def generate_text_post(request: GenerateRequest):
+    # 长 prompt 用 POST，避免 URL 过长
+    text, usage = await generator.complete(request.prompt, request.max_new_tokens, request.prefix)
+    return {"generated_text": text, "usage": usage}
+
+
+@app.get("/generate_stream")
+async def generate_text_stream(prompt: str, max_new_tokens: int | None = None, prefix: str | None = None):
+    """
+    逐段返回生成结果，每行一个 {"delta": str}，首个 token 生成后即开始发送
+    最后一行是 {"usage": ...}
+    """
+    async def chunks():
+        usage = {}
+        async for text in generator.stream(prompt, max_new_tokens, prefix, usage):
+            yield json.dumps({"delta": text}, ensure_ascii=False) + "\n"
+        yield json.dumps({"usage": usage}) + "\n"
+
+    return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+
+@app.get("/stats")
+async def stats():
+    # requests/sec、p50/p99 延迟、合批大小、前缀缓存命中与省下的预填充时间
+    return generator.stats()
@@ -0,0 +1,62 @@
+import json
+import threading
+from collections import deque
+
+
+def sse_data(line):
+    """
+    JSON payload of one server-sent-events line ("data:{...}"), None for other fields
+    (id:, event:, :comments) and malformed data
+    """
+    if not line.startswith("data:"):
+        return None
+    try:
+        return json.loads(line[5:])
+    except ValueError:
+        return None
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class StreamStats:
+    """
+    latency of streamed answers, the last `window` ones
+    - ttft: seconds from sending the request to the first chunk (the dead air viewers hear)
+    - total: seconds until the last chunk
+    """
+    def __init__(self, window=1000):
+        self.ttft = deque(maxlen=window)
+        self.total = deque(maxlen=window)
+        self.count = 0
+        self.chunks = 0
+        self.empty = 0
+        self.lock = threading.Lock()
+
+    def record(self, ttft, total, chunks):
+        with self.lock:
+            self.count += 1
+            self.chunks += chunks
+            if ttft is None:
+                self.empty += 1
+                return
+            self.ttft.append(ttft)
+            self.total.append(total)
+
+    def stats(self):
+        with self.lock:
+            ttft, total = list(self.ttft), list(self.total)
+            return {
+                "streams": self.count,
+                "empty": self.empty,
+                "chunks": self.chunks,
+                "ttft_p50": percentile(ttft, 0.5),
+                "ttft_p95": percentile(ttft, 0.95),
+                "ttft_max": max(ttft) if ttft else None,
+                "total_p50": percentile(total, 0.5),
+                "total_p95": percentile(total, 0.95),
+            }
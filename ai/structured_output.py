@@ -0,0 +1,250 @@
+import re
+import ast
+import json
+import threading
+
+import sys
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from configs.settings import LLM_JSON_RETRIES, LLM_JSON_BACKOFF
+from utils.clock import REAL_CLOCK
+
+# expected shape of every call site's answer
+# - str: non empty string, bool / list / dict: that type
+# - [spec]: list whose items match spec, {...}: nested object
+SCHEMAS = {
+    "todolist": {"tasks": list},
+    "contents": {"contents": [str]},
+    "tweet": {"tweet": str},
+    "project": {"project_name": str, "project_content": str},
+    "email": {"email": str},
+    "talk": {"talk": str},
+    "review": {"approved": bool},
+    "games": {"games": list},
+}
+
+FENCE = re.compile(r"^```[\w-]*\s*|\s*```$")
+MAX_LITERAL_LENGTH = 100000     # ast.literal_eval is only tried on reasonably sized answers
+
+
+class StructuredOutputError(ValueError):
+    """
+    the answer did not parse or did not match its schema
+    """
+
+
+def _scan_json(text):
+    """
+    drop trailing commas and turn “smart quotes” used as delimiters into plain ones,
+    strings are copied untouched
+    """
+    out = []
+    in_string = None            # the quote that opened the current string
+    escape = False
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"' or (in_string == "“" and c == "”"):
+                c = '"'
+                in_string = None
+            out.append(c)
+        elif c in '"“”':
+            out.append('"')
+            in_string = "“" if c in "“”" else '"'
+        elif c == ",":
+            j = i + 1
+            while j < n and text[j].isspace():
+                j += 1
+            if j >= n or text[j] not in "}]":
+                out.append(c)
+        else:
+            out.append(c)
+        i += 1
+    return "".join(out)
+
+
+def repair_json(text):
+    """
+    cheap local repair before asking the llm again:
+    - markdown fences and prose around the object
+    - trailing commas, smart quotes as delimiters
+    - python style literals ({'talk': 'hi'}, True / False)
+    :return: (value, repaired) where repaired tells whether the raw text needed fixing
+    """
+    if not isinstance(text, str):
+        raise StructuredOutputError(f"expected text, got {type(text).__name__}")
+    try:
+        return json.loads(text), False
+    except ValueError:
+        pass
+
+    body = FENCE.sub("", text.strip())
+    start = min([i for i in (body.find("{"), body.find("[")) if i >= 0], default=-1)
+    if start < 0:
+        raise StructuredOutputError(f"no JSON object in answer: {text[:80]!r}")
+    end = max(body.rfind("}"), body.rfind("]"))
+    body = body[start:end + 1] if end > start else body[start:]
+
+    for candidate in (body, _scan_json(body)):
+        try:
+            return json.loads(candidate), True
+        except ValueError:
+            pass
+    if len(body) <= MAX_LITERAL_LENGTH:
+        try:
+            value = ast.literal_eval(body)
+            if isinstance(value, (dict, list)):
+                return json.loads(json.dumps(value, ensure_ascii=False)), True
+        except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+            pass
+    raise StructuredOutputError(f"unrepairable JSON: {text[:80]!r}")
+
+
+def validate(value, spec, path="$"):
+    """
+    :return: list of problems, empty when value matches spec
+    """
+    if isinstance(spec, dict):
+        if not isinstance(value, dict):
+            return [f"{path}: expected object"]
+        errors = []
+        for key, sub in spec.items():
+            if key not in value:
+                errors.append(f"{path}.{key}: missing")
+            else:
+                errors += validate(value[key], sub, f"{path}.{key}")
+        return errors
+    if isinstance(spec, list):
+        if not isinstance(value, list):
+            return [f"{path}: expected list"]
+        errors = []
+        for i, item in enumerate(value):
+            errors += validate(item, spec[0], f"{path}[{i}]")
+        return errors
+    if spec is str:
+        return [] if isinstance(value, str) and value.strip() else [f"{path}: expected non-empty string"]
+    return [] if isinstance(value, spec) else [f"{path}: expected {spec.__name__}"]
+
+
+class StructuredOutput:
+    """
+    response handling shared by the llm clients
+    - parse: local repair, then schema check (SCHEMAS[name] or a spec)
+    - call / acall: fetch, parse, on failure retry up to `retries` times with
+      exponential backoff on the client's clock
+    - counters per call site: repair rate, retries, failures, see stats()
+    """
+    def __init__(self, retries=LLM_JSON_RETRIES, backoff=LLM_JSON_BACKOFF, clock=None):
+        self.retries = retries
+        self.backoff = backoff
+        self.clock = clock or REAL_CLOCK
+        self.lock = threading.Lock()
+        self.counters = {}          # label -> {"calls", "ok", "repaired", "retries", "failed"}
+
+    def parse(self, text, schema=None):
+        """
+        :return: (value, repaired), raises StructuredOutputError
+        """
+        value, repaired = repair_json(text)
+        spec = SCHEMAS[schema] if isinstance(schema, str) else schema
+        if spec is not None:
+            errors = validate(value, spec)
+            if errors:
+                raise StructuredOutputError("; ".join(errors[:3]))
+        return value, repaired
+
+    def delay(self, attempt):
+        return self.backoff * (2 ** attempt)
+
+    def call(self, fetch, parse, label="json", abort=None):
+        """
+        :param fetch: () -> raw answer, None on transport errors
+        :param parse: raw answer -> (value, repaired)
+        :param abort: () -> True when retrying is pointless (backend down), checked before each retry
+        :return: value, None when every attempt failed
+        """
+        for attempt in range(self.retries + 1):
+            result = self._attempt(parse, fetch(), label, attempt)
+            if not isinstance(result, StructuredOutputError):
+                return result
+            if abort is not None and abort():
+                break
+            if attempt < self.retries:
+                self.clock.sleep(self.delay(attempt))
+        return self._give_up(label, result)
+
+    async def acall(self, fetch, parse, label="json", abort=None):
+        """
+        call() for coroutine fetchers, the backoff does not block the event loop
+        """
+        for attempt in range(self.retries + 1):
+            result = self._attempt(parse, await fetch(), label, attempt)
+            if not isinstance(result, StructuredOutputError):
+                return result
+            if abort is not None and abort():
+                break
+            if attempt < self.retries:
+                await self.clock.asleep(self.delay(attempt))
+        return self._give_up(label, result)
+
+    def _attempt(self, parse, raw, label, attempt):
+        """
+        the parsed value, or the StructuredOutputError to retry on
+        """
+        try:
+            if raw is None:
+                raise StructuredOutputError("no response")
+            value, repaired = parse(raw)
+        except StructuredOutputError as e:
+            print(f"[Output] {label} attempt {attempt + 1}/{self.retries + 1} rejected: {e}")
+            self._count(label, retries=int(attempt < self.retries), calls=int(attempt == 0))
+            return e
+        self._count(label, ok=1, repaired=int(repaired), calls=int(attempt == 0))
+        return value
+
+    def _give_up(self, label, error):
+        self._count(label, failed=1)
+        print(f"[Output] {label} failed: {error}")
+        return None
+
+    def _count(self, label, **deltas):
+        with self.lock:
+            counter = self.counters.setdefault(label, {"calls": 0, "ok": 0, "repaired": 0, "retries": 0, "failed": 0})
+            for key, delta in deltas.items():
+                counter[key] += delta
+
+    def stats(self):
+        with self.lock:
+            per_label = {label: dict(c) for label, c in self.counters.items()}
+        total = {"calls": 0, "ok": 0, "repaired": 0, "retries": 0, "failed": 0}
+        for counter in per_label.values():
+            for key in total:
+                total[key] += counter[key]
+        total["repair_rate"] = total["repaired"] / total["ok"] if total["ok"] else 0.0
+        total["retries_per_call"] = total["retries"] / total["calls"] if total["calls"] else 0.0
+        total["failure_rate"] = total["failed"] / total["calls"] if total["calls"] else 0.0
+        total["by_schema"] = per_label
+        return total
+
+
+if __name__ == "__main__":
+    output = StructuredOutput()
+    samples = [
+        ('{"tweet": "今晚一起玩游戏喵！"}', "tweet"),
+        ('```json\n{"tweet": "今晚一起玩游戏喵！",}\n```', "tweet"),
+        ("好的，這是結果：{'talk': '大家好喵～'}", "talk"),
+        ('{“tasks": [{"type": "stream", "start_time": "20:00",},]}', "todolist"),
+        ('{"tweet": ""}', "tweet"),
+    ]
+    for sample, schema in samples:
+        try:
+            print(output.parse(sample, schema), "<-", repr(sample))
+        except StructuredOutputError as e:
+            print("rejected:", e, "<-", repr(sample))
@@ -0,0 +1,183 @@
+import json
+import asyncio
+import argparse
+import itertools
+
+import sys
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from aiohttp import web
+
+from ai.llm_client import TEXT_GENERATION_PATH, MULTIMODAL_GENERATION_PATH
+from ai.offline_llm import stub_png
+
+
+class StubDashScopeServer:
+    """
+    DashScope look-alike for QwenLLM / QwenGM without an api key or network
+    - POST TEXT_GENERATION_PATH -> {"output": {"text"}, "usage", "request_id"}, the text is a JSON
+      object echoing the last user message; SSE events (incremental_output) when X-DashScope-SSE is set
+    - POST MULTIMODAL_GENERATION_PATH -> {"output": {"choices": [{"message": {"content": [{"image"}]}}]}}
+      with an image url served by GET /images/<name>.png
+    - latency: seconds before every answer
+    - error_status: HTTP status with a DashScope error body, on every `error_every`-th request
+      (0: on every request), None answers everything
+    """
+    def __init__(self, host="127.0.0.1", port=8001, latency=0.0, error_status=None, error_every=0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_status = error_status
+        self.error_every = error_every
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.ids = itertools.count(1)
+        self.runner = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def failing(self, number):
+        if self.error_status is None:
+            return False
+        return not self.error_every or number % self.error_every == 0
+
+    def error(self, request_id):
+        self.errors += 1
+        code = "Throttling.RateQuota" if self.error_status == 429 else "InternalError"
+        return web.json_response({"code": code, "message": f"stub error {self.error_status}",
+                                  "request_id": request_id}, status=self.error_status)
+
+    @staticmethod
+    def prompt_of(body):
+        messages = (body.get("input") or {}).get("messages") or []
+        content = messages[-1].get("content", "") if messages else ""
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+        return content
+
+    @staticmethod
+    def usage(body, text):
+        messages = (body.get("input") or {}).get("messages") or []
+        prompt = sum(len(json.dumps(m.get("content", ""), ensure_ascii=False)) for m in messages)
+        return {"input_tokens": prompt, "output_tokens": len(text), "total_tokens": prompt + len(text),
+                "prompt_tokens_details": {"cached_tokens": 0}}
+
+    async def _begin(self):
+        self.requests += 1
+        number = self.requests
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.latency)
+        return number
+
+    async def text_generation(self, request):
+        body = await request.json()
+        request_id = f"stub-{next(self.ids)}"
+        number = await self._begin()
+        try:
+            if self.failing(number):
+                return self.error(request_id)
+            prompt = self.prompt_of(body)
+            text = json.dumps({"request_id": request_id, "echo": prompt[:40]}, ensure_ascii=False)
+            if request.headers.get("X-DashScope-SSE") == "enable":
+                return await self.sse(request, body, text, request_id)
+            return web.json_response({
+                "output": {"text": text, "finish_reason": "stop"},
+                "usage": self.usage(body, text),
+                "request_id": request_id,
+            })
+        finally:
+            self.in_flight -= 1
+
+    async def sse(self, request, body, text, request_id):
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        for i in range(0, len(text), 8):
+            last = i + 8 >= len(text)
+            event = {"output": {"text": text[i:i + 8], "finish_reason": "stop" if last else "null"},
+                     "usage": self.usage(body, text[:i + 8]), "request_id": request_id}
+            await resp.write(f"id:{i // 8 + 1}\nevent:result\n:HTTP_STATUS/200\n"
+                             f"data:{json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+        await resp.write_eof()
+        return resp
+
+    async def multimodal_generation(self, request):
+        body = await request.json()
+        request_id = f"stub-{next(self.ids)}"
+        number = await self._begin()
+        try:
+            if self.failing(number):
+                return self.error(request_id)
+            image = f"{self.url}/images/{request_id}.png"
+            return web.json_response({
+                "output": {"choices": [{"finish_reason": "stop", "message": {
+                    "role": "assistant", "content": [{"image": image}]}}]},
+                "usage": {"width": 1664, "height": 928, "image_count": 1},
+                "request_id": request_id,
+            })
+        finally:
+            self.in_flight -= 1
+
+    async def image(self, request):
+        seed = sum(request.match_info["name"].encode("utf-8"))
+        return web.Response(body=stub_png(416, 232, (seed % 256, seed * 7 % 256, seed * 13 % 256)),
+                            content_type="image/png")
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post(TEXT_GENERATION_PATH, self.text_generation)
+        app.router.add_post(MULTIMODAL_GENERATION_PATH, self.multimodal_generation)
+        app.router.add_get("/images/{name}", self.image)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        print(f"[StubDashScope] Listening on {self.url}")
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DashScope stand-in for QwenLLM / QwenGM")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--error-status", type=int, default=None)
+    parser.add_argument("--error-every", type=int, default=0)
+    parser.add_argument("--serve", action="store_true", help="keep serving instead of running the demo")
+    args = parser.parse_args()
+
+    async def main():
+        import time
+        from ai.llm_client import QwenLLM, QwenGM
+
+        server = StubDashScopeServer(port=args.port, latency=args.latency,
+                                     error_status=args.error_status, error_every=args.error_every)
+        await server.start()
+        if args.serve:
+            await asyncio.Event().wait()
+
+        llm = QwenLLM(api_key="stub", base_url=server.url, cache=False)
+        prompts = [f"第{i}則推文" for i in range(args.requests)]
+        t0 = time.perf_counter()
+        results = await llm.ask_json_many(prompts)
+        wall = time.perf_counter() - t0
+        print(f"[StubDashScope] {len(results)} ask_json_many answers in {wall:.2f}s "
+              f"(sequential would be {args.requests * args.latency:.2f}s), "
+              f"max in flight {server.max_in_flight}, errors {server.errors}")
+        print(results[0], llm.output.stats())
+
+        gm = QwenGM(api_key="stub", base_url=server.url)
+        url = await gm.ask_json_async("製作直播封面")
+        print(url, len(await gm.fetch_bytes_async(url)), "bytes")
+        await llm.pool.close()
+        await server.stop()
+
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+import json
+import asyncio
+import argparse
+
+import sys
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from aiohttp import web
+
+THINK = "<think>觀衆在打招呼，回一句可愛的。</think>"      # R1 style reasoning the client has to drop
+TALK = "大家好喵～今天也要開心喵"
+
+
+class StubVtuberServer:
+    """
+    ai/server.py look-alike without a model, for running DeepseekVtuber and the agent
+    on machines without a GPU
+    - GET/POST /generate -> {"generated_text", "usage"}, JSON when the prompt asks for it, else plain talk
+    - GET /generate_stream -> {"delta"} lines, then one {"usage"} line
+    - usage counts characters as tokens, a prefix seen before counts as cached
+    - latency: seconds before the answer (before the first chunk when streaming)
+    """
+    def __init__(self, host="127.0.0.1", port=8000, latency=0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.requests = 0
+        self.prefixes = set()
+        self.runner = None
+
+    def usage(self, prefix, prompt):
+        cached = len(prefix) if prefix in self.prefixes else 0
+        if prefix:
+            self.prefixes.add(prefix)
+        return {"prompt_tokens": len(prefix) + len(prompt), "cached_tokens": cached, "prefill_saved": 0.0}
+
+    def answer(self, prompt):
+        if "talk" in prompt and "json" in prompt:
+            return THINK + json.dumps({"talk": TALK}, ensure_ascii=False)
+        if '"tweet"' in prompt:
+            return THINK + '{"tweet": "今晚一起玩游戏喵！"}'
+        return THINK + TALK
+
+    async def generate(self, request):
+        self.requests += 1
+        body = await request.json() if request.method == "POST" else request.query
+        prompt, prefix = body.get("prompt", ""), body.get("prefix") or ""
+        await asyncio.sleep(self.latency)
+        return web.json_response({"generated_text": self.answer(prefix + prompt),
+                                  "usage": self.usage(prefix, prompt)})
+
+    async def generate_stream(self, request):
+        self.requests += 1
+        prompt, prefix = request.query.get("prompt", ""), request.query.get("prefix", "")
+        text = self.answer(prefix + prompt)
+        resp = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await resp.prepare(request)
+        await asyncio.sleep(self.latency)
+        for i in range(0, len(text), 3):
+            await resp.write((json.dumps({"delta": text[i:i + 3]}, ensure_ascii=False) + "\n").encode("utf-8"))
+        await resp.write((json.dumps({"usage": self.usage(prefix, prompt)}) + "\n").encode("utf-8"))
+        await resp.write_eof()
+        return resp
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/generate", self.generate)
+        app.router.add_post("/generate", self.generate)
+        app.router.add_get("/generate_stream", self.generate_stream)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        print(f"[StubServer] Listening on http://{self.host}:{self.port}")
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="model-free stand-in for ai/server.py")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    async def main():
+        await StubVtuberServer(port=args.port, latency=args.latency).start()
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
@@ -1,105 +1,263 @@
 import sys
 import json
 import time
+import itertools
 from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from ai.llm_client import QwenLLM,QwenGM,DeepseekVtuber
-from configs.persona_config import persona
+from ai.async_pool import run_sync
+from ai.streaming import StreamStats
+from ai.prompt_templates import TemplateRegistry
+from configs.persona_config import persona as default_persona
+from utils.clock import REAL_CLOCK
+from utils.mailbox import MailStore, COMPANY
+from utils.asset_store import AssetStore, cover_key, sniff
+from behavior.prefetch import TaskResultCache, task_key
+from configs.settings import TASK_BACKENDS, UNITY_COVER_DELIVERY
 
 class Executor:
     """
     - post something on tweet
     - generate cover
+    every task is a coroutine (xxx_async) so several tasks can share the llm pool,
+    the sync methods keep the old interface and block until the task is done.
     """
-    def __init__(self, unity_bridge, api_key=None, base_url=None, model=None):
-        self.llm = QwenLLM(api_key, base_url, model)
-        self.gm = QwenGM(api_key, base_url, model)
-        #self.dk = DeepseekVtuber()
+    def __init__(self, unity_bridge, api_key=None, base_url=None, model=None,
+                 llm=None, gm=None, root_path=None, clock=None, persona=None,
+                 backends=None, deepseek=None, assets=None):
+        """
+        :param llm/gm: backends with ask_json_async, default to QwenLLM/QwenGM
+        :param backends: task kind (talk/tweet/project/email/cover) -> "llm" / "gm" / "deepseek"
+                         or a client, defaults to TASK_BACKENDS unless an llm is injected
+        :param deepseek: DeepseekVtuber for "deepseek" tasks, created on first use
+        :param persona: persona dict, defaults to configs/persona_config.py
+        :param root_path: data root, mails go to the mailbox store in <root>/data,
+                          covers to the asset store in <root>/data/assets
+        :param assets: AssetStore, defaults to the one of the data root
+        :param clock: paces the pauses between steps, a ManualClock skips them (headless simulation)
+        """
+        self.clock = clock or REAL_CLOCK
+        self.llm = llm or QwenLLM(api_key, base_url, model, clock=self.clock)
+        self.gm = gm or QwenGM(api_key, base_url, model, clock=self.clock)
+        self.deepseek = deepseek
+        # an injected llm (offline / test backend) answers every text task unless told otherwise
+        self.backends = dict(backends if backends is not None else ({} if llm else TASK_BACKENDS))
         self.unity_bridge = unity_bridge
+        self.data_dir = Path(root_path) / "data" if root_path else project_root / "data"
+        self.mailbox = MailStore.open(self.data_dir)
+        self.assets = assets or AssetStore.open(self.data_dir)
+        # llm output prefetched before a task starts (behavior/prefetch.py)
+        self.results = TaskResultCache()
+        self.persona = persona or default_persona
+        self.templates = TemplateRegistry.shared()
+        self.talk_ids = itertools.count(1)
+        self.stream_stats = StreamStats()
+
+    async def pause(self, seconds):
+        await self.clock.asleep(seconds)
+
+    def persona_prompt(self, template, content):
+        """
+        (prefix, prompt): persona header + template stay the same between calls and go as the
+        cacheable prefix, the task content as user input is the variable part
+        """
+        return (self.templates.persona_header(self.persona) + self.templates.text(template),
+                f"\n[使用者輸入]\n{content}\n")
+
+    def backend(self, kind):
+        name = self.backends.get(kind, "gm" if kind == "cover" else "llm")
+        if not isinstance(name, str):
+            return name
+        if name == "deepseek":
+            if self.deepseek is None:
+                self.deepseek = DeepseekVtuber(clock=self.clock)
+            return self.deepseek
+        return self.gm if name == "gm" else self.llm
+
+    async def ask_async(self, kind, prompt, schema=None, prefix=None):
+        """
+        ask the backend configured for this kind of task, the cloud llm answers when another one fails
+        prefix: stable part of the prompt, sent in front of it and cached by the backend
+        """
+        backend = self.backend(kind)
+        response = await backend.ask_json_async(prompt, schema=schema, prefix=prefix)
+        if not response and backend is not self.llm:
+            print(f"\n[Executor] {kind} backend gave no answer, asking the cloud llm\n")
+            response = await self.llm.ask_json_async(prompt, schema=schema, prefix=prefix)
+        return response
+
+    async def prepared(self, task, step, make):
+        """
+        the prefetched result of this task step, make() generates it live on a miss
+        """
+        result = await self.results.take(task_key(task, step))
+        if result:
+            print(f"\n[Executor] Using prefetched {step}\n")
+            return result
+        return await make()
+
+    def prefetch(self, task, game_time):
+        """
+        reserve result slots for the llm work of a task and return the coroutine filling them,
+        None for tasks with nothing to generate ahead
+        game_time: when the task will start
+        """
+        kind, results = task.get("type", ""), self.results
+        if kind == "tweet" and task.get("category") in ("preview", "communication"):
+            slot = results.reserve(task_key(task, "tweet"))
+            return results.fill(slot, lambda: self.tweet_async(task))
+        if kind == "cover":
+            slot = results.reserve(task_key(task, "cover"))
+            return results.fill(slot, lambda: self.cover_asset_async(task, game_time))
+        if kind == "project":
+            project_slot = results.reserve(task_key(task, "project"))
+            email_slot = results.reserve(task_key(task, "email"))
+
+            async def project_and_email():
+                project_json = await results.fill(project_slot, lambda: self.project_async(task))
+                if project_json:
+                    await results.fill(email_slot, lambda: self.email_async(project_json))
+                else:
+                    results.skip(email_slot)
+            return project_and_email()
+        if kind == "stream":
+            slots = [(results.reserve(task_key(task, f"talk{i}")), line)
+                     for i, line in enumerate(self.stream_lines(task))]
+
+            async def lines():
+                for slot, (instruction, content) in slots:
+                    await results.fill(slot, lambda i=instruction, c=content: self.line_async(i, c))
+            return lines()
+        return None
+
+    async def tweet_async(self, tweet_task):
+        content = tweet_task.get("content","")
+        prefix, final_prompt = self.persona_prompt("tweet.txt", content)
+        print(f"\n[Tweet] Using prompt as \n{prefix}{final_prompt}\n")
+        return await self.ask_async("tweet", final_prompt, schema="tweet", prefix=prefix)
     
     def post_preview(self, tweet_task):
-        print("\n[Tweet] Post today's stream preview...\n")
-        content = tweet_task.get("content","")
-        template_path = project_root / "configs" / "prompt_templates" / "tweet.txt"
-        p = template_path.read_text(encoding="utf-8")
-
-        final_prompt = ""
-        final_prompt += (
-            f"主播名字：{persona['name']}\n"
-            f"説話風格：{persona['style']}\n"
-            f"行爲特徵：{persona['behavior_traits']}\n"
-            "\n"
-        )
+        return run_sync(self.post_preview_async(tweet_task))
 
-        final_prompt += p
-        final_prompt += f"\n[使用者輸入]\n{content}\n"
-        print(f"\n[Tweet] Using prompt as \n{final_prompt}\n")
-        response = self.llm.ask_json(final_prompt)
+    async def post_preview_async(self, tweet_task):
+        print("\n[Tweet] Post today's stream preview...\n")
+        response = await self.prepared(tweet_task, "tweet", lambda: self.tweet_async(tweet_task))
         tweet_content = response.get("tweet","")
+        if not tweet_content:
+            print("\n[Tweet] No usable tweet, nothing posted\n")
+            return
         self.unity_bridge.send_tweet_update(tweet_content)
         print(f"\n[Tweet] Get prompt as \n{tweet_content}\n")
 
     def post_communication(self, tweet_task):
-        print("\n[Tweet] Post communication tag...\n")
-        content = tweet_task.get("content","")
-        template_path = project_root / "configs" / "prompt_templates" / "tweet.txt"
-        p = template_path.read_text(encoding="utf-8")
-
-        final_prompt = ""
-        final_prompt += (
-            f"主播名字：{persona['name']}\n"
-            f"説話風格：{persona['style']}\n"
-            f"行爲特徵：{persona['behavior_traits']}\n"
-            "\n"
-        )
+        return run_sync(self.post_communication_async(tweet_task))
 
-        final_prompt += p
-        final_prompt += f"\n[使用者輸入]\n{content}\n"
-        print(f"\n[Tweet] Using prompt as \n{final_prompt}\n")
-        response = self.llm.ask_json(final_prompt)
+    async def post_communication_async(self, tweet_task):
+        print("\n[Tweet] Post communication tag...\n")
+        response = await self.prepared(tweet_task, "tweet", lambda: self.tweet_async(tweet_task))
         print(f"\n[Tweet] Get tweet as \n{response}\n")
 
     def generate_cover(self, cover_task, game_time):
+        return run_sync(self.generate_cover_async(cover_task, game_time))
+
+    async def generate_cover_async(self, cover_task, game_time):
         print("\n[Cover] Generate stream's cover...\n")
+        cover = await self.prepared(cover_task, "cover", lambda: self.cover_asset_async(cover_task, game_time))
+        if not cover:
+            print("\n[Cover] No image generated, cover not updated\n")
+            return
+        url, asset = cover
+        self.send_cover(url, asset, game_time)
+
+    async def cover_asset_async(self, cover_task, game_time):
+        """
+        (image url, stored asset or None), None when no image was generated
+        """
         content = cover_task.get("content","")
-        
+
+        # the same cover task on the same day (re-planned or replayed): reuse the stored image
+        key = cover_key(game_time, content)
+        asset = self.assets.lookup(key)
+        if asset is not None:
+            print(f"\n[Cover] Reusing stored cover {asset['sha256'][:12]}\n")
+            return asset["source"], asset
+
         final_prompt = f"你是一隻三花貓虛擬主播，請生成一張圖片，要求如下\n {content}\n"
         print(f"\n[Cover] Using prompt as \n {final_prompt}\n")
-        img_link = self.gm.ask_json(final_prompt)
+        backend = self.backend("cover")
+        img_link = await backend.ask_json_async(final_prompt)
         print(f"\n[Cover] Get image link as \n{img_link}\n")
-        self.unity_bridge.send_cover_image(img_link,game_time)
+        if not img_link:
+            return None
+        return img_link, await self.store_cover_async(backend, img_link, key)
+
+    async def store_cover_async(self, backend, url, key):
+        """
+        download the generated image into the asset store, None when the backend can't fetch it
+        (Unity then gets the remote url only, as before)
+        """
+        fetch = getattr(backend, "fetch_bytes_async", None)
+        if fetch is None:
+            return None
+        try:
+            data = await fetch(url)
+            mime = sniff(data)[1]
+            if not mime.startswith("image/"):
+                print(f"\n[Cover] Download is not an image ({mime}), sending the remote url\n")
+                return None
+            asset = await self.assets.put_async(data, key=key, source=url)
+        except Exception as e:
+            print(f"\n[Cover] Download failed, sending the remote url: {e!r}\n")
+            return None
+        print(f"\n[Cover] Stored as {asset['path']} ({asset['size']} bytes, {len(asset['thumbnails'])} thumbnail(s))\n")
+        return asset
+
+    def send_cover(self, url, asset, game_time):
+        if asset is not None and UNITY_COVER_DELIVERY == "inline":
+            self.unity_bridge.send_asset(asset, self.assets.read(asset["sha256"]))
+        self.unity_bridge.send_cover_image(url, game_time, asset)
 
     def post_project(self, project_task, game_time):
-        print("\n[Project] Thinking of new project...\n")
-        # generate project content...
+        return run_sync(self.post_project_async(project_task, game_time))
+
+    async def project_async(self, project_task):
         content = project_task.get("content","")
-        template_path = project_root / "configs" / "prompt_templates" / "project.txt"
-        p = template_path.read_text(encoding="utf-8")
-        
-        final_prompt = ""
-        final_prompt += p
-        final_prompt += f"\n[使用者輸入]\n{content}\n"
+        prefix = self.templates.text("project.txt")
+        final_prompt = f"\n[使用者輸入]\n{content}\n"
+
+        print(f"\n[Project] Using prompt as\n{prefix}{final_prompt}\n")
+        return await self.ask_async("project", final_prompt, schema="project", prefix=prefix)
 
-        print(f"\n[Project] Using prompt as\n{final_prompt}\n")
-        project_json = self.llm.ask_json(final_prompt)
+    async def email_async(self, project_json):
         project_json_str = json.dumps(project_json, indent=2, ensure_ascii=False)
+        # the project JSON comes last in the template, everything before it is the same every time
+        prefix, p = self.templates.render_split(
+            "p2c_email.txt",
+            ("project_json",),
+            vtuber_name=self.persona['name'],
+            company_name="2333",
+            project_json=project_json_str,
+        )
+
+        
+        print(f"\n[Project] Using prompt as\n{prefix}{p}\n")
+        return await self.ask_async("email", p, schema="email", prefix=prefix)
+
+    async def post_project_async(self, project_task, game_time):
+        print("\n[Project] Thinking of new project...\n")
+        # generate project content...
+        project_json = await self.prepared(project_task, "project", lambda: self.project_async(project_task))
+        if not project_json:
+            print("\n[Project] No usable project, nothing sent\n")
+            return
         print(f"\n[Project] Get project as\n{project_json}\n")
 
         # generate project email...
         print("\n[Project] Writing email to company...\n")
-        template_path = project_root / "configs" / "prompt_templates" / "p2c_email.txt"
-        p = template_path.read_text(encoding="utf-8")
-
-        p = p.replace("{vtuber_name}", persona['name'])
-        p = p.replace("{company_name}", "2333")
-        p = p.replace("{project_json}", project_json_str)
-
-        
-        print(f"\n[Project] Using prompt as\n{p}\n")
-        time.sleep(10)
-        response = self.llm.ask_json(p)
+        await self.pause(10)
+        response = await self.prepared(project_task, "email", lambda: self.email_async(project_json))
         print(f"\n[Project] Get email as\n{response}\n")
 
         # send project email to company's mailbox
@@ -108,20 +266,21 @@ class Executor:
         else:
         # LLM 回傳純文字，當作 email 全文
             mail_content = response
-        mail_dir = project_root / "data" / "Company_Mailbox"
-        mail_dir.mkdir(parents=True, exist_ok=True)
-        file_date = game_time.strftime("P%Y-%m-%d.txt")
-        file_path = mail_dir / file_date
-        counter = 1
-        original_path = file_path
-        while file_path.exists():
-            file_name = f"{original_path.stem}_{counter}{original_path.suffix}"
-            file_path = original_path.parent / file_name
-            counter += 1
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(mail_content)
-
-        print(f"\n[Project] Email saved to: {file_path}\n")
+        if not mail_content:
+            # the company reviews the project fields, a plain cover note is enough
+            mail_content = f"企劃：{project_json['project_name']}\n\n{project_json['project_content']}"
+        # the company reviews the project fields, the mail text goes along with them
+        project = project_json if isinstance(project_json, dict) else {}
+        mail_id = self.mailbox.send(
+            COMPANY,
+            {"type": "project", "project": project, "content": mail_content},
+            mail_type="project",
+            subject=project.get("project_name"),
+            sender=self.persona["name"],
+            timestamp=game_time,
+        )
+
+        print(f"\n[Project] Email sent to company mailbox: #{mail_id}\n")
 
 
     def shoot_task(self):
@@ -129,23 +288,71 @@ class Executor:
         pass
 
     def stream_task(self, stream_task):
-        print("\n[Stream] Stream Starting...\n")
-        content = stream_task.get("content","")
-        final_prompt = ""
-        final_prompt += "請根據content説一段直播開場白，不要超過20字，要求返回json{'talk':'str'}格式，一定要簡體中文："
-        final_prompt += content
+        return run_sync(self.stream_task_async(stream_task))
 
-        print(f"\n[Stream] Using prompt as: \n{final_prompt}\n")
-        # 調試的時候先用大模型
-        resp = self.llm.ask_json(final_prompt)
+    def stream_lines(self, stream_task):
+        """
+        (instruction, content) of every line said on stream
+        """
+        return [
+            ("請根據content説一段直播開場白，不要超過20字，一定要簡體中文", stream_task.get("content","")),
+            (f"你是一位三花貓虛擬主播，名字叫{self.persona['name']}。"
+             "現在有觀衆問你，你喜歡喝什麽飲料，請回答不要超過20字，一定要簡體中文", ""),
+        ]
 
-        print(f"\n[Stream] Say something as :\n {resp}\n")
-        self.unity_bridge.send_stream_talk(resp.get("talk",""))
+    async def stream_task_async(self, stream_task):
+        print("\n[Stream] Stream Starting...\n")
+        for i, (instruction, content) in enumerate(self.stream_lines(stream_task)):
+            if i:
+                await self.pause(5)
+            prepared = await self.results.take(task_key(stream_task, f"talk{i}"))
+            await self.speak_async(instruction, content, prepared)
 
-        time.sleep(5)
-        resp = self.llm.ask_json("你是一位三花貓虛擬主播，名字叫苞米。現在有觀衆問你，你喜歡喝什麽飲料，請回答不要超過20字，一定要簡體中文，要求返回json{'talk':'str'}格式")
+    async def line_async(self, instruction, content=""):
+        """
+        one whole line, not streamed (used when the line is generated ahead)
+        """
+        prompt = f"{instruction}，要求返回json{{'talk':'str'}}格式：{content}"
+        print(f"\n[Stream] Using prompt as: \n{prompt}\n")
+        resp = await self.ask_async("talk", prompt, schema="talk")
+        return resp.get("talk", "")
 
-        print(f"\n[Stream] Say something as :\n {resp}\n")
-        self.unity_bridge.send_stream_talk(resp.get("talk",""))
+    async def speak_async(self, instruction, content="", prepared=None):
+        """
+        say one line on stream
+        - backends with stream_text_async: every chunk goes to Unity as a talk_delta as soon
+          as it arrives, then the whole line as the usual stream talk
+        - others (or an empty stream): one ask_json answer
+        - prepared: the line generated ahead (prefetch), sent at once without any llm call
+        time to first chunk is kept in self.stream_stats
+        """
+        talk_id = next(self.talk_ids)
+        text = prepared or ""
+        if text:
+            print("\n[Stream] Using prefetched line\n")
+        # the talk backend first, the cloud llm when it streams nothing (e.g. local server down)
+        for backend in dict.fromkeys([self.backend("talk"), self.llm]):
+            stream = getattr(backend, "stream_text_async", None)
+            if stream is None or text:
+                continue
+            prompt = f"{instruction}，只輸出台詞本身，不要引號和其他文字：{content}"
+            print(f"\n[Stream] Using prompt as: \n{prompt}\n")
+            started = time.perf_counter()
+            ttft, parts = None, []
+            async for delta in stream(prompt):
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+                self.unity_bridge.send_talk_delta(talk_id, len(parts), delta)
+                parts.append(delta)
+            self.stream_stats.record(ttft, time.perf_counter() - started, len(parts))
+            text = "".join(parts).strip()
+            if ttft is not None:
+                print(f"\n[Stream] First chunk after {ttft:.2f}s, {len(parts)} chunk(s)\n")
 
+        if not text:
+            text = await self.line_async(instruction, content)
 
+        print(f"\n[Stream] Say something as :\n {text}\n")
+        if text:
+            self.unity_bridge.send_stream_talk(text, talk_id)
+        return text
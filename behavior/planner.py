@@ -1,15 +1,22 @@
 import sys
 import json
+import asyncio
 from pathlib import Path
 from datetime import datetime
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from ai.llm_client import QwenLLM
-from configs.persona_config import persona
+from configs.persona_config import persona as default_persona
 from data.game_list import game_list 
 from utils.loader import MailLoader
 from behavior.executor import Executor
+from ai.async_pool import run_sync
+from behavior.scheduler import DAY_START_HOUR
+from behavior.rule_planner import RulePlanner
+from behavior.schedule_validator import validate_schedule
+from configs.settings import TODOLIST_PLANNER
+from ai.prompt_templates import TemplateRegistry
 
 class Planner:
     """
@@ -17,14 +24,53 @@ class Planner:
     todolist generation...
     task execution
     """
-    def __init__(self, unity_bridge, api_key=None, base_url=None, model=None):
-        self.llm = QwenLLM(api_key, base_url, model)
-        self.mail_loader = MailLoader()
+    def __init__(self, unity_bridge, api_key=None, base_url=None, model=None,
+                 llm=None, gm=None, root_path=None, clock=None, persona=None, rng=None,
+                 todolist_planner=TODOLIST_PLANNER):
+        """
+        :param rng: random.Random for the rule planner's rolls
+        :param todolist_planner: "rules" / "rules+llm" / "llm", see configs/settings.py
+        """
+        self.llm = llm or QwenLLM(api_key, base_url, model)
+        self.persona = persona or default_persona
+        self.mail_loader = MailLoader(root_path)
+        self.todolist_planner = todolist_planner
+        self.diagnostics = []
+        self.templates = TemplateRegistry.shared()
+        self.rule_planner = RulePlanner(
+            mail_store=self.mail_loader.store,
+            game_list=game_list,
+            llm=self.llm if todolist_planner == "rules+llm" else None,
+            persona=self.persona,
+            rng=rng,
+        )
         self.unity_bridge = unity_bridge
-        self.executor = Executor(unity_bridge,api_key, base_url, model)
+        self.executor = Executor(unity_bridge, api_key, base_url, model,
+                                 llm=llm, gm=gm, root_path=root_path, clock=clock,
+                                 persona=self.persona)
 
 
     def classifier(self, task, game_time, start):
+        return run_sync(self.classifier_async(task, game_time, start))
+
+    def dispatch(self, tasks, game_time, start):
+        """
+        run every task that fires in the same tick concurrently,
+        one failing task does not cancel the others
+        """
+        return run_sync(self.dispatch_async(tasks, game_time, start))
+
+    async def dispatch_async(self, tasks, game_time, start):
+        results = await asyncio.gather(
+            *(self.classifier_async(task, game_time, start) for task in tasks),
+            return_exceptions=True
+        )
+        for task, result in zip(tasks, results):
+            if isinstance(result, Exception):
+                print(f"[Planner] Task {task.get('type','')} failed: {result}")
+        return results
+
+    async def classifier_async(self, task, game_time, start):
         print(task)
         type = task.get("type","")
         if type == "tweet":
@@ -32,16 +78,16 @@ class Planner:
             if category == "preview":
                 if start:
                     self.unity_bridge.send_tweet_show()
-                    self.executor.post_preview(task)
+                    await self.executor.post_preview_async(task)
                 else:
                     self.unity_bridge.send_tweet_hide()
             elif category == "communication":
-                self.executor.post_communication(task)
+                await self.executor.post_communication_async(task)
         if type == "cover" and start == True:
-            self.executor.generate_cover(task, game_time)
+            await self.executor.generate_cover_async(task, game_time)
             
         if type == "project" and start == True:
-            self.executor.post_project(task, game_time)
+            await self.executor.post_project_async(task, game_time)
         if type == "company":
             pass
         if type == "store":
@@ -49,12 +95,14 @@ class Planner:
         if type == "stream" :
             if start:
                 self.unity_bridge.send_stream_start(game_time)
-                self.executor.stream_task(task)
+                await self.executor.stream_task_async(task)
             else:
                 self.unity_bridge.send_stream_end()
         
     def normalize(self, todolist):
-        tasks = todolist.get("tasks",[])
+        tasks = todolist.get("tasks",[]) if isinstance(todolist, dict) else []
+        if not isinstance(tasks, list):
+            tasks = []
         """
         tasks_schedule = {}
         for i, task in enumerate(tasks):
@@ -65,38 +113,69 @@ class Planner:
                     "task": task
                 }
         """
-        sorted_tasks = sorted(tasks, key=lambda x: 
-                int(x.get("start_time", "00:00").split(":")[0]) * 60 + 
-                int(x.get("start_time", "00:00").split(":")[1]))
-        tasks_schedule = sorted_tasks 
+        # the game day starts at 08:00, earlier hours belong to the night after
+        def day_minutes(x):
+            try:
+                h, m = x.get("start_time", "00:00").split(":")
+                minutes = int(h) * 60 + int(m)
+            except (AttributeError, ValueError):
+                return 48 * 60      # malformed times go last, the agent skips them
+            if int(h) < DAY_START_HOUR:
+                minutes += 24 * 60
+            return minutes
+
+        sorted_tasks = sorted(tasks, key=day_minutes)
+        # repair instead of asking the llm again: overlaps, bad times, 03:00 limit, cover/preview before streams
+        tasks_schedule, self.diagnostics = validate_schedule(sorted_tasks)
+        if self.diagnostics:
+            codes = {}
+            for d in self.diagnostics:
+                codes[d["code"]] = codes.get(d["code"], 0) + 1
+            print(f"[Tasks] Schedule repaired: {codes}")
         print(f"[Tasks] Today has {len(tasks_schedule)} tasks...")
         return tasks_schedule
 
     def generate_todolist(self, game_date):
-        print("\n[Todolist] Generate todolist...\n")
-        template_path = project_root / "configs" / "prompt_templates" / "todolist.txt"
-        p = template_path.read_text(encoding="utf-8")
-        final_prompt = ""
+        return run_sync(self.generate_todolist_async(game_date))
 
-        # add date
-        final_prompt += f"[date] {game_date.strftime('%Y-%m-%d')}\n"
+    async def generate_todolist_async(self, game_date):
+        if self.todolist_planner in ("rules", "rules+llm"):
+            # local rules build the schedule, the llm (if any) only writes the contents
+            todolist = self.rule_planner.plan(game_date)
+            print(f"\n[Todolist] Rule planner scheduled {len(todolist['tasks'])} tasks\n")
+            return await self.rule_planner.fill_contents_async(todolist)
+        prefix, final_prompt = self.build_todolist_prompt(game_date)
+        content = await self.llm.ask_json_async(final_prompt, schema="todolist", prefix=prefix)
+        if not content:
+            # no usable answer after the retries, a rule planned day beats an empty one
+            print("\n[Todolist] LLM todolist unusable, falling back to the rule planner\n")
+            return self.rule_planner.plan(game_date)
+        return content
+
+    def build_todolist_prompt(self, game_date):
+        """
+        (prefix, prompt): the rules of todolist.txt are the prefix, they never change and
+        the llm can reuse them from its context cache; tasks, games and the date come after
+        """
+        print("\n[Todolist] Generate todolist...\n")
 
         # add game_list
         gl = game_list 
         if isinstance(gl, dict) and gl.get("games") == []:
-            gl = None
-            p = p.replace("{game_list}", "None")
+            gl_text = "None"
         else:
-            p = p.replace("{game_list}", json.dumps(gl, ensure_ascii=False))
+            gl_text = json.dumps(gl, ensure_ascii=False)
 
         # add company tasks
         email = self.mail_loader.load("Personal_MailBox", game_date)
-        p = p.replace("{company_tasks}", email)
 
-        final_prompt += p
-        print(f"\n[Todolist] Using prompt as \n{final_prompt}\n")
-        content = self.llm.ask_json(final_prompt)
-        return content
+        prefix, final_prompt = self.templates.render_split(
+            "todolist.txt", ("company_tasks", "game_list"), game_list=gl_text, company_tasks=email)
+
+        # add date
+        final_prompt += f"\n[date] {game_date.strftime('%Y-%m-%d')}\n"
+        print(f"\n[Todolist] Using prompt as \n{prefix}{final_prompt}\n")
+        return prefix, final_prompt
     
 # for test, please ignore...
 if __name__ == "__main__":
@@ -0,0 +1,167 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import Future
+from datetime import timedelta
+
+import sys
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from behavior.scheduler import task_window
+from configs.settings import PREFETCH_LOOKAHEAD_HOURS, PREFETCH_MAX_TASKS
+
+
+def task_key(task, step):
+    """
+    one llm result of one scheduled task (step: "tweet", "cover", "project", "email", "talk0", ...),
+    the time is left out so a rescheduled task still finds its result
+    """
+    return step, task.get("type", ""), task.get("category", ""), task.get("content", "")
+
+
+class TaskResultCache:
+    """
+    llm results generated before their task starts
+    - reserve() (clock thread) makes the slot, fill() (runtime loop) generates into it
+    - take() hands a result over once: a finished slot is a hit, a slot still generating is
+      awaited (still a hit, the wait is taken off the saved time), no slot or an empty result
+      is a miss and the caller generates live
+    - saved_seconds: generation time the task did not have to wait for
+    """
+    def __init__(self):
+        self.entries = {}           # task_key -> {"future", "seconds"}
+        self.lock = threading.Lock()
+        self.steps = {}
+        self.prefetched = 0
+        self.failed = 0
+        self.wasted = 0
+
+    def reserve(self, key):
+        entry = {"future": Future(), "seconds": None}
+        with self.lock:
+            self.entries[key] = entry
+        return entry
+
+    async def fill(self, entry, make):
+        """
+        run make() (a coroutine function) into the slot, exceptions leave it empty
+        """
+        started = time.perf_counter()
+        try:
+            result = await make()
+        except Exception as e:
+            print(f"[Prefetch] Generation failed, the task will generate live: {e!r}")
+            result = None
+        entry["seconds"] = time.perf_counter() - started
+        with self.lock:
+            if result:
+                self.prefetched += 1
+            else:
+                self.failed += 1
+        entry["future"].set_result(result)
+        return result
+
+    def skip(self, entry):
+        with self.lock:
+            self.failed += 1
+        entry["future"].set_result(None)
+
+    async def take(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+        counts = self._counts(key[0])
+        if entry is None:
+            with self.lock:
+                counts["misses"] += 1
+            return None
+        future = entry["future"]
+        waited = not future.done()
+        started = time.perf_counter()
+        result = await asyncio.wrap_future(future)
+        wait = time.perf_counter() - started
+        with self.lock:
+            if not result:
+                counts["misses"] += 1
+                return None
+            counts["hits"] += 1
+            counts["waited"] += 1 if waited else 0
+            counts["saved_seconds"] += max(0.0, entry["seconds"] - wait)
+        return result
+
+    def _counts(self, step):
+        with self.lock:
+            return self.steps.setdefault(step, {"hits": 0, "waited": 0, "misses": 0, "saved_seconds": 0.0})
+
+    def clear(self):
+        """
+        drop what the day did not use (cancelled tasks)
+        """
+        with self.lock:
+            self.wasted += sum(1 for e in self.entries.values() if e["future"].done() and e["future"].result())
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            steps = {step: dict(counts) for step, counts in self.steps.items()}
+            pending = len(self.entries)
+        hits = sum(c["hits"] for c in steps.values())
+        misses = sum(c["misses"] for c in steps.values())
+        return {
+            "prefetched": self.prefetched,
+            "failed": self.failed,
+            "wasted": self.wasted,
+            "pending": pending,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "saved_seconds": sum(c["saved_seconds"] for c in steps.values()),
+            "by_step": steps,
+        }
+
+
+class Prefetcher:
+    """
+    generate the llm part of upcoming tasks in the background
+    - plan(schedule, day_start) once the day's schedule is normalized, poll(now) on every tick
+    - a task is prefetched once its start is at most `lookahead` away (game time),
+      at most max_tasks tasks per day (llm calls spent on tasks that may still be cancelled)
+    - jobs run on the TaskScheduler, results land in executor.results
+    lookahead 0 turns prefetching off
+    """
+    def __init__(self, executor, scheduler, lookahead_hours=PREFETCH_LOOKAHEAD_HOURS,
+                 max_tasks=PREFETCH_MAX_TASKS):
+        self.executor = executor
+        self.scheduler = scheduler
+        self.lookahead = timedelta(hours=lookahead_hours)
+        self.max_tasks = max_tasks
+        self.upcoming = []
+        self.day_start = None
+        self.started = 0
+
+    def plan(self, schedule, day_start):
+        self.executor.results.clear()
+        self.day_start = day_start
+        self.started = 0
+        self.upcoming = []
+        if not self.lookahead:
+            return
+        for task in schedule:
+            try:
+                start, _ = task_window(task, day_start)
+            except (KeyError, ValueError, AttributeError):
+                continue
+            self.upcoming.append((start, task))
+        self.upcoming.sort(key=lambda item: item[0])
+
+    def poll(self, now):
+        while self.upcoming and self.started < self.max_tasks and self.upcoming[0][0] - now <= self.lookahead:
+            start, task = self.upcoming.pop(0)
+            if start <= now:
+                continue            # starting right now, nothing to win
+            job = self.executor.prefetch(task, start)
+            if job is None:
+                continue
+            self.started += 1
+            self.scheduler.submit(f"prefetch {task.get('type', '')}", job)
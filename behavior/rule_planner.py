@@ -0,0 +1,246 @@
+import re
+import sys
+import json
+import random
+from datetime import date, datetime, timedelta
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from behavior.scheduler import DAY_START_HOUR
+from configs.persona_config import persona as default_persona
+from ai.prompt_templates import TemplateRegistry
+from utils.calendar_index import CalendarIndex
+from utils.mailbox import VTUBER
+
+FIRST_GAME_DAY = date(2077, 1, 1)
+
+# default trigger probabilities, overridden by rule 11 of todolist.txt
+DEFAULT_PROBABILITIES = {"stream": 0.6, "project": 0.4, "store": 0.4}
+PROBABILITY_PATTERNS = {
+    "stream": r"直播的概率[為为]\s*(\d+)%",
+    "project": r"企劃案的觸發概率[為为]\s*(\d+)%",
+    "store": r"商城的觸發概率[為为]\s*(\d+)%",
+}
+
+STREAM_STARTS = ["20:00", "21:00", "19:00", "22:00", "18:00"]
+
+
+def load_probabilities(template_path):
+    """
+    read the trigger probabilities from the todolist prompt, so rules and prompt never drift apart
+    """
+    probabilities = dict(DEFAULT_PROBABILITIES)
+    try:
+        text = Path(template_path).read_text(encoding="utf-8")
+    except OSError:
+        return probabilities
+    for name, pattern in PROBABILITY_PATTERNS.items():
+        match = re.search(pattern, text)
+        if match:
+            probabilities[name] = int(match.group(1)) / 100
+    return probabilities
+
+
+class RulePlanner:
+    """
+    local todolist planner, same inputs and output format as the llm todolist:
+    - company shoots first, at the booked time
+    - an advertisement forces an ad stream, otherwise stream with the template probability
+      (a game from the game list, chat stream when the list is empty)
+    - a stream is only kept if a cover (>= 1h) and a preview tweet (>= 30min) fit before it in daytime
+    - project (always on the first day) and store visit with the template probabilities
+    - nothing before 09:00, streams end by 03:00, `rest` minutes between tasks, no overlaps
+    content strings are canned; fill_contents_async() lets an llm rewrite them
+    """
+    def __init__(self, mail_store=None, game_list=None, llm=None, persona=None, rng=None,
+                 template_path=None, rest=30):
+        self.mail_store = mail_store
+        self.game_list = game_list
+        self.llm = llm
+        self.persona = persona or default_persona
+        self.rng = rng or random.Random()
+        self.template_path = template_path or project_root / "configs" / "prompt_templates" / "todolist.txt"
+        self.probabilities = load_probabilities(self.template_path)
+        self.rest = rest
+        self.templates = TemplateRegistry.shared()
+
+    # ---------------- inputs ----------------
+    def company_mails(self, game_date):
+        if self.mail_store is None:
+            return [], None
+        shoots, advertisement = [], None
+        for mail in self.mail_store.by_date(VTUBER, game_date):
+            body = mail["body"]
+            if isinstance(body, str):
+                # legacy text mail: "...「NEO ENERGY」的宣傳合作項目...建議時長30min"
+                if "廣告" in body or "广告" in body:
+                    brand = re.search(r"「(.+?)」", body)
+                    minutes = re.search(r"(\d+)\s*min", body)
+                    advertisement = advertisement or {
+                        "brand": brand.group(1) if brand else "",
+                        "minutes": int(minutes.group(1)) if minutes else 60,
+                    }
+                continue
+            payload = body.get("data", body)
+            if mail["type"] == "shoot_schedule":
+                shoots.append(payload)
+            elif mail["type"] == "advertisement" and advertisement is None:
+                minutes = re.search(r"(\d+)", str(payload.get("suggested_duration", "")))
+                advertisement = {
+                    "brand": payload.get("brand", ""),
+                    "title": payload.get("ad_title", ""),
+                    "requirement": payload.get("required_content", ""),
+                    "minutes": int(minutes.group(1)) if minutes else 60,
+                }
+        return shoots, advertisement
+
+    def games(self):
+        gl = self.game_list or {}
+        return gl.get("games", []) if isinstance(gl, dict) else []
+
+    # ---------------- planning ----------------
+    def at(self, origin, hhmm):
+        h, m = map(int, hhmm.split(":"))
+        dt = origin.replace(hour=h, minute=m)
+        if dt < origin:
+            dt += timedelta(days=1)
+        return dt
+
+    def plan(self, game_date):
+        """
+        :param game_date: any datetime of the game day
+        :return: {"date": ..., "tasks": [...]} like the llm todolist
+        """
+        calendar = CalendarIndex(DAY_START_HOUR)
+        day = calendar.day_of(game_date)
+        origin = calendar.day_origin(day)
+        work_start = self.at(origin, "09:00")
+        daytime_end = self.at(origin, "18:00")
+        stream_deadline = self.at(origin, "03:00")
+        tasks = []
+
+        def book(task, start, end):
+            # same key order as the llm todolist
+            ordered = {"type": task["type"]}
+            if "category" in task:
+                ordered["category"] = task["category"]
+            ordered["start_time"] = start.strftime("%H:%M")
+            ordered["end_time"] = end.strftime("%H:%M")
+            ordered["content"] = task["content"]
+            calendar.add(start, end, kind=task["type"])
+            tasks.append((start, ordered))
+
+        # 1. company shoots
+        shoots, advertisement = self.company_mails(day)
+        for shoot in shoots:
+            try:
+                start = datetime.strptime(shoot["start_time"], "%Y-%m-%d %H:%M")
+                end = datetime.strptime(shoot["end_time"], "%Y-%m-%d %H:%M")
+            except (KeyError, ValueError):
+                continue
+            book({"type": "company", "content": f"拍攝企劃：{shoot.get('project_name', '')}"}, start, end)
+
+        # 2. stream + its cover and preview tweet
+        if advertisement or self.rng.random() < self.probabilities["stream"]:
+            if advertisement:
+                minutes = advertisement["minutes"]
+                topic = f"{advertisement['brand']}廣告直播".strip()
+            else:
+                games = self.games()
+                if games:
+                    game = self.rng.choice(games)
+                    minutes = game.get("stream_recommendation", {}).get("ideal_duration_min", 120)
+                    topic = f"一起來玩{game.get('title', '')}!"
+                else:
+                    minutes, topic = 90, "雜談直播"
+            self.place_stream(calendar, book, origin, minutes, topic, work_start, daytime_end, stream_deadline)
+
+        # 3. project (always on the first day) and store visit
+        if day == FIRST_GAME_DAY or self.rng.random() < self.probabilities["project"]:
+            self.place(calendar, book, {"type": "project", "content": "構思新企劃"}, 60, work_start, daytime_end)
+        if self.rng.random() < self.probabilities["store"]:
+            self.place(calendar, book, {"type": "store", "content": "逛游戲商城"}, 60, work_start,
+                       self.at(origin, "23:00"))
+
+        tasks.sort(key=lambda item: item[0])
+        return {"date": day.strftime("%Y-%m-%d"), "tasks": [task for _, task in tasks]}
+
+    def place(self, calendar, book, task, minutes, window_start, window_end):
+        day = calendar.day_of(window_start)
+        start = calendar.find_slot(day, minutes, window_start, window_end, self.rest)
+        if start is None:
+            return None
+        book(task, start, start + timedelta(minutes=minutes))
+        return start
+
+    def place_stream(self, calendar, book, origin, minutes, topic, work_start, daytime_end, deadline):
+        day = calendar.day_of(origin)
+        length = timedelta(minutes=minutes)
+        stream_start = None
+        for hhmm in STREAM_STARTS:
+            start = self.at(origin, hhmm)
+            if start + length <= deadline and calendar.is_free(start, start + length, self.rest):
+                stream_start = start
+                break
+        if stream_start is None:
+            stream_start = calendar.find_slot(day, minutes, daytime_end, deadline, self.rest)
+        if stream_start is None:
+            return False
+
+        # cover and preview must both fit in daytime before the stream, or there is no stream
+        cover_end_limit = min(daytime_end, stream_start)
+        cover = calendar.find_slot(day, 60, work_start, cover_end_limit, self.rest)
+        if cover is None:
+            return False
+        tweet_from = cover + timedelta(minutes=60 + self.rest)
+        tweet = calendar.find_slot(day, 30, tweet_from, cover_end_limit, self.rest)
+        if tweet is None:
+            return False
+
+        book({"type": "cover", "content": f"製作直播封面：{topic}"}, cover, cover + timedelta(minutes=60))
+        book({"type": "tweet", "category": "preview",
+              "content": f"今晚{stream_start.strftime('%H:%M')}直播預告：{topic}"},
+             tweet, tweet + timedelta(minutes=30))
+        book({"type": "stream", "content": topic}, stream_start, stream_start + length)
+        return True
+
+    # ---------------- optional llm ----------------
+    def build_content_prompt(self, todolist):
+        """
+        (prefix, prompt): persona + instructions are the cacheable prefix, the task lines the rest
+        """
+        lines = [
+            f"{i}. [{t['type']}{'/' + t['category'] if t.get('category') else ''}] "
+            f"{t['start_time']}-{t['end_time']} {t['content']}"
+            for i, t in enumerate(todolist["tasks"], 1)
+        ]
+        prefix, prompt = self.templates.render_split("todolist_content.txt", ("tasks",), tasks="\n".join(lines))
+        return self.templates.persona_header(self.persona, traits=False) + prefix, prompt
+
+    async def fill_contents_async(self, todolist):
+        """
+        let the llm rewrite only the content strings, the schedule itself is never touched
+        """
+        if self.llm is None or not todolist["tasks"]:
+            return todolist
+        try:
+            prefix, prompt = self.build_content_prompt(todolist)
+            response = await self.llm.ask_json_async(prompt, schema="contents", prefix=prefix)
+        except Exception as e:
+            print(f"[RulePlanner] Content fill failed, keeping default contents: {e!r}")
+            return todolist
+        contents = response.get("contents") if isinstance(response, dict) else None
+        if not isinstance(contents, list) or len(contents) != len(todolist["tasks"]):
+            print("[RulePlanner] Content fill returned a different task count, keeping default contents")
+            return todolist
+        for task, content in zip(todolist["tasks"], contents):
+            if isinstance(content, str) and content.strip():
+                task["content"] = content.strip()
+        return todolist
+
+
+if __name__ == "__main__":
+    from data.game_list import game_list
+    planner = RulePlanner(game_list=game_list, rng=random.Random(0))
+    print(json.dumps(planner.plan(datetime(2077, 1, 1, 8, 0)), indent=2, ensure_ascii=False))
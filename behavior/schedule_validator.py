@@ -0,0 +1,230 @@
+import re
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from behavior.scheduler import DAY_START_HOUR
+from utils.calendar_index import CalendarIndex
+
+TASK_TYPES = {"stream", "company", "cover", "store", "tweet", "rest", "project"}
+
+# minutes used when end_time is missing, and the floor from the todolist rules
+DEFAULT_MINUTES = {"stream": 120, "company": 120, "cover": 60, "store": 60, "tweet": 30, "rest": 30, "project": 60}
+MIN_MINUTES = {"cover": 60, "tweet": 30}
+
+# placement order: fixed company work first, then the stream, then its prerequisites, then the rest
+PRIORITY = {"company": 0, "stream": 1, "cover": 2, "tweet": 3, "project": 4, "store": 5, "rest": 6}
+
+WORK_START = 9 * 60             # day minutes, nothing before 09:00
+DEADLINE = 27 * 60              # 03:00 next morning, nothing after
+
+TIME_PATTERN = re.compile(r"^\s*(\d{1,2})\s*[:：]\s*(\d{1,2})\s*$")
+
+
+def parse_day_minutes(value):
+    """
+    "HH:MM" -> minutes since 00:00 of the game day (hours before 08:00 belong to the next morning),
+    None when malformed; accepts "9:5", full width colons and "24:00"
+    """
+    if not isinstance(value, str):
+        return None
+    match = TIME_PATTERN.match(value)
+    if not match:
+        return None
+    h, m = int(match.group(1)), int(match.group(2))
+    if h > 24 or m > 59 or (h == 24 and m):
+        return None
+    h %= 24
+    minutes = h * 60 + m
+    if h < DAY_START_HOUR:
+        minutes += 24 * 60
+    return minutes
+
+
+def format_day_minutes(minutes):
+    minutes %= 24 * 60
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def validate_schedule(tasks):
+    """
+    check and repair one day's tasks, O(n log n):
+    - malformed / missing times, unknown types, too short cover and tweet
+    - everything inside 09:00 -> 03:00
+    - overlaps resolved by priority, a moved task keeps its length and takes the next free gap
+    - every stream gets a cover and a preview tweet before it, a stream without room for them
+      moves later, or is dropped when they fit nowhere before 03:00
+    :return: (repaired tasks sorted by time, diagnostics [{"code", "type", "detail"}])
+    """
+    diagnostics = []
+
+    def report(code, task, detail=""):
+        diagnostics.append({"code": code, "type": task.get("type") if isinstance(task, dict) else None,
+                            "detail": detail})
+
+    # 1. parse and clamp
+    items = []
+    for task in tasks if isinstance(tasks, list) else []:
+        if not isinstance(task, dict):
+            report("not_a_task", {}, repr(task)[:80])
+            continue
+        task_type = task.get("type")
+        if task_type not in TASK_TYPES:
+            report("unknown_type", task, str(task_type))
+            continue
+        start = parse_day_minutes(task.get("start_time"))
+        if start is None:
+            report("bad_start_time", task, str(task.get("start_time")))
+            continue
+        end = parse_day_minutes(task.get("end_time"))
+        if end is None:
+            report("missing_end_time" if not task.get("end_time") else "bad_end_time", task,
+                   str(task.get("end_time")))
+            end = start + DEFAULT_MINUTES[task_type]
+        elif end <= start:
+            # "23:00" -> "01:00" is already next morning, anything else ran backwards
+            report("end_before_start", task, f"{task.get('start_time')}-{task.get('end_time')}")
+            end = start + DEFAULT_MINUTES[task_type]
+        if end - start < MIN_MINUTES.get(task_type, 0):
+            report("too_short", task, f"{end - start}min")
+            end = start + MIN_MINUTES[task_type]
+
+        if start < WORK_START:
+            report("before_work_start", task, task.get("start_time"))
+            end += WORK_START - start
+            start = WORK_START
+        if start >= DEADLINE:
+            report("after_deadline", task, task.get("start_time"))
+            continue
+        if end > DEADLINE:
+            report("clamped_end", task, f"{format_day_minutes(end)} -> 03:00")
+            end = DEADLINE
+        items.append({"task": task, "start": start, "end": end})
+
+    # 2. place by priority, later / lower priority tasks move to the next free gap
+    calendar = CalendarIndex(DAY_START_HOUR)
+    day = date(2000, 1, 1)
+    origin = calendar.day_origin(day)
+
+    def at(minutes):
+        return origin + timedelta(minutes=minutes - DAY_START_HOUR * 60)
+
+    def minutes_of(dt):
+        return int((dt - origin).total_seconds() // 60) + DAY_START_HOUR * 60
+
+    placed = []
+
+    def place(item, window_start=None, window_end=DEADLINE):
+        length = item["end"] - item["start"]
+        start = item["start"] if window_start is None else window_start
+        slot = calendar.find_slot(day, length, at(start), at(window_end))
+        if slot is None:
+            return False
+        new_start = minutes_of(slot)
+        if new_start != item["start"] and not item.get("inserted"):
+            report("moved", item["task"], f"{format_day_minutes(item['start'])} -> {format_day_minutes(new_start)}")
+        item["start"], item["end"] = new_start, new_start + length
+        calendar.add(at(item["start"]), at(item["end"]), kind=item["task"]["type"])
+        placed.append(item)
+        return True
+
+    def free_start(length, start, end, taken):
+        """
+        earliest start in [start, end] that is free and clear of the `taken` (start, end) intervals
+        """
+        while True:
+            slot = calendar.find_slot(day, length, at(start), at(end))
+            if slot is None:
+                return None
+            free = minutes_of(slot)
+            clash = next((e for b, e in taken if free < e and b < free + length), None)
+            if clash is None:
+                return free
+            start = clash
+
+    def plan_prerequisites(stream, stream_start):
+        """
+        [(item, start)] for the stream's cover and preview tweet ending by stream_start,
+        None when they don't fit; nothing is booked
+        """
+        plan, taken = [], []
+        for kind, category in (("cover", None), ("tweet", "preview")):
+            candidates = [i for i in pending if i["task"]["type"] == kind
+                          and (category is None or i["task"].get("category") == category)
+                          and all(i is not other for other, _ in plan)]
+            before = [i for i in candidates if i["end"] <= stream_start]
+            item = (before or candidates or [None])[0]
+            if item is None:
+                new_task = {"type": kind}
+                if category:
+                    new_task["category"] = category
+                new_task["content"] = stream["task"].get("content", "")
+                item = {"task": new_task, "start": WORK_START, "end": WORK_START + DEFAULT_MINUTES[kind],
+                        "inserted": True}
+            length = item["end"] - item["start"]
+            # keep its time when it already is before the stream, else the earliest gap of the day
+            start = None
+            if item["end"] <= stream_start:
+                start = free_start(length, item["start"], stream_start, taken)
+            if start is None:
+                start = free_start(length, WORK_START, stream_start, taken)
+            if start is None:
+                return None
+            plan.append((item, start))
+            taken.append((start, start + length))
+        return plan
+
+    items.sort(key=lambda item: (PRIORITY[item["task"]["type"]], item["start"]))
+    streams = [item for item in items if item["task"]["type"] == "stream"]
+    rest = [item for item in items if item["task"]["type"] != "stream"]
+
+    for item in [i for i in rest if i["task"]["type"] == "company"]:
+        if not place(item):
+            report("dropped_overlap", item["task"], "no free time left")
+    pending = [i for i in rest if i["task"]["type"] != "company"]
+
+    # 3. every stream with a cover and a preview tweet before it: a stream whose prerequisites
+    # have no room moves to the next slot (15 min steps) where they fit, dropped if none before 03:00
+    for stream in streams:
+        length = stream["end"] - stream["start"]
+        t = stream["start"]
+        slot = free_start(length, t, DEADLINE, [])
+        if slot is None:
+            report("dropped_overlap", stream["task"], "no free time left for the stream")
+            continue
+        plan = None
+        while slot is not None:
+            plan = plan_prerequisites(stream, slot)
+            if plan is not None:
+                break
+            t = (slot // 15 + 1) * 15
+            slot = free_start(length, t, DEADLINE, [])
+        if plan is None:
+            report("dropped_stream", stream["task"], "no room for its cover and preview tweet before 03:00")
+            continue
+        place(stream, window_start=slot)
+        for item, start in plan:
+            if item.get("inserted"):
+                report("inserted_prerequisite", item["task"],
+                       f"{item['task']['type']} before the {format_day_minutes(slot)} stream")
+            else:
+                pending.remove(item)
+            length = item["end"] - item["start"]
+            place(item, window_start=start, window_end=start + length)
+
+    # 4. everything else
+    for item in pending:
+        if not place(item):
+            report("dropped_overlap", item["task"], "no free time left")
+
+    # 5. write the repaired times back
+    placed.sort(key=lambda item: item["start"])
+    repaired = []
+    for item in placed:
+        task = item["task"]
+        task["start_time"] = format_day_minutes(item["start"])
+        task["end_time"] = format_day_minutes(item["end"])
+        repaired.append(task)
+    return repaired, diagnostics
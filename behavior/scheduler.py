@@ -0,0 +1,300 @@
+import sys
+import time
+import heapq
+import queue
+import asyncio
+import itertools
+from collections import deque
+from datetime import timedelta
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from ai.async_pool import AsyncRuntime
+from utils.clock import REAL_CLOCK
+
+
+class TaskScheduler:
+    """
+    run task handlers off the clock thread:
+    - jobs are coroutines scheduled on the AsyncRuntime loop
+    - a job can wait for other jobs (task end waits for its own start)
+    - results come back through a queue, the clock thread drains it with poll()
+      and on_done callbacks run there, so agent state is only touched by one thread
+    """
+    def __init__(self, runtime=None):
+        self.runtime = runtime or AsyncRuntime.get()
+        self.ids = itertools.count(1)
+        self.jobs = {}                  # job_id -> concurrent future
+        self.finished = queue.Queue()
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, name, coro, on_done=None, after=None):
+        job_id = next(self.ids)
+        waits = [self.jobs[j] for j in (after or []) if j in self.jobs]
+        submitted = time.monotonic()
+
+        async def runner():
+            for f in waits:
+                try:
+                    await asyncio.wrap_future(f)
+                except Exception:
+                    pass
+            return await coro
+
+        future = self.runtime.submit(runner())
+        self.jobs[job_id] = future
+
+        def report(f):
+            error = f.exception()
+            self.finished.put({
+                "job_id": job_id,
+                "name": name,
+                "ok": error is None,
+                "result": None if error else f.result(),
+                "error": error,
+                "seconds": time.monotonic() - submitted,
+                "on_done": on_done,
+            })
+
+        future.add_done_callback(report)
+        return job_id
+
+    def poll(self):
+        """
+        collect finished jobs, call on_done(result) for the successful ones
+        """
+        reports = []
+        while True:
+            try:
+                report = self.finished.get_nowait()
+            except queue.Empty:
+                break
+            reports.append(self._handle(report))
+        return reports
+
+    def drain(self, timeout=None):
+        """
+        block until every submitted job (including jobs submitted by on_done) is finished
+        """
+        reports = []
+        while self.jobs:
+            try:
+                report = self.finished.get(timeout=timeout)
+            except queue.Empty:
+                break
+            reports.append(self._handle(report))
+        return reports
+
+    def _handle(self, report):
+        self.jobs.pop(report["job_id"], None)
+        if report["ok"]:
+            self.completed += 1
+            print(f"[Scheduler] {report['name']} done in {report['seconds']:.2f}s")
+            if report["on_done"]:
+                report["on_done"](report["result"])
+        else:
+            self.failed += 1
+            print(f"[Scheduler] {report['name']} failed after {report['seconds']:.2f}s: {report['error']!r}")
+        return report
+
+    def pending(self):
+        return len(self.jobs)
+
+    def stats(self):
+        return {
+            "pending": self.pending(),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+class TickTimer:
+    """
+    fixed cadence clock for the agent loop
+    - sleeps until the next deadline instead of a flat sleep(1), work time is absorbed
+    - jitter: how late each tick woke up compared with its deadline
+    - overrun: a tick whose work took longer than the whole interval
+    - clock: RealClock by default, a ManualClock makes wait() return at once
+    """
+    def __init__(self, interval=1.0, history=1000, clock=None):
+        self.interval = interval
+        self.clock = clock or REAL_CLOCK
+        self.next_deadline = None
+        self.jitter = deque(maxlen=history)
+        self.ticks = 0
+        self.overruns = 0
+
+    def wait(self, interval=None):
+        """
+        interval: override for this step, the loop passes a longer one when it is
+                  idle until the next game event
+        """
+        interval = interval or self.interval
+        now = self.clock.monotonic()
+        if self.next_deadline is None:
+            self.next_deadline = now
+        self.next_deadline += interval
+
+        delay = self.next_deadline - now
+        if delay > 0:
+            self.clock.sleep(delay)
+        elif -delay > interval:
+            # too far behind: skip the missed ticks instead of bursting to catch up
+            self.overruns += 1
+            self.next_deadline = now
+
+        self.jitter.append(self.clock.monotonic() - self.next_deadline)
+        self.ticks += 1
+
+    def stats(self):
+        samples = sorted(self.jitter)
+        if not samples:
+            return {"ticks": 0, "overruns": 0}
+
+        def pct(p):
+            return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+        return {
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "jitter_mean_ms": sum(samples) / len(samples) * 1000,
+            "jitter_p50_ms": pct(0.50) * 1000,
+            "jitter_p99_ms": pct(0.99) * 1000,
+            "jitter_max_ms": samples[-1] * 1000,
+        }
+
+
+DAY_START_HOUR = 8      # a game day runs 08:00 -> 08:00 next morning
+
+
+def parse_hhmm(value):
+    h, m = value.strip().split(":")
+    return int(h), int(m)
+
+
+def task_window(task, day_start):
+    """
+    turn "HH:MM" start/end into datetimes of the game day starting at day_start
+    - times before 08:00 belong to the next calendar day (streams end as late as 03:00)
+    - an end before its start crosses midnight
+    """
+    base = day_start.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def on_day(value):
+        h, m = parse_hhmm(value)
+        dt = base + timedelta(hours=h, minutes=m)
+        if dt < day_start:
+            dt += timedelta(days=1)
+        return dt
+
+    start_dt = on_day(task["start_time"])
+    end_dt = on_day(task.get("end_time") or task["start_time"])
+    if end_dt < start_dt:
+        end_dt += timedelta(days=1)
+    return start_dt, end_dt
+
+
+class EventQueue:
+    """
+    time ordered heap of game events keyed on game datetime
+    - task events: ("start", task) / ("end", task)
+    - plain events: ("day_start", payload) ...
+    cancel / reschedule bump the task's version, stale heap entries are skipped when popped
+    """
+    def __init__(self):
+        self.heap = []                  # (when, seq, kind, key, version)
+        self.entries = {}               # key -> {"task", "start", "end", "version", "started"}
+        self.seq = itertools.count()
+        self.keys = itertools.count(1)
+
+    def push(self, when, kind, payload=None):
+        key = f"{kind}-{next(self.keys)}"
+        self.entries[key] = {"task": payload, "start": when, "end": None, "version": 0, "started": False}
+        heapq.heappush(self.heap, (when, next(self.seq), kind, key, 0))
+        return key
+
+    def add_task(self, task, start_dt, end_dt, started=False):
+        """
+        started: task restored from a checkpoint whose start already fired, only its end is queued
+        """
+        key = f"task-{next(self.keys)}"
+        task["event_id"] = key
+        self.entries[key] = {"task": task, "start": start_dt, "end": end_dt, "version": 0, "started": started}
+        if not started:
+            heapq.heappush(self.heap, (start_dt, next(self.seq), "start", key, 0))
+        heapq.heappush(self.heap, (end_dt, next(self.seq), "end", key, 0))
+        return key
+
+    def cancel(self, key):
+        return self.entries.pop(key, None) is not None
+
+    def reschedule(self, key, start_dt, end_dt):
+        entry = self.entries.get(key)
+        if entry is None:
+            return False
+        entry["version"] += 1
+        entry["end"] = end_dt
+        if not entry["started"]:
+            entry["start"] = start_dt
+            heapq.heappush(self.heap, (start_dt, next(self.seq), "start", key, entry["version"]))
+        heapq.heappush(self.heap, (end_dt, next(self.seq), "end", key, entry["version"]))
+        return True
+
+    def _live(self, item):
+        when, _, kind, key, version = item
+        entry = self.entries.get(key)
+        if entry is None or entry["version"] != version:
+            return False
+        if kind == "start" and entry["started"]:
+            return False
+        return True
+
+    def _drop_stale(self):
+        while self.heap and not self._live(self.heap[0]):
+            heapq.heappop(self.heap)
+
+    def next_time(self):
+        self._drop_stale()
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now):
+        """
+        every live event with time <= now, in time order
+        """
+        due = []
+        while True:
+            self._drop_stale()
+            if not self.heap or self.heap[0][0] > now:
+                break
+            when, _, kind, key, version = heapq.heappop(self.heap)
+            entry = self.entries[key]
+            if kind == "start":
+                entry["started"] = True
+            if kind != "start" or entry["end"] is None:
+                # the last event of an entry retires it
+                del self.entries[key]
+            due.append((kind, entry["task"], when))
+        return due
+
+    def next_time_of(self, kind):
+        """
+        earliest live event of a kind (e.g. the next day_start), None if there is none
+        """
+        times = [item[0] for item in self.heap if item[2] == kind and self._live(item)]
+        return min(times) if times else None
+
+    def tasks(self):
+        return [e["task"] for e in self.entries.values() if e["end"] is not None]
+
+    def pending_tasks(self):
+        """
+        [(task, started)] for every task whose end has not fired yet, in start order
+        """
+        entries = [e for e in self.entries.values() if e["end"] is not None]
+        entries.sort(key=lambda e: e["start"])
+        return [(e["task"], e["started"]) for e in entries]
+
+    def __len__(self):
+        return len(self.entries)
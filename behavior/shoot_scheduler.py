@@ -0,0 +1,157 @@
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.calendar_index import CalendarIndex
+from behavior.scheduler import DAY_START_HOUR, task_window
+from configs.settings import (
+    SHOOT_WINDOW,
+    SHOOT_DEFAULT_MINUTES,
+    SHOOT_HORIZON_DAYS,
+    SHOOT_MAX_PER_DAY,
+    SHOOT_BUFFER_MINUTES,
+)
+
+
+def parse_preferred(value):
+    """
+    "YYYY-MM-DD HH:MM" -> datetime (fixed date), "HH:MM" -> (hour, minute) on any day, else None
+    """
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    try:
+        if len(value) <= 5 and ":" in value:
+            hh, mm = map(int, value.split(":"))
+            if 0 <= hh < 24 and 0 <= mm < 60:
+                return hh, mm
+            return None
+        return datetime.strptime(value, "%Y-%m-%d %H:%M")
+    except ValueError:
+        return None
+
+
+class ShootScheduler:
+    """
+    place approved projects into free shoot slots of a CalendarIndex
+    - the calendar already holds the vtuber's daily schedule, streams and earlier shoots
+    - several projects are placed in one call, most constrained first:
+      fixed preferred date, then preferred time of day, then anything in the shoot window
+    - a slot keeps `buffer` minutes from every other booking, at most `max_per_day` shoots a day
+    - projects that fit nowhere within `horizon_days` are returned and stay approved
+    """
+    def __init__(self, calendar=None, window=SHOOT_WINDOW, duration=SHOOT_DEFAULT_MINUTES,
+                 horizon_days=SHOOT_HORIZON_DAYS, max_per_day=SHOOT_MAX_PER_DAY, buffer=SHOOT_BUFFER_MINUTES):
+        self.calendar = calendar or CalendarIndex(DAY_START_HOUR)
+        self.window = [parse_preferred(w) for w in window]
+        self.duration = duration
+        self.horizon_days = horizon_days
+        self.max_per_day = max_per_day
+        self.buffer = buffer
+        self.no_room = {}
+
+    def at(self, day, hhmm):
+        """
+        (hour, minute) on a game day, hours before the day start belong to the next morning
+        """
+        origin = self.calendar.day_origin(day)
+        dt = origin + timedelta(hours=hhmm[0] - self.calendar.day_start_hour, minutes=hhmm[1])
+        if dt < origin:
+            dt += timedelta(days=1)
+        return dt
+
+    def request(self, project_id, info):
+        """
+        normalise _extract_project_info() output into a placement request
+        """
+        start = parse_preferred(info.get("preferred_start"))
+        end = parse_preferred(info.get("preferred_end"))
+        duration = self.duration
+        if isinstance(start, datetime) and isinstance(end, datetime) and end > start:
+            duration = int((end - start).total_seconds() // 60)
+        elif isinstance(start, tuple) and isinstance(end, tuple):
+            minutes = (end[0] * 60 + end[1]) - (start[0] * 60 + start[1])
+            if minutes <= 0:
+                minutes += 24 * 60
+            duration = minutes
+        if isinstance(start, datetime):
+            rank = 0
+        elif isinstance(start, tuple):
+            rank = 1
+        else:
+            rank = 2
+        return {"project_id": project_id, "info": info, "start": start, "duration": duration, "rank": rank}
+
+    def block_schedule(self, tasks, day_start):
+        """
+        book the vtuber's normalized tasks of one game day, shoots keep `buffer` away from them
+        :param day_start: game day (date) or its 08:00 datetime
+        :return: number of tasks booked
+        """
+        if not isinstance(day_start, datetime) and isinstance(day_start, date):
+            day_start = self.calendar.day_origin(day_start)
+        blocked = 0
+        for task in tasks:
+            try:
+                start, end = task_window(task, day_start)
+            except (KeyError, ValueError, AttributeError, TypeError):
+                continue
+            self.calendar.add(start, end, label=task.get("content"), kind=task.get("type"))
+            blocked += 1
+        return blocked
+
+    def _fits(self, day, start, duration):
+        if self.max_per_day and self.calendar.count(day, "shoot") >= self.max_per_day:
+            return False
+        return self.calendar.is_free(start, start + timedelta(minutes=duration), self.buffer)
+
+    def place(self, req, first_day):
+        days = [first_day + timedelta(days=i) for i in range(self.horizon_days)]
+        duration = req["duration"]
+
+        # preferred slot first
+        if req["rank"] == 0 and self.calendar.day_of(req["start"]) >= first_day:
+            day = self.calendar.day_of(req["start"])
+            if self._fits(day, req["start"], duration):
+                return req["start"]
+        elif req["rank"] in (0, 1):
+            hhmm = (req["start"].hour, req["start"].minute) if req["rank"] == 0 else req["start"]
+            for day in days:
+                start = self.at(day, hhmm)
+                if self._fits(day, start, duration):
+                    return start
+
+        # anywhere in the shoot window
+        for day in days:
+            if duration >= self.no_room.get(day, float("inf")):
+                continue
+            if self.max_per_day and self.calendar.count(day, "shoot") >= self.max_per_day:
+                continue
+            start = self.calendar.find_slot(day, duration, self.at(day, self.window[0]),
+                                            self.at(day, self.window[1]), self.buffer)
+            if start is not None:
+                return start
+            # bookings only get added during a run: this day won't fit this long a shoot again
+            self.no_room[day] = duration
+        return None
+
+    def schedule(self, projects, first_day):
+        """
+        :param projects: [(project_id, info)] in approval order
+        :param first_day: earliest game day (date) a shoot may be booked on
+        :return: booked [(project_id, info, start, end)], unplaced [project_id]
+        """
+        requests = sorted((self.request(pid, info) for pid, info in projects), key=lambda r: r["rank"])
+        self.no_room = {}           # day -> shortest duration that found no slot
+        booked, unplaced = [], []
+        for req in requests:
+            start = self.place(req, first_day)
+            if start is None:
+                unplaced.append(req["project_id"])
+                continue
+            end = start + timedelta(minutes=req["duration"])
+            self.calendar.add(start, end, label=req["info"].get("project_name"), kind="shoot")
+            booked.append((req["project_id"], req["info"], start, end))
+        return booked, unplaced
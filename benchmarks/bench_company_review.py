@@ -0,0 +1,61 @@
+"""
+mails/sec of CompanyAgent.daily_update: rule review A, llm review B with 1 vs N workers
+python benchmarks/bench_company_review.py [mails]
+"""
+import os
+import sys
+import time
+import tempfile
+import contextlib
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from agents.company_agent import CompanyAgent
+from ai.offline_llm import OfflineLLM
+from utils.clock import ManualClock
+from utils.game_time import GameTime
+from utils.mailbox import MailStore, COMPANY
+
+
+def fill(store, count):
+    mails = []
+    for i in range(count):
+        if i % 4 == 3:
+            body = {"type": "advertisement", "ad_title": f"廣告{i}", "ad_info": {"brand": "NEO ENERGY"}}
+        else:
+            body = {"type": "project", "project": {
+                "project_name": f"企劃{i}",
+                "project_content": "這是一個用於壓測的企劃內容，包含流程、亮點與目的。" if i % 5 else "太短",
+            }}
+        mails.append({"recipient": COMPANY, "body": body, "mail_type": body["type"],
+                      "timestamp": "2077-01-01 09:00:00"})
+    store.send_many(mails)
+
+
+def run(label, count, review_mode="A", workers=1, llm=None):
+    root = Path(tempfile.mkdtemp(prefix="vtuber_review_"))
+    data_dir = root / "data"
+    store = MailStore.open(data_dir, migrate=False)
+    fill(store, count)
+    company = CompanyAgent(
+        data_dir / "Company_Mailbox", data_dir / "Personal_Mailbox",
+        GameTime(speed_ratio=0, root_dir=root, clock=ManualClock()),
+        approved_store_path=data_dir / "approved_projects.json",
+        review_mode=review_mode, seed=0, mailbox=store, llm=llm, workers=workers,
+    )
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        t0 = time.perf_counter()
+        batch = company.daily_update()
+        wall = time.perf_counter() - t0
+    print(f"{label:<28}{count:>8}{batch['approved']:>10}{wall:>10.3f}{count / wall:>14.1f}")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"{'mode':<28}{'mails':>8}{'approved':>10}{'seconds':>10}{'mails/sec':>14}")
+    run("A rules", count)
+    # strict review with a fake 10ms llm round trip
+    llm_count = min(count, 400)
+    run("B llm, 1 worker", llm_count, "B", 1, OfflineLLM(latency=0.01))
+    run("B llm, 8 workers", llm_count, "B", 8, OfflineLLM(latency=0.01))
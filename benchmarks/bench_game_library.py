@@ -0,0 +1,147 @@
+"""
+GameLibrary vs the old list scans of GamestoreAgent at library size N (default 100k):
+title lookup, near-duplicate check, add, remove and one daily library update
+- the list near-duplicate baseline is a Jaccard scan over precomputed title bigrams
+python benchmarks/bench_game_library.py [games]
+"""
+import sys
+import time
+import random
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.game_library import GameLibrary, normalize_title, bigrams, markers
+
+SYLLABLES = ["sil", "ent", "hil", "star", "val", "ley", "dark", "soul", "dre", "am", "nig", "for", "est", "o",
+             "cean", "ir", "on", "bla", "de", "ne", "ci", "ty", "gho", "sha", "dow", "crys", "tal", "dra", "gon",
+             "moon", "ri", "ver", "sto", "rm", "gar", "den", "pix", "el", "que", "leg", "end", "to", "wer", "ec",
+             "ho", "fro", "em", "ber", "har", "bor", "ro", "gue", "cat", "is", "land", "cir", "cu", "it", "or",
+             "bit", "tem", "ple", "whis", "per", "vel", "vet", "thun", "lan", "tern", "maz", "clo", "ck", "sa", "ga"]
+CJK = ["星", "夜", "森", "海", "龍", "影", "月", "風", "城", "夢", "雪", "火", "貓", "島", "塔", "光", "之", "戰",
+       "物", "語", "騎", "士", "魔", "法", "傳", "說", "迷", "宮", "天", "空", "鐵", "花", "劍", "神"]
+GENRES = ["Horror", "Adventure", "Simulation", "Relax", "RPG", "Action", "Puzzle", "Social", "Racing"]
+HOURS = ["morning", "afternoon", "evening", "night"]
+
+
+def make_games(count, rng):
+    words = sorted({"".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+                    for _ in range(5000)})
+    games, seen = [], set()
+    while len(games) < count:
+        if rng.random() < 0.2:
+            title = "".join(rng.choice(CJK) for _ in range(rng.randint(3, 6)))
+        else:
+            title = " ".join(rng.choice(words) for _ in range(rng.randint(2, 4)))
+        if rng.random() < 0.3:
+            title += f" {rng.randint(2, 9)}"
+        if title in seen:
+            continue
+        seen.add(title)
+        games.append({
+            "id": f"game_{len(games):06d}",
+            "title": title,
+            "genre": rng.sample(GENRES, 2),
+            "stream_recommendation": {"peak_hours": rng.sample(HOURS, rng.randint(1, 2)),
+                                      "ideal_duration_min": rng.choice([60, 120, 180])},
+        })
+    return games
+
+
+def typo(title, rng):
+    """
+    llm style variant of a title: case, spacing and one dropped letter
+    """
+    words = title.split()
+    i = max(range(len(words)), key=lambda k: len(words[k]) if not words[k].isdigit() else 0)
+    if len(words[i]) > 4:
+        j = rng.randrange(1, len(words[i]) - 1)
+        words[i] = words[i][:j] + words[i][j + 1:]
+    return "  ".join(words).upper()
+
+
+def timed(fn, rounds):
+    t0 = time.perf_counter()
+    for i in range(rounds):
+        fn(i)
+    return (time.perf_counter() - t0) / rounds * 1e6
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rng = random.Random(0)
+    games = make_games(count + 2000, rng)
+    games, extra = games[:count], games[count:]
+
+    # a stored library is loaded without dedup checks
+    t0 = time.perf_counter()
+    library = GameLibrary()
+    for game in games:
+        library.add(game, dedup=False)
+    build = time.perf_counter() - t0
+    print(f"{count} games: loaded in {build:.2f}s ({build / count * 1e6:.1f} us/game)")
+
+    stored = library.to_list()
+    plain = list(stored)
+    queries = [rng.choice(stored) for _ in range(2000)]
+    variants = [(q, typo(q["title"], rng)) for q in queries[:500]]
+    rounds_old = 200
+
+    def old_lookup(i):
+        title = queries[i]["title"]
+        for existing in plain:
+            if existing["title"] == title:
+                return existing
+
+    old = timed(old_lookup, rounds_old)
+    new = timed(lambda i: library.get(queries[i]["title"]), len(queries))
+    print(f"{'operation':<30}{'list scan us':>14}{'GameLibrary us':>16}{'speedup':>10}")
+    print(f"{'title lookup':<30}{old:>14.1f}{new:>16.2f}{old / new:>9.0f}x")
+
+    scan = [(bigrams(normalize_title(g["title"])), markers(g["title"]), g) for g in plain]
+
+    def old_similar(i):
+        title = variants[i][1]
+        grams, marks = bigrams(normalize_title(title)), markers(title)
+        return [g for other, other_marks, g in scan
+                if other_marks == marks and len(grams & other) / len(grams | other) >= library.threshold]
+
+    old = timed(old_similar, 20)
+    near = timed(lambda i: library.find_duplicate({"title": variants[i][1]}), len(variants))
+    found = sum(1 for q, v in variants if library.find_duplicate({"title": v}) is q)
+    print(f"{'near-duplicate check':<30}{old:>14.1f}{near:>16.1f}{old / near:>9.0f}x  "
+          f"recall {found / len(variants):.1%} on typo/case variants")
+
+    rejected = []
+    add = timed(lambda i: rejected.append(not library.add(extra[i])[0]), len(extra))
+    print(f"{'add with dedup check':<30}{'':>14}{add:>16.1f}{'':>10}  "
+          f"{sum(rejected)} of {len(extra)} rejected as near duplicates")
+
+    genre = timed(lambda i: len(library.by_genre(GENRES[i % len(GENRES)])), 50)
+    print(f"{'genre query (all matches)':<30}{'':>14}{genre:>16.1f}")
+
+    removed = queries[:rounds_old]
+    old = timed(lambda i: plain.remove(removed[i]), rounds_old)
+    new = timed(lambda i: library.remove(removed[i]), rounds_old)
+    print(f"{'remove':<30}{old:>14.1f}{new:>16.2f}{old / new:>9.0f}x")
+
+    # one daily update: 5 recommended games checked and added, 3 random old games removed
+    new_games = make_games(5, random.Random(1))
+    t0 = time.perf_counter()
+    for game in new_games:
+        if not any(existing["title"] == game["title"] for existing in plain):
+            plain.append(game)
+    candidates = [g for g in plain if g not in new_games]
+    for game in random.Random(2).sample(candidates, 3):
+        plain.remove(game)
+    old = (time.perf_counter() - t0) * 1e3
+    t0 = time.perf_counter()
+    keep = {library.key(library.add(game)[1]) for game in new_games}
+    for game in library.sample(3, exclude=keep, rng=random.Random(2)):
+        library.remove(game)
+    new = (time.perf_counter() - t0) * 1e3
+    print(f"{'daily update (ms)':<30}{old:>14.1f}{new:>16.1f}{old / new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
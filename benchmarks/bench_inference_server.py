@@ -0,0 +1,66 @@
+"""
+requests/sec and p50/p99 latency of the BatchedGenerator behind ai/server.py on CPU,
+one request at a time vs dynamic batching, with and without the persona prefix cache
+python benchmarks/bench_inference_server.py [model] [requests]
+(model: any small causal LM, default sshleifer/tiny-gpt2; "tiny" builds ai.inference.tiny_model offline)
+
+tiny (2 layers, 64 dim, char tokenizer), 64 requests, CPU:
+mode                             req/s    p50 ms    p99 ms   batch  cached tok   saved s
+one at a time                     36.3     891.3    1763.8     1.0           0     0.000
+batched 8                        181.0     225.7     352.7     8.0           0     0.000
+batched 8 + prefix cache         248.2     159.0     257.3     8.0        4544     0.143
+ai/server.py on the same model: 64 concurrent POST /generate in 0.46s (140 req/s),
+mean batch 6.5, p50 222 ms, p99 535 ms
+"""
+import sys
+import time
+import asyncio
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+from ai.inference import BatchedGenerator, persona_prefix, tiny_model
+from configs.persona_config import persona
+
+LINES = ["今天玩什麽遊戲？", "你喜歡喝什麽飲料？", "晚上好喵", "明天幾點開播？", "可以唱首歌嗎？"]
+
+
+async def run(model, tokenizer, requests, max_batch, prefixes):
+    generator = BatchedGenerator(model, tokenizer, "cpu", max_batch=max_batch, batch_wait=0.005,
+                                 max_new_tokens=16, prefixes=prefixes)
+    await generator.start()
+    prefix = persona_prefix(persona)
+    t0 = time.perf_counter()
+    await asyncio.gather(*(generator.generate(prefix + LINES[i % len(LINES)]) for i in range(requests)))
+    wall = time.perf_counter() - t0
+    stats = generator.stats()
+    await generator.stop()
+    return wall, stats
+
+
+def main():
+    name = sys.argv[1] if len(sys.argv) > 1 else "sshleifer/tiny-gpt2"
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    if name == "tiny":
+        model, tokenizer = tiny_model(persona_prefix(persona) + "".join(LINES))
+    else:
+        tokenizer = AutoTokenizer.from_pretrained(name)
+        model = AutoModelForCausalLM.from_pretrained(name).eval()
+
+    print(f"{name}, {requests} concurrent requests, 16 new tokens each")
+    print(f"{'mode':<28}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'batch':>8}{'cached tok':>12}{'saved s':>10}")
+    for label, max_batch, prefixes in (
+        ("one at a time", 1, ()),
+        ("batched 8", 8, ()),
+        ("batched 8 + prefix cache", 8, (persona_prefix(persona),)),
+    ):
+        wall, stats = asyncio.run(run(model, tokenizer, requests, max_batch, prefixes))
+        print(f"{label:<28}{requests / wall:>10.1f}{stats['latency_p50'] * 1000:>10.1f}"
+              f"{stats['latency_p99'] * 1000:>10.1f}{stats['mean_batch']:>8.1f}"
+              f"{stats['cached_tokens']:>12}{stats['prefill_saved_seconds']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+prompt build cost per task: re-reading the template and chained str.replace (the old way)
+vs the compiled TemplateRegistry with its cached persona header
+python benchmarks/bench_prompt_render.py [rounds]
+"""
+import sys
+import json
+import time
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from ai.prompt_templates import TemplateRegistry, persona_header
+from configs.persona_config import persona
+from data.game_list import game_list
+
+TEMPLATE_DIR = project_root / "configs" / "prompt_templates"
+PROJECT_JSON = json.dumps({"project_name": "深夜恐怖遊戲馬拉松", "project_content": "連續三晚挑戰經典恐怖遊戲。"},
+                          ensure_ascii=False, indent=2)
+COMPANY_TASKS = "[2077-01-03 14:00-16:00] shoot 深夜恐怖遊戲馬拉松"
+TASKS = "1. [cover] 10:00-11:00 製作直播封面\n2. [tweet/preview] 13:00-13:30 今晚直播預告"
+
+
+def old_persona():
+    return (
+        f"主播名字：{persona['name']}\n"
+        f"説話風格：{persona['style']}\n"
+        f"行爲特徵：{persona['behavior_traits']}\n"
+        "\n"
+    )
+
+
+def old_tweet():
+    p = (TEMPLATE_DIR / "tweet.txt").read_text(encoding="utf-8")
+    return old_persona() + p + "\n[使用者輸入]\n今晚20:00直播預告\n"
+
+
+def old_project():
+    p = (TEMPLATE_DIR / "project.txt").read_text(encoding="utf-8")
+    return p + "\n[使用者輸入]\n新企劃\n"
+
+
+def old_email():
+    p = (TEMPLATE_DIR / "p2c_email.txt").read_text(encoding="utf-8")
+    p = p.replace("{vtuber_name}", persona["name"])
+    p = p.replace("{company_name}", "2333")
+    return p.replace("{project_json}", PROJECT_JSON)
+
+
+def old_todolist():
+    p = (TEMPLATE_DIR / "todolist.txt").read_text(encoding="utf-8")
+    p = p.replace("{game_list}", json.dumps(game_list, ensure_ascii=False))
+    return "[date] 2077-01-02\n" + p.replace("{company_tasks}", COMPANY_TASKS)
+
+
+def old_review():
+    p = (TEMPLATE_DIR / "project_review.txt").read_text(encoding="utf-8")
+    return p.replace("{project_json}", PROJECT_JSON)
+
+
+def old_contents():
+    p = (TEMPLATE_DIR / "todolist_content.txt").read_text(encoding="utf-8")
+    header = f"主播名字：{persona['name']}\n説話風格：{persona['style']}\n\n"
+    return header + p.replace("{tasks}", TASKS)
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    registry = TemplateRegistry()
+    game_list_text = json.dumps(game_list, ensure_ascii=False)
+    tasks = {
+        "tweet": (old_tweet, lambda: registry.persona_header(persona) + registry.text("tweet.txt")
+                  + "\n[使用者輸入]\n今晚20:00直播預告\n"),
+        "project": (old_project, lambda: registry.text("project.txt") + "\n[使用者輸入]\n新企劃\n"),
+        "email": (old_email, lambda: registry.render("p2c_email.txt", vtuber_name=persona["name"],
+                                                     company_name="2333", project_json=PROJECT_JSON)),
+        "todolist": (old_todolist, lambda: "[date] 2077-01-02\n" + registry.render(
+            "todolist.txt", game_list=game_list_text, company_tasks=COMPANY_TASKS)),
+        "review": (old_review, lambda: registry.render("project_review.txt", project_json=PROJECT_JSON)),
+        "contents": (old_contents, lambda: registry.persona_header(persona, traits=False)
+                     + registry.render("todolist_content.txt", tasks=TASKS)),
+    }
+    print(f"{rounds} renders per task")
+    print(f"{'task':<10}{'read+replace us':>18}{'registry us':>14}{'speedup':>10}")
+    for name, (old, new) in tasks.items():
+        timings = []
+        for fn in (old, new):
+            t0 = time.perf_counter()
+            for _ in range(rounds):
+                fn()
+            timings.append((time.perf_counter() - t0) / rounds * 1e6)
+        print(f"{name:<10}{timings[0]:>18.2f}{timings[1]:>14.2f}{timings[0] / timings[1]:>9.1f}x")
+    print(f"persona header: {len(persona_header(persona))} chars, cached per persona")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+round-trip check + micro-benchmark of the UnityBridge wire formats
+python benchmarks/bench_wire_format.py
+"""
+import sys
+import json
+import time
+import socket
+from datetime import datetime
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.unity_bridge import UnityBridge, RecordingUnityBridge
+from utils.wire_format import CODECS, msgpack
+
+
+def sample_events():
+    """
+    every message type the agent sends, produced by the real send_* helpers
+    """
+    sink = RecordingUnityBridge()
+    game_time = datetime(2077, 1, 1, 20, 0)
+    for hh in range(24):
+        sink.send_time(f"{hh:02d}:{hh * 2 % 60:02d}")
+        sink.last_background_state = None
+        sink.update_background(game_time.replace(hour=hh), "sunshine" if hh % 2 else "rain")
+    sink.send_time("8:05")      # not zero padded, must still round-trip
+    sink.send_tweet_show()
+    sink.send_tweet_update("今晚20:00一起玩Silent Hill f喵！")
+    sink.send_tweet_hide()
+    sink.send_cover_image("https://example.com/cover.png", game_time)
+    sink.send_stream_start(game_time)
+    sink.send_stream_talk("大家好喵～")
+    sink.send_stream_end()
+    return list(sink.messages)
+
+
+def check_round_trip(events):
+    for codec in CODECS.values():
+        stream = b"".join(codec.encode(e) for e in events)
+        decoder = codec.decoder()
+        decoded = []
+        # feed in small pieces to exercise partial frames
+        for i in range(0, len(stream), 7):
+            decoded += decoder.feed(stream[i:i + 7])
+        assert decoded == events, f"{codec.name} round-trip mismatch"
+        print(f"[Wire] {codec.name}: {len(events)} events round-trip OK")
+
+
+def check_negotiation(events, offered, port=50199):
+    bridge = UnityBridge(port=port)
+    try:
+        client = socket.create_connection(("127.0.0.1", port))
+        client.settimeout(2)
+        client.sendall((json.dumps({"hello": {"formats": offered}}) + "\n").encode("utf-8"))
+        bridge.wait_for_unity(2)
+        time.sleep(0.2)
+        for event in events:
+            bridge.send(event)
+
+        pending = b""
+        binary = None
+        chosen = None
+        received = []
+        while not received or received[-1] != events[-1]:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            if binary is not None:
+                received += binary.feed(chunk)
+                continue
+            # JSON lines until the format ack, binary frames right after it
+            pending += chunk
+            while binary is None and b"\n" in pending:
+                line, pending = pending.split(b"\n", 1)
+                message = json.loads(line)
+                if message.get("event") == "format":
+                    chosen = message["format"]
+                    binary = CODECS[chosen].decoder()
+                    received += binary.feed(pending)
+                else:
+                    received.append(message)
+        client.close()
+        # time/background updates may be coalesced, every other event must arrive in order
+        expected = [e for e in events if e["event"] not in ("time_update", "background")]
+        got = [e for e in received if e["event"] not in ("time_update", "background")]
+        assert got == expected, "negotiated stream mismatch"
+        assert chosen == offered[0], f"offered {offered}, got {chosen}"
+        print(f"[Wire] negotiation OK, {len(received)} messages received, switched to {chosen}")
+    finally:
+        bridge.close()
+
+
+def bench(events, rounds=2000):
+    hot = [e for e in events if e["event"] in ("time_update", "background")]
+    print(f"\n[Wire] msgpack available: {msgpack is not None}")
+    print(f"{'codec':<14}{'set':<6}{'bytes/event':>12}{'encode us/event':>17}{'decode us/event':>17}")
+    for codec in CODECS.values():
+        for label, batch in (("hot", hot), ("all", events)):
+            t0 = time.perf_counter()
+            for _ in range(rounds):
+                for e in batch:
+                    codec.encode(e)
+            encode_us = (time.perf_counter() - t0) / (rounds * len(batch)) * 1e6
+
+            stream = b"".join(codec.encode(e) for e in batch)
+            t0 = time.perf_counter()
+            for _ in range(rounds):
+                codec.decoder().feed(stream)
+            decode_us = (time.perf_counter() - t0) / (rounds * len(batch)) * 1e6
+
+            print(f"{codec.name:<14}{label:<6}{len(stream) / len(batch):>12.1f}{encode_us:>17.2f}{decode_us:>17.2f}")
+
+
+if __name__ == "__main__":
+    events = sample_events()
+    check_round_trip(events)
+    # the body encoding is part of the format: each binary format is negotiated on its own
+    for name in CODECS:
+        if name != "json":
+            check_negotiation(events, [name, "json"])
+    bench(events)
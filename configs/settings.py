@@ -9,3 +9,83 @@ DEFAULT_RESPONSE_FORMAT = {"type": "json_object"}
 MAILBOX_COMPANY = "./data/Company_Mailbox"
 MAILBOX_PERSONAL = "./data/Personal_Mailbox"
 
+# async llm client
+LLM_MAX_CONCURRENCY = 8       # requests in flight shared by every client
+LLM_HTTP_TIMEOUT = 120        # seconds per request
+LLM_KEEPALIVE_TIMEOUT = 30    # seconds an idle connection stays open
+LLM_RATE_LIMIT = None         # requests per second for the whole process, None = unlimited
+
+# todolist generation: "rules" = local RulePlanner, "rules+llm" = RulePlanner + llm written contents,
+# "llm" = the whole todolist from the llm
+TODOLIST_PLANNER = "rules+llm"
+
+# llm response cache (opt-in)
+LLM_CACHE_ENABLED = False
+LLM_CACHE_MAX_ENTRIES = 512           # memory tier (LRU)
+LLM_CACHE_TTL = 7 * 24 * 3600         # seconds, None = never expire
+LLM_CACHE_DB = None                   # e.g. "./data/llm_cache.sqlite3" to enable the disk tier
+LLM_CACHE_MAX_DISK_ENTRIES = 10000
+
+# prompt prefix reuse: prompts are sent as a stable prefix (persona, rules) + the variable part
+# "implicit" = prefix first as its own message (provider caches matching prefixes on its own),
+# "explicit" = also mark it cache_control ephemeral, None = one plain user message
+LLM_CONTEXT_CACHE = "implicit"
+LLM_PREFILL_SECONDS_PER_KTOKEN = 0.05     # estimate of the cloud prefill time a cached 1k tokens saves
+
+# prompt templates are re-read when their file changed, checked at most this often (seconds)
+PROMPT_TEMPLATE_CHECK_INTERVAL = 1.0
+
+# llm JSON answers: local repair first, then bounded retries
+LLM_JSON_RETRIES = 2                  # extra requests after a malformed / off-schema answer
+LLM_JSON_BACKOFF = 1.0                # seconds before the first retry, doubled for each next one
+
+# local inference server (ai/server.py)
+SERVER_MODEL_PATH = "/Models/Deepseek-r1-1.5b-wenyehuan"     # VTUBER_MODEL_PATH overrides
+SERVER_MAX_BATCH = 8                  # requests generated together
+SERVER_BATCH_WAIT = 0.01              # seconds the first request waits for others to join its batch
+SERVER_MAX_NEW_TOKENS = 256           # cap per request
+SERVER_PREFIX_CACHE_SIZE = 4          # prompt prefixes (persona headers) whose KV cache is kept
+
+# local fine-tuned model client (DeepseekVtuber -> ai/server.py)
+DEEPSEEK_URL = "http://127.0.0.1:8000"
+DEEPSEEK_MAX_CONCURRENCY = 4          # requests in flight, separate from the cloud limit
+DEEPSEEK_TIMEOUT = 30                 # seconds per request
+DEEPSEEK_MAX_NEW_TOKENS = 128
+DEEPSEEK_RETRY_AFTER = 60             # seconds the server counts as down after a failed connection
+
+# backend per executor task: "llm" (QwenLLM), "gm" (QwenGM) or "deepseek" (local model);
+# used when the executor builds its own backends, an injected llm answers every text task
+TASK_BACKENDS = {
+    "talk": "deepseek",               # stream talk, latency critical, falls back to "llm" when the server is down
+    "tweet": "llm",
+    "project": "llm",
+    "email": "llm",
+    "cover": "gm",
+}
+
+# speculative prefetch: llm output of upcoming tasks is generated in the background
+PREFETCH_LOOKAHEAD_HOURS = 12         # game hours before a task's start, 0 = off
+PREFETCH_MAX_TASKS = 6                # tasks prefetched per day at most
+
+# game library: titles whose bigram Jaccard similarity reaches this count as the same game
+GAME_DEDUP_THRESHOLD = 0.75
+
+# generated covers: downloaded into the content-addressed store <data>/assets
+COVER_THUMB_SIZES = [(640, 360), (320, 180)]     # thumbnails (needs Pillow)
+# how Unity gets the cover: "path" = local file path in cover_image (Unity on the same machine),
+# "inline" = the image bytes go over the bridge as an asset message first
+UNITY_COVER_DELIVERY = "path"
+
+# agent checkpoint (data/checkpoint.json + data/checkpoint.journal)
+CHECKPOINT_INTERVAL = 30              # real seconds between full snapshots, events are journaled at once
+
+# company review
+COMPANY_REVIEW_WORKERS = 4            # parallel reviewers, matters for the llm assisted strict mode B
+
+# shoot scheduling (CompanyAgent)
+SHOOT_WINDOW = ("10:00", "18:00")     # shoots are booked inside this time of day
+SHOOT_DEFAULT_MINUTES = 120
+SHOOT_HORIZON_DAYS = 7                # game days ahead the scheduler may book
+SHOOT_MAX_PER_DAY = 2
+SHOOT_BUFFER_MINUTES = 30             # gap kept to any other task
+SHOOT_PROBABILITY = 0.5               # chance the company books shoots on a given day
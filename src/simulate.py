@@ -0,0 +1,22 @@
+import sys
+import json
+import argparse
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+from agents.headless_simulation import HeadlessSimulation
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless fast-forward simulation of VtuberAgent")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--root", default=None, help="data root, temp dir if omitted")
+    parser.add_argument("--verbose", action="store_true", help="keep agent logs")
+    parser.add_argument("--seed", type=int, default=0, help="same seed = same run")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="share of malformed offline llm answers")
+    args = parser.parse_args()
+
+    sim = HeadlessSimulation(root_path=args.root, quiet=not args.verbose, seed=args.seed, corrupt=args.corrupt)
+    report = sim.run(args.days)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
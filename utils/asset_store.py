@@ -0,0 +1,240 @@
+import io
+import os
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import sys
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    from PIL import Image
+except ImportError:     # optional, without Pillow only the full size image is stored
+    Image = None
+
+from configs.settings import COVER_THUMB_SIZES
+
+DB_NAME = "assets.sqlite3"
+FULL = "full"
+
+MAGIC = [
+    (b"\x89PNG\r\n\x1a\n", "png", "image/png"),
+    (b"\xff\xd8\xff", "jpg", "image/jpeg"),
+    (b"GIF8", "gif", "image/gif"),
+]
+
+
+def sniff(data):
+    """
+    (extension, mime type) from the first bytes
+    """
+    for magic, ext, mime in MAGIC:
+        if data.startswith(magic):
+            return ext, mime
+    # RIFF is a container (WAV, AVI, ...), only the WEBP form type is an image
+    if data.startswith(b"RIFF") and data[8:12] == b"WEBP":
+        return "webp", "image/webp"
+    return "bin", "application/octet-stream"
+
+
+def cover_key(game_date, content):
+    """
+    the same cover task on the same game day is the same cover
+    """
+    return f"cover:{game_date.strftime('%Y-%m-%d')}:{content.strip()}"
+
+
+class AssetStore:
+    """
+    content-addressed image store under <data>/assets
+    - objects/<sha[:2]>/<sha>.<ext>: every distinct image once, whatever url or task produced it
+    - thumbs/<sha>_<w>x<h>.jpg: size variants (COVER_THUMB_SIZES), made with Pillow when installed
+    - assets.sqlite3 indexes objects, their variants and task keys (cover_key) -> sha,
+      a key seen before is served from disk instead of generating and downloading again
+    - hashing, writing and thumbnailing run on one worker thread, put_async never blocks the loop
+    asset = dict: sha256, path, size, ext, mime, source, thumbnails {"WxH": path}
+    """
+    _stores = {}
+    _stores_lock = threading.Lock()
+
+    def __init__(self, root, thumb_sizes=COVER_THUMB_SIZES):
+        self.root = Path(root)
+        (self.root / "objects").mkdir(parents=True, exist_ok=True)
+        (self.root / "thumbs").mkdir(parents=True, exist_ok=True)
+        self.thumb_sizes = [tuple(size) for size in thumb_sizes] if Image is not None else []
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="assets")
+        self.db = sqlite3.connect(str(self.root / DB_NAME), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS objects ("
+            "sha256 TEXT PRIMARY KEY, ext TEXT, mime TEXT, size INTEGER, source TEXT, created REAL)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS variants ("
+            "sha256 TEXT NOT NULL, variant TEXT NOT NULL, path TEXT NOT NULL, "
+            "PRIMARY KEY (sha256, variant))"
+        )
+        self.db.execute("CREATE TABLE IF NOT EXISTS keys (key TEXT PRIMARY KEY, sha256 TEXT NOT NULL)")
+        self.db.commit()
+        self.hits = 0
+        self.stored = 0
+        self.deduplicated = 0
+        if Image is None and thumb_sizes:
+            print("[Assets] Pillow not installed, covers are stored without thumbnails")
+
+    @classmethod
+    def open(cls, data_dir):
+        """
+        one store per data dir and process
+        """
+        root = (Path(data_dir) / "assets").resolve()
+        with cls._stores_lock:
+            store = cls._stores.get(root)
+            if store is None:
+                store = cls._stores[root] = cls(root)
+            return store
+
+    # ---------------- read ----------------
+    def get(self, sha256):
+        """
+        asset dict, None when unknown or its file is gone
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT ext, mime, size, source FROM objects WHERE sha256 = ?", (sha256,)).fetchone()
+            variants = self.db.execute(
+                "SELECT variant, path FROM variants WHERE sha256 = ?", (sha256,)).fetchall()
+        if row is None:
+            return None
+        paths = {variant: self.root / path for variant, path in variants}
+        if FULL not in paths or not paths[FULL].exists():
+            return None
+        ext, mime, size, source = row
+        return {
+            "sha256": sha256,
+            "path": str(paths.pop(FULL)),
+            "size": size,
+            "ext": ext,
+            "mime": mime,
+            "source": source,
+            "thumbnails": {variant: str(path) for variant, path in sorted(paths.items()) if path.exists()},
+        }
+
+    def lookup(self, key):
+        """
+        asset stored under a task key (cover_key), None on a miss
+        """
+        with self.lock:
+            row = self.db.execute("SELECT sha256 FROM keys WHERE key = ?", (key,)).fetchone()
+        asset = self.get(row[0]) if row else None
+        if asset is not None:
+            self.hits += 1
+        return asset
+
+    def read(self, sha256, variant=FULL):
+        asset = self.get(sha256)
+        if asset is None:
+            return None
+        path = asset["path"] if variant == FULL else asset["thumbnails"].get(variant)
+        return Path(path).read_bytes() if path else None
+
+    # ---------------- write ----------------
+    def put(self, data, key=None, source=None):
+        """
+        store bytes (once per content) and their thumbnails, remember key -> content
+        """
+        sha256 = hashlib.sha256(data).hexdigest()
+        asset = self.get(sha256)
+        if asset is None:
+            ext, mime = sniff(data)
+            rel = Path("objects") / sha256[:2] / f"{sha256}.{ext}"
+            self._write(self.root / rel, data)
+            variants = [(sha256, FULL, str(rel))]
+            thumbs = self._thumbnails(data) if mime.startswith("image/") else []
+            for (width, height), thumb in thumbs:
+                rel_thumb = Path("thumbs") / f"{sha256}_{width}x{height}.jpg"
+                self._write(self.root / rel_thumb, thumb)
+                variants.append((sha256, f"{width}x{height}", str(rel_thumb)))
+            with self.lock:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO objects (sha256, ext, mime, size, source, created) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", (sha256, ext, mime, len(data), source, time.time()))
+                self.db.executemany("INSERT OR REPLACE INTO variants VALUES (?, ?, ?)", variants)
+                self.db.commit()
+            self.stored += 1
+            asset = self.get(sha256)
+        else:
+            self.deduplicated += 1
+        if key is not None:
+            with self.lock:
+                self.db.execute("INSERT OR REPLACE INTO keys (key, sha256) VALUES (?, ?)", (key, sha256))
+                self.db.commit()
+        return asset
+
+    async def put_async(self, data, key=None, source=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.put, data, key, source)
+
+    @staticmethod
+    def _write(path, data):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def _thumbnails(self, data):
+        if not self.thumb_sizes:
+            return []
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image = image.convert("RGB")
+                thumbs = []
+                for size in self.thumb_sizes:
+                    thumb = image.copy()
+                    thumb.thumbnail(size)
+                    out = io.BytesIO()
+                    thumb.save(out, "JPEG", quality=85)
+                    thumbs.append((size, out.getvalue()))
+                return thumbs
+        except Exception as e:
+            # not an image Pillow can read, keep the original only
+            print(f"[Assets] No thumbnails: {e!r}")
+            return []
+
+    def stats(self):
+        with self.lock:
+            objects, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects").fetchone()
+            keys = self.db.execute("SELECT COUNT(*) FROM keys").fetchone()[0]
+        return {
+            "objects": objects,
+            "bytes": size,
+            "keys": keys,
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "key_hits": self.hits,
+            "thumb_sizes": [f"{w}x{h}" for w, h in self.thumb_sizes],
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        with self.lock:
+            self.db.close()
+
+
+if __name__ == "__main__":
+    import tempfile
+    from datetime import datetime
+    from ai.offline_llm import OfflineGM
+
+    store = AssetStore(Path(tempfile.mkdtemp(prefix="assets_")))
+    gm = OfflineGM()
+    url = gm.ask_json("製作直播封面")
+    key = cover_key(datetime(2077, 1, 1), "製作直播封面")
+    print(store.put(gm.fetch_bytes(url), key=key, source=url))
+    print(store.lookup(key) is not None, store.stats())
@@ -0,0 +1,128 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+
+class CalendarIndex:
+    """
+    booked time, bucketed per game day (day_start_hour -> day_start_hour next morning)
+    - every day keeps its busy time as merged, disjoint intervals in two sorted arrays
+      (minutes since the day start), so conflict checks and slot searches are O(log n) bisects
+    - bookings keep the original (start, end, label, kind) for inspection and per-kind counts
+    - an interval crossing the end of its game day is split into both days
+    """
+    def __init__(self, day_start_hour=8):
+        self.day_start_hour = day_start_hour
+        self.days = {}              # date -> {"starts": [], "ends": [], "bookings": [], "kinds": {}}
+        self.origins = {}           # date -> datetime of its day start
+
+    # ---------------- day helpers ----------------
+    def day_of(self, dt):
+        """
+        game day an instant belongs to, 03:00 still counts as the previous day
+        """
+        return (dt - timedelta(hours=self.day_start_hour)).date()
+
+    def day_origin(self, day):
+        origin = self.origins.get(day)
+        if origin is None:
+            origin = datetime.combine(day, datetime.min.time()) + timedelta(hours=self.day_start_hour)
+            self.origins[day] = origin
+        return origin
+
+    def _minutes(self, day, dt):
+        return int((dt - self.day_origin(day)).total_seconds() // 60)
+
+    def _day(self, day):
+        slots = self.days.get(day)
+        if slots is None:
+            slots = {"starts": [], "ends": [], "bookings": [], "kinds": {}}
+            self.days[day] = slots
+        return slots
+
+    # ---------------- write ----------------
+    def add(self, start, end, label=None, kind=None):
+        """
+        book [start, end), overlapping busy time is merged
+        """
+        if end <= start:
+            return
+        day = self.day_of(start)
+        day_end = self.day_origin(day) + timedelta(days=1)
+        if end > day_end:
+            self.add(day_end, end, label, kind)
+            end = day_end
+
+        slots = self._day(day)
+        slots["bookings"].append((start, end, label, kind))
+        slots["kinds"][kind] = slots["kinds"].get(kind, 0) + 1
+        s, e = self._minutes(day, start), self._minutes(day, end)
+        starts, ends = slots["starts"], slots["ends"]
+        # intervals touching [s, e] are merged into one
+        i = bisect_left(ends, s)
+        j = bisect_right(starts, e)
+        if i < j:
+            s = min(s, starts[i])
+            e = max(e, ends[j - 1])
+        starts[i:j] = [s]
+        ends[i:j] = [e]
+
+    # ---------------- read ----------------
+    def is_free(self, start, end, buffer=0):
+        """
+        True when nothing is booked within `buffer` minutes of [start, end)
+        """
+        day = self.day_of(start)
+        slots = self.days.get(day)
+        if slots is None:
+            return True
+        s, e = self._minutes(day, start) - buffer, self._minutes(day, end) + buffer
+        i = bisect_right(slots["ends"], s)
+        return i == len(slots["starts"]) or slots["starts"][i] >= e
+
+    def find_slot(self, day, duration, window_start, window_end, buffer=0):
+        """
+        earliest start within [window_start, window_end] of a game day where `duration` minutes fit,
+        keeping `buffer` minutes from other bookings; window bounds are datetimes, None if full
+        """
+        slots = self.days.get(day)
+        t = self._minutes(day, window_start)
+        last = self._minutes(day, window_end)
+        if slots is not None:
+            starts, ends = slots["starts"], slots["ends"]
+            i = bisect_right(ends, t - buffer)
+            while i < len(starts) and starts[i] < t + duration + buffer:
+                t = max(t, ends[i] + buffer)
+                i += 1
+        if t + duration > last:
+            return None
+        return self.day_origin(day) + timedelta(minutes=t)
+
+    def busy(self, day):
+        slots = self.days.get(day)
+        if slots is None:
+            return []
+        origin = self.day_origin(day)
+        return [(origin + timedelta(minutes=s), origin + timedelta(minutes=e))
+                for s, e in zip(slots["starts"], slots["ends"])]
+
+    def bookings(self, day, kind=None):
+        slots = self.days.get(day)
+        if slots is None:
+            return []
+        return [b for b in slots["bookings"] if kind is None or b[3] == kind]
+
+    def count(self, day, kind=None):
+        slots = self.days.get(day)
+        if slots is None:
+            return 0
+        if kind is None:
+            return len(slots["bookings"])
+        return slots["kinds"].get(kind, 0)
+
+    def drop_before(self, day):
+        """
+        forget game days before `day`
+        """
+        for old in [d for d in self.days if d < day]:
+            del self.days[old]
+        self.origins = {d: o for d, o in self.origins.items() if d >= day}
@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import contextlib
+from collections import deque
+from collections.abc import MutableMapping
+from pathlib import Path
+
+
+def fsync_dir(path):
+    """
+    make a rename inside `path` durable (no-op where directories can't be opened)
+    """
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_text(path, text):
+    """
+    write to a temp file in the same directory, fsync, then rename over the target:
+    readers see either the old or the new file, never a torn one
+    """
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    fsync_dir(path.parent)
+
+
+def atomic_write_json(path, data, **dump_kwargs):
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False, **dump_kwargs))
+
+
+class Checkpointer:
+    """
+    crash-safe agent checkpoints:
+    - snapshot: full state (clock, day, schedule) written atomically, at most every `interval` seconds
+    - journal: one fsynced JSON line per event (day start, schedule, task start/end ...)
+      since the last snapshot, replayed on restore so nothing between snapshots is lost
+    - a torn last journal line (crash mid-append) is ignored
+    """
+    def __init__(self, data_dir, interval=30.0, name="checkpoint"):
+        self.data_dir = Path(data_dir)
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.snapshot_path = self.data_dir / f"{name}.json"
+        self.journal_path = self.data_dir / f"{name}.journal"
+        self.interval = interval
+        self.last_snapshot = 0.0
+        self.journal = None
+        self.snapshot_latency = deque(maxlen=200)
+        self.journal_latency = deque(maxlen=200)
+
+    # ---------------- write ----------------
+    def record(self, op, **fields):
+        t0 = time.perf_counter()
+        if self.journal is None:
+            self.journal = open(self.journal_path, "a", encoding="utf-8")
+        fields["op"] = op
+        self.journal.write(json.dumps(fields, ensure_ascii=False) + "\n")
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        self.journal_latency.append(time.perf_counter() - t0)
+
+    def due(self):
+        return time.monotonic() - self.last_snapshot >= self.interval
+
+    def snapshot(self, state):
+        """
+        write the full state and start a fresh journal
+        """
+        t0 = time.perf_counter()
+        atomic_write_json(self.snapshot_path, state)
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        # the snapshot already contains everything journaled so far
+        atomic_write_text(self.journal_path, "")
+        self.last_snapshot = time.monotonic()
+        self.snapshot_latency.append(time.perf_counter() - t0)
+
+    # ---------------- read ----------------
+    def restore(self):
+        """
+        return (snapshot_state or None, journal entries written after it)
+        """
+        state = None
+        if self.snapshot_path.exists():
+            try:
+                state = json.loads(self.snapshot_path.read_text(encoding="utf-8"))
+            except ValueError:
+                print(f"[Checkpoint] Snapshot {self.snapshot_path} unreadable, ignoring it")
+
+        entries = []
+        if self.journal_path.exists():
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        # torn tail from a crash mid-append
+                        break
+        return state, entries
+
+    def stats(self):
+        def summary(samples):
+            if not samples:
+                return {"count": 0}
+            return {
+                "count": len(samples),
+                "mean_ms": sum(samples) / len(samples) * 1000,
+                "max_ms": max(samples) * 1000,
+            }
+
+        return {
+            "snapshot": summary(self.snapshot_latency),
+            "journal": summary(self.journal_latency),
+        }
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+
+class JournaledDict(MutableMapping):
+    """
+    dict persisted as snapshot + append-only change journal
+    - <path>: full JSON snapshot (a plain dict file, so older saves load as is)
+    - <path>.journal: one fsynced line per set / delete, O(1) I/O per change
+    - load replays the journal over the snapshot, a torn last line is ignored
+    - every `compact_every` journal lines the dict is snapshotted atomically and the journal emptied
+    - batch(): many changes, one fsync
+    set / delete are idempotent, so replaying a journal already folded into the snapshot is harmless
+    """
+    def __init__(self, path, compact_every=1000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.journal_path = self.path.with_name(self.path.name + ".journal")
+        self.compact_every = compact_every
+        self.data = {}
+        self.journal = None
+        self.journal_lines = 0
+        self.batching = False
+        self.load()
+
+    # ---------------- read ----------------
+    def load(self):
+        self.data = {}
+        if self.path.exists():
+            try:
+                text = self.path.read_text(encoding="utf-8")
+                self.data = json.loads(text) if text.strip() else {}
+            except ValueError:
+                print(f"[Journal] Snapshot {self.path} unreadable, starting empty")
+
+        replayed = 0
+        torn = False
+        if self.journal_path.exists():
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # torn tail from a crash mid-append
+                        torn = True
+                        break
+                    if entry["op"] == "set":
+                        self.data[entry["key"]] = entry["value"]
+                    elif entry["op"] == "del":
+                        self.data.pop(entry["key"], None)
+                    replayed += 1
+        self.journal_lines = replayed
+        if torn or replayed >= self.compact_every:
+            self.compact()
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    # ---------------- write ----------------
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        self._append({"op": "set", "key": key, "value": value})
+
+    def __delitem__(self, key):
+        del self.data[key]
+        self._append({"op": "del", "key": key})
+
+    def _append(self, entry):
+        if self.journal is None:
+            self.journal = open(self.journal_path, "a", encoding="utf-8")
+        self.journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.journal_lines += 1
+        if not self.batching:
+            self.sync()
+
+    def sync(self):
+        """
+        make every journaled change durable, compact when the journal got long
+        """
+        if self.journal is not None:
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+        if self.journal_lines >= self.compact_every:
+            self.compact()
+
+    @contextlib.contextmanager
+    def batch(self):
+        self.batching = True
+        try:
+            yield self
+        finally:
+            self.batching = False
+            self.sync()
+
+    def compact(self):
+        atomic_write_json(self.path, self.data, indent=2)
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        atomic_write_text(self.journal_path, "")
+        self.journal_lines = 0
+
+    def close(self):
+        if self.journal is not None:
+            self.sync()
+            self.journal.close()
+            self.journal = None
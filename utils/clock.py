@@ -0,0 +1,82 @@
+import time
+import asyncio
+import threading
+
+
+class RealClock:
+    """
+    wall clock, what the live agent uses
+    """
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    async def asleep(self, seconds):
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+
+class ScaledClock:
+    """
+    virtual seconds run `scale` times faster than real ones
+    - sleep(10) with scale=10 returns after one real second
+    - everything reading this clock sees the same compressed time
+    """
+    def __init__(self, scale=10.0):
+        self.scale = scale
+        self.origin_monotonic = time.monotonic()
+        self.origin_time = time.time()
+
+    def time(self):
+        return self.origin_time + self.monotonic()
+
+    def monotonic(self):
+        return (time.monotonic() - self.origin_monotonic) * self.scale
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds / self.scale)
+
+    async def asleep(self, seconds):
+        if seconds > 0:
+            await asyncio.sleep(seconds / self.scale)
+
+
+class ManualClock:
+    """
+    stepped clock for simulations and benchmarks
+    - time only moves through advance() or sleep()
+    - sleep() advances the clock and returns at once, so paced code runs at full CPU speed
+    - two runs doing the same steps see exactly the same times
+    """
+    def __init__(self, start=0.0):
+        self.now = start
+        self.lock = threading.Lock()
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        with self.lock:
+            self.now += max(0.0, seconds)
+        return self.now
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    async def asleep(self, seconds):
+        self.advance(seconds)
+        # still a suspension point, other coroutines get their turn as with a real sleep
+        await asyncio.sleep(0)
+
+
+REAL_CLOCK = RealClock()
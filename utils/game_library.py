@@ -0,0 +1,245 @@
+import re
+import math
+import random
+import unicodedata
+
+from pathlib import Path
+import sys
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from configs.settings import GAME_DEDUP_THRESHOLD
+
+TOKENS = re.compile(r"\d+|[^\W\d_]+")
+# bracketed notes and edition suffixes are the same game
+NOISE = re.compile(r"[(\[（【].*?[)\]）】]|\b(?:game of the year|goty|ultimate|deluxe|complete|definitive)"
+                   r"(?: edition)?\b|\bedition\b")
+ROMAN = {"ii": "2", "iii": "3", "iv": "4", "v": "5", "vi": "6", "vii": "7", "viii": "8", "ix": "9"}
+
+# titles the llm writes in another language, normalized alias -> normalized title
+TITLE_ALIASES = {
+    "赛博朋克2077": "cyberpunk2077",
+    "賽博朋克2077": "cyberpunk2077",
+    "電馭叛客2077": "cyberpunk2077",
+    "寂静岭f": "silenthillf",
+    "沉默之丘f": "silenthillf",
+    "星露谷物语": "stardewvalley",
+    "星露谷物語": "stardewvalley",
+    "集合啦动物森友会": "animalcrossingnewhorizons",
+    "集合啦動物森友會": "animalcrossingnewhorizons",
+    "生化危机8村庄": "residentevilvillage",
+    "生化危機8村莊": "residentevilvillage",
+    "生化危机村庄": "residentevilvillage",
+}
+
+
+def title_tokens(title):
+    text = unicodedata.normalize("NFKC", str(title)).casefold()
+    text = NOISE.sub(" ", text)
+    return [ROMAN.get(token, token.lstrip("0") or "0") if token.isdigit() or token in ROMAN else token
+            for token in TOKENS.findall(text)]
+
+
+def normalize_title(title, aliases=TITLE_ALIASES):
+    """
+    the hash key of a title: NFKC, case, punctuation, spacing, edition notes and
+    roman numerals don't matter, known translations map to one title
+    """
+    key = "".join(title_tokens(title))
+    return aliases.get(key, key)
+
+
+def markers(title):
+    """
+    numbers and single letters of a title: "Silent Hill f" and "Silent Hill 2" differ only here,
+    near-duplicate titles must have the same markers
+    """
+    return frozenset(t for t in title_tokens(title) if t.isdigit() or (len(t) == 1 and t.isascii()))
+
+
+def bigrams(key):
+    if len(key) < 2:
+        return frozenset([key])
+    return frozenset(key[i:i + 2] for i in range(len(key) - 1))
+
+
+class GameLibrary:
+    """
+    games by normalized title, with inverted indexes
+    - titles / ids: hash indexes, add / remove / get are O(1) in the library size
+    - genres / peak hours: inverted indexes (casefolded genre, "morning".."night")
+    - near duplicates: Jaccard similarity of title bigrams >= threshold with the same markers,
+      the bigram index is split by (markers, bigram count): only buckets whose size can reach
+      the threshold are visited (length filter), and in each only the rarest bigrams of the
+      title are looked up (prefix filter), so a check touches a handful of titles, not the library
+    games keep insertion order, iterating yields the game dicts
+    """
+    def __init__(self, games=(), threshold=GAME_DEDUP_THRESHOLD, aliases=TITLE_ALIASES):
+        self.threshold = threshold
+        self.aliases = aliases
+        self.games = {}             # key -> game
+        self.ids = {}               # game id -> key
+        self.grams = {}             # key -> (bigrams, markers)
+        self.postings = {}          # (markers, bigram count) -> {bigram: set of keys}
+        self.genres = {}            # genre -> {key: None}, dicts keep insertion order
+        self.peak_hours = {}        # peak hour -> {key: None}
+        for game in games:
+            self.add(game)
+
+    def __len__(self):
+        return len(self.games)
+
+    def __iter__(self):
+        return iter(list(self.games.values()))
+
+    def __contains__(self, game):
+        return self.get(game) is not None
+
+    def key(self, game):
+        return normalize_title(game["title"] if isinstance(game, dict) else game, self.aliases)
+
+    # ---------------- lookup ----------------
+    def get(self, game):
+        """
+        the stored game for a title, game dict or id (exact after normalization), None if absent
+        """
+        if isinstance(game, dict) and game.get("id") in self.ids:
+            return self.games[self.ids[game["id"]]]
+        if isinstance(game, str) and game in self.ids:
+            return self.games[self.ids[game]]
+        return self.games.get(self.key(game))
+
+    def by_genre(self, genre):
+        return [self.games[k] for k in self.genres.get(str(genre).casefold(), ())]
+
+    def by_peak_hour(self, hour):
+        return [self.games[k] for k in self.peak_hours.get(str(hour).casefold(), ())]
+
+    def similar(self, title, threshold=None, limit=5):
+        """
+        [(score, game)] of stored titles at least `threshold` similar, best first
+        """
+        threshold = self.threshold if threshold is None else threshold
+        key = normalize_title(title, self.aliases)
+        if key in self.games:
+            return [(1.0, self.games[key])]
+        grams, marks = bigrams(key), markers(title)
+        n = len(grams)
+        candidates = set()
+        # length filter: |A & B| / |A | B| >= t needs t * n <= |B| <= n / t
+        for size in range(math.ceil(threshold * n - 1e-9), math.floor(n / threshold + 1e-9) + 1):
+            bucket = self.postings.get((marks, size))
+            if not bucket:
+                continue
+            # prefix filter: reaching the threshold takes `need` shared bigrams,
+            # so a match contains one of any n - need + 1 of ours, look up the rarest
+            need = max(1, math.ceil(threshold * (n + size) / (1 + threshold) - 1e-9))
+            rare = sorted(grams, key=lambda g: len(bucket.get(g, ())))[:n - need + 1]
+            for gram in rare:
+                candidates.update(bucket.get(gram, ()))
+        scored = []
+        for other in candidates:
+            other_grams = self.grams[other][0]
+            score = len(grams & other_grams) / len(grams | other_grams)
+            if score >= threshold:
+                scored.append((score, other))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [(score, self.games[other]) for score, other in scored[:limit]]
+
+    def find_duplicate(self, game):
+        """
+        the stored game this one duplicates (same id, same normalized title or a near duplicate title)
+        """
+        existing = self.get(game)
+        if existing is not None:
+            return existing
+        title = game["title"] if isinstance(game, dict) else game
+        similar = self.similar(title, limit=1)
+        return similar[0][1] if similar else None
+
+    # ---------------- update ----------------
+    def add(self, game, dedup=True):
+        """
+        :return: (True, game) when added, (False, stored game) for a duplicate
+        """
+        existing = self.find_duplicate(game) if dedup else self.get(game)
+        if existing is not None:
+            return False, existing
+        key = self.key(game)
+        self.games[key] = game
+        if game.get("id"):
+            self.ids[game["id"]] = key
+        grams, marks = bigrams(key), markers(game["title"])
+        self.grams[key] = (grams, marks)
+        bucket = self.postings.setdefault((marks, len(grams)), {})
+        for gram in grams:
+            bucket.setdefault(gram, set()).add(key)
+        for genre in self._genres(game):
+            self.genres.setdefault(genre, {})[key] = None
+        for hour in self._peak_hours(game):
+            self.peak_hours.setdefault(hour, {})[key] = None
+        return True, game
+
+    def remove(self, game):
+        """
+        :return: the removed game, None if it was not in the library
+        """
+        existing = self.get(game)
+        if existing is None:
+            return None
+        key = self.key(existing)
+        del self.games[key]
+        if existing.get("id"):
+            self.ids.pop(existing["id"], None)
+        grams, marks = self.grams.pop(key)
+        bucket = self.postings[(marks, len(grams))]
+        for gram in grams:
+            self._discard(bucket, gram, key)
+        if not bucket:
+            del self.postings[(marks, len(grams))]
+        for genre in self._genres(existing):
+            self._discard(self.genres, genre, key)
+        for hour in self._peak_hours(existing):
+            self._discard(self.peak_hours, hour, key)
+        return existing
+
+    @staticmethod
+    def _discard(index, name, key):
+        keys = index.get(name)
+        if keys is not None:
+            if isinstance(keys, dict):
+                keys.pop(key, None)
+            else:
+                keys.discard(key)
+            if not keys:
+                del index[name]
+
+    @staticmethod
+    def _genres(game):
+        genres = game.get("genre") or []
+        return {str(g).casefold() for g in ([genres] if isinstance(genres, str) else genres)}
+
+    @staticmethod
+    def _peak_hours(game):
+        hours = (game.get("stream_recommendation") or {}).get("peak_hours") or []
+        return {str(h).casefold() for h in ([hours] if isinstance(hours, str) else hours)}
+
+    def sample(self, count, exclude=(), rng=random):
+        """
+        up to `count` random games whose keys are not in `exclude`
+        """
+        keys = [key for key in self.games if key not in exclude]
+        return [self.games[key] for key in rng.sample(keys, min(count, len(keys)))]
+
+    def to_list(self):
+        return list(self.games.values())
+
+
+if __name__ == "__main__":
+    from data.game_list import game_list
+    library = GameLibrary(game_list["games"])
+    for title in ("Silent Hill F", "寂静岭f", "Silent Hill 2", "Stardew Vally", "Cyberpunk 2077"):
+        print(f"{title:<16} duplicate of: {(library.find_duplicate({'title': title}) or {}).get('title')}")
+    print(library.add({"title": "Cyberpunk 2077", "genre": ["RPG"]})[0],
+          library.add({"title": "赛博朋克2077", "genre": ["角色扮演"]})[0])
+    print([g["title"] for g in library.by_peak_hour("night")])
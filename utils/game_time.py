@@ -2,7 +2,13 @@ import time
 from datetime import datetime, timedelta
 import json
 import os
+import sys
 from pathlib import Path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.checkpoint import atomic_write_json
+from utils.clock import REAL_CLOCK
 
 class GameTime:
     """
@@ -10,11 +16,13 @@ class GameTime:
     - first start: first day's 8:00 am
     - real time acceleration: 1s = 20min(gametime)
     - save to json
+    - clock: where real time comes from (RealClock / ScaledClock / ManualClock)
     """
 
-    def __init__(self, speed_ratio=5, root_dir=None):
+    def __init__(self, speed_ratio=5, root_dir=None, clock=None):
         self.speed_ratio = speed_ratio
         self.root_dir = root_dir
+        self.clock = clock or REAL_CLOCK
         
         if not self.root_dir:
             parent_dir = Path(__file__).parent.parent
@@ -35,27 +43,39 @@ class GameTime:
             self.load()
         
         # record realtime at start time
-        self.last_real_time = time.time()
+        self.last_real_time = self.clock.time()
 
     def save(self):
         data = {
             "datetime": self.game_datetime.isoformat()
         }
-        with open(self.SAVE_FILE, "w") as f:
-            json.dump(data, f)
+        # temp file + fsync + rename, a crash never leaves a half written file
+        atomic_write_json(self.SAVE_FILE, data)
 
     def load(self):
-        with open(self.SAVE_FILE, "r") as f:
-            data = json.load(f)
-            self.game_datetime = datetime.fromisoformat(data["datetime"])
+        try:
+            with open(self.SAVE_FILE, "r") as f:
+                data = json.load(f)
+                self.game_datetime = datetime.fromisoformat(data["datetime"])
+        except (ValueError, KeyError):
+            print(f"[GameTime] {self.SAVE_FILE} unreadable, starting from the first day")
+            self.game_datetime = datetime(2077, 1, 1, 8, 0, 0)
 
     def update(self):
-        now = time.time()
+        now = self.clock.time()
         real_delta = now - self.last_real_time
         self.last_real_time = now
         game_minuts = real_delta * self.speed_ratio
         self.game_datetime += timedelta(minutes=game_minuts)
 
+    def advance_to(self, game_datetime):
+        """
+        jump straight to a game datetime (headless fast-forward), never backwards
+        """
+        if game_datetime > self.game_datetime:
+            self.game_datetime = game_datetime
+        self.last_real_time = self.clock.time()
+
     def now(self):
         return self.game_datetime
     
@@ -1,7 +1,12 @@
 import os
+import sys
 from pathlib import Path
 import json
 from datetime import datetime
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.mailbox import MailStore, LEGACY_DIRS
 
 class TodoListLoader:
     def __init__(self, root_path=None):
@@ -26,6 +31,9 @@ class TodoListLoader:
         return data
     
 class MailLoader:
+    """
+    mails of one game day from the mailbox store, rendered as text for the prompts
+    """
     def __init__(self, root_path=None):
         self.root_path = root_path
         if not self.root_path:
@@ -34,17 +42,29 @@ class MailLoader:
         else:
             self.list_dir = Path(root_path) / "data"
         self.list_dir.mkdir(parents=True, exist_ok=True)
+        self.store = MailStore.open(self.list_dir)
+        # mailbox directory name (any case) -> recipient
+        self.recipients = {name.lower(): recipient for name, recipient in LEGACY_DIRS.items()}
+
     def load(self, type, game_date):
-        date_str = game_date.strftime("%Y-%m-%d")
-        self.mail_file = self.list_dir/ type / f"{date_str}.txt"
-        if not self.mail_file.exists():
-            #raise FileNotFoundError(f"e-Mail not found: {self.mail_file}")
-            data = "None"
-        else:
-            with open(self.mail_file, "r", encoding="utf-8") as f:
-                data = f.read()
+        """
+        :param type: mailbox name, "Personal_Mailbox" or "Company_Mailbox"
+        """
+        recipient = self.recipients.get(type.lower())
+        if recipient is None:
+            raise ValueError(f"unknown mailbox: {type}")
+        mails = self.store.by_date(recipient, game_date)
+        if not mails:
+            return "None"
+        return "\n\n".join(self.render(mail) for mail in mails)
 
-        return data
+    @staticmethod
+    def render(mail):
+        body = mail["body"]
+        if isinstance(body, str):
+            return body
+        text = f"主旨：{mail['subject']}\n" if mail["subject"] else ""
+        return text + json.dumps(body.get("data", body), ensure_ascii=False, indent=2)
 
 if __name__ == "__main__":
     game_date = datetime(2077, 1, 1, 8, 0, 0)
@@ -0,0 +1,276 @@
+import re
+import json
+import sqlite3
+import threading
+from datetime import date, datetime
+from pathlib import Path
+
+import sys
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+DB_NAME = "mailbox.sqlite3"
+
+COMPANY = "company"     # Company_Mailbox: mails the vtuber sends to the company
+VTUBER = "vtuber"       # Personal_Mailbox: mails the company sends to the vtuber
+
+# legacy mailbox directories -> recipient
+LEGACY_DIRS = {
+    "Company_Mailbox": COMPANY,
+    "Personal_Mailbox": VTUBER,
+}
+
+DATE_IN_NAME = re.compile(r"(\d{4}-\d{2}-\d{2}|\d{8})")
+
+
+class MailStore:
+    """
+    sqlite mailbox shared by CompanyAgent, Executor and MailLoader
+    - one row per mail, indexed on recipient / type / game date / status
+    - send() is a single insert, no directory scan or file name probing
+    - unread_since(cursor) only reads rows after the last seen id
+    - ack() / delete() change a whole batch in one transaction
+    - import_legacy() migrates the old Company_Mailbox / Personal_Mailbox files once
+    mail = dict: id, recipient, sender, type, game_date, timestamp, status, subject, body
+    (body is the decoded JSON object, or the raw text for plain text mails)
+    """
+    _stores = {}
+    _stores_lock = threading.Lock()
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS mails ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "recipient TEXT NOT NULL, sender TEXT, type TEXT, "
+            "game_date TEXT, timestamp TEXT, "
+            "status TEXT NOT NULL DEFAULT 'unread', "
+            "subject TEXT, body TEXT, is_json INTEGER NOT NULL DEFAULT 0, "
+            "source TEXT UNIQUE)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_mails_unread ON mails(recipient, status, id)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_mails_type ON mails(recipient, type)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_mails_date ON mails(recipient, game_date)")
+        self.db.commit()
+
+    @classmethod
+    def open(cls, data_dir, migrate=True):
+        """
+        one store per data dir and process, legacy mail directories are imported on first open
+        """
+        db_path = (Path(data_dir) / DB_NAME).resolve()
+        with cls._stores_lock:
+            store = cls._stores.get(db_path)
+            if store is None:
+                store = cls(db_path)
+                if migrate:
+                    store.import_legacy(data_dir)
+                cls._stores[db_path] = store
+            return store
+
+    # ---------------- write ----------------
+    INSERT = (
+        "INSERT OR IGNORE INTO mails "
+        "(recipient, body, is_json, type, subject, sender, timestamp, game_date, source) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+
+    @staticmethod
+    def _values(recipient, body, mail_type=None, subject=None, sender=None,
+                timestamp=None, game_date=None, source=None):
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        if isinstance(game_date, datetime):
+            game_date = game_date.strftime("%Y-%m-%d")
+        if game_date is None and timestamp:
+            game_date = timestamp[:10]
+        is_json = not isinstance(body, str)
+        text = json.dumps(body, ensure_ascii=False) if is_json else body
+        return (recipient, text, int(is_json), mail_type, subject, sender, timestamp, game_date, source)
+
+    def send(self, recipient, body, mail_type=None, subject=None, sender=None,
+             timestamp=None, game_date=None, source=None):
+        """
+        enqueue one mail, return its id
+        :param timestamp: game datetime (or string) the mail was sent
+        :param game_date: game day the mail belongs to, defaults to the timestamp's date
+        """
+        values = self._values(recipient, body, mail_type, subject, sender, timestamp, game_date, source)
+        with self.lock, self.db:
+            cursor = self.db.execute(self.INSERT, values)
+            return cursor.lastrowid if cursor.rowcount else None
+
+    def send_many(self, mails):
+        """
+        enqueue a batch in one transaction, mails = [dict of send() keyword arguments], return ids
+        """
+        rows = [self._values(**mail) for mail in mails]
+        ids = []
+        with self.lock, self.db:
+            for values in rows:
+                ids.append(self.db.execute(self.INSERT, values).lastrowid)
+        return ids
+
+    def ack(self, ids):
+        """
+        mark a batch of mails as handled, all or nothing
+        """
+        return self._update_status(ids, "acked")
+
+    def mark_read(self, ids):
+        return self._update_status(ids, "read")
+
+    def _update_status(self, ids, status):
+        ids = list(ids)
+        if not ids:
+            return 0
+        with self.lock, self.db:
+            return self.db.executemany(
+                "UPDATE mails SET status = ? WHERE id = ?", [(status, i) for i in ids]
+            ).rowcount
+
+    def delete(self, ids):
+        ids = list(ids)
+        if not ids:
+            return 0
+        with self.lock, self.db:
+            return self.db.executemany("DELETE FROM mails WHERE id = ?", [(i,) for i in ids]).rowcount
+
+    # ---------------- read ----------------
+    def _query(self, where, params, limit=None):
+        sql = (
+            "SELECT id, recipient, sender, type, game_date, timestamp, status, subject, body, is_json "
+            f"FROM mails WHERE {where} ORDER BY id"
+        )
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self.lock:
+            rows = self.db.execute(sql, params).fetchall()
+        return [self._row_to_mail(row) for row in rows]
+
+    @staticmethod
+    def _row_to_mail(row):
+        mail_id, recipient, sender, mail_type, game_date, timestamp, status, subject, body, is_json = row
+        return {
+            "id": mail_id,
+            "recipient": recipient,
+            "sender": sender,
+            "type": mail_type,
+            "game_date": game_date,
+            "timestamp": timestamp,
+            "status": status,
+            "subject": subject,
+            "body": json.loads(body) if is_json else body,
+        }
+
+    def unread_since(self, recipient, cursor=0, mail_type=None, limit=None):
+        """
+        unread mails with id > cursor, oldest first; pass the last id back as the next cursor
+        """
+        where = "recipient = ? AND status = 'unread' AND id > ?"
+        params = [recipient, cursor]
+        if mail_type:
+            where += " AND type = ?"
+            params.append(mail_type)
+        return self._query(where, params, limit)
+
+    def by_date(self, recipient, game_date, mail_type=None):
+        # date / datetime -> "YYYY-MM-DD", no reliance on sqlite3's deprecated date adapter
+        if isinstance(game_date, (date, datetime)):
+            game_date = game_date.strftime("%Y-%m-%d")
+        where = "recipient = ? AND game_date = ?"
+        params = [recipient, game_date]
+        if mail_type:
+            where += " AND type = ?"
+            params.append(mail_type)
+        return self._query(where, params)
+
+    def count(self, recipient=None, status=None):
+        where, params = [], []
+        if recipient:
+            where.append("recipient = ?")
+            params.append(recipient)
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        sql = "SELECT COUNT(*) FROM mails" + (" WHERE " + " AND ".join(where) if where else "")
+        with self.lock:
+            return self.db.execute(sql, params).fetchone()[0]
+
+    # ---------------- migration ----------------
+    def import_legacy(self, data_dir):
+        """
+        import data/Company_Mailbox and data/Personal_Mailbox (.json and .txt files)
+        - every file is imported once (keyed on its path), re-running is a no-op
+        - the files are left in place
+        """
+        imported = {}
+        for dirname, recipient in LEGACY_DIRS.items():
+            mail_dir = Path(data_dir) / dirname
+            count = 0
+            if mail_dir.is_dir():
+                for file in sorted(mail_dir.iterdir()):
+                    if file.suffix not in (".json", ".txt") or not file.is_file():
+                        continue
+                    if self.import_file(file, recipient) is not None:
+                        count += 1
+            imported[dirname] = count
+        if any(imported.values()):
+            print(f"[Mailbox] Imported legacy mails: {imported}")
+        return imported
+
+    def import_file(self, file, recipient):
+        source = str(file.resolve())
+        with self.lock:
+            if self.db.execute("SELECT 1 FROM mails WHERE source = ?", (source,)).fetchone():
+                return None
+        text = file.read_text(encoding="utf-8")
+        match = DATE_IN_NAME.search(file.stem)
+        game_date = None
+        if match:
+            raw = match.group(1).replace("-", "")
+            game_date = f"{raw[:4]}-{raw[4:6]}-{raw[6:]}"
+
+        if file.suffix == ".json":
+            try:
+                body = json.loads(text)
+            except ValueError:
+                print(f"[Mailbox] Skip unreadable mail {file}")
+                return None
+            if isinstance(body, dict):
+                return self.send(
+                    recipient, body,
+                    mail_type=body.get("type"),
+                    subject=body.get("subject"),
+                    timestamp=body.get("timestamp"),
+                    game_date=game_date,
+                    source=source,
+                )
+            # a JSON string or list is not a mail object, keep it as a text mail
+            if isinstance(body, str):
+                text = body
+
+        # plain text mails: the vtuber's project mails / the company's daily notes
+        return self.send(
+            recipient, text,
+            mail_type="project" if recipient == COMPANY else "notice",
+            game_date=game_date,
+            source=str(file.resolve()),
+        )
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+if __name__ == "__main__":
+    # python utils/mailbox.py [data_dir]: migrate the legacy mailbox directories
+    data_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else project_root / "data"
+    store = MailStore.open(data_dir)
+    print(f"[Mailbox] {store.db_path}: company={store.count(COMPANY)} vtuber={store.count(VTUBER)} "
+          f"unread={store.count(status='unread')}")
@@ -1,31 +1,272 @@
 import socket
 import json
+import sys
+from pathlib import Path
+import selectors
 import threading
+from collections import deque
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.wire_format import CODECS, JsonLineCodec, negotiate
+
+# only the latest message of these events matters, an unsent older one is replaced
+COALESCE_EVENTS = {"time_update", "background"}
+
+
+class UnityClient:
+    """
+    one attached Unity viewer: bounded outbound queue + counters
+    - codec: newline JSON until the client sends a hello asking for another format
+    """
+    def __init__(self, sock, addr):
+        self.sock = sock
+        self.addr = addr
+        self.codec = CODECS[JsonLineCodec.name]
+        self.inbox = b""
+        self.queue = deque()            # [coalesce_key, payload bytes]
+        self.pending = {}               # coalesce_key -> queued entry
+        self.buffer = b""               # message currently being written
+        self.bytes_sent = 0
+        self.messages_sent = 0
+        self.coalesced = 0
+
+    def enqueue(self, key, payload):
+        if key is not None and key in self.pending:
+            self.pending[key][1] = payload
+            self.coalesced += 1
+            return
+        entry = [key, payload]
+        self.queue.append(entry)
+        if key is not None:
+            self.pending[key] = entry
+
+    def depth(self):
+        return len(self.queue) + (1 if self.buffer else 0)
+
+    def stats(self):
+        return {
+            "addr": f"{self.addr[0]}:{self.addr[1]}",
+            "format": self.codec.name,
+            "queue_depth": self.depth(),
+            "bytes_sent": self.bytes_sent,
+            "messages_sent": self.messages_sent,
+            "coalesced": self.coalesced,
+        }
+
 
 class UnityBridge:
-    def __init__(self, host="127.0.0.1", port=50007):
+    """
+    non-blocking TCP server for Unity viewers:
+    - any number of clients, they may connect / leave / reconnect at any time
+    - send() only queues, a background selector thread does the socket writes
+    - per-client bounded queue, superseded time/background events are coalesced,
+      a client whose queue overflows is disconnected (it can reconnect)
+    - a new client first receives the latest coalesced state (time, background)
+    - wire format is negotiated per client: a client may send
+      {"hello": {"formats": ["bin1+msgpack", "bin1", "json"]}} and gets {"event": "format", ...}
+      back (always as a JSON line), later messages use the chosen format
+    """
+    def __init__(self, host="127.0.0.1", port=50007, max_queue=256):
         self.host = host
         self.port = port
-        self.conn = None
+        self.max_queue = max_queue
         self.last_background_state = None
+        # executor tasks send from the llm runtime thread, queues are shared with the io thread
+        self.send_lock = threading.Lock()
+        self.clients = {}               # socket -> UnityClient
+        self.latest = {}                # coalesce_key -> message, replayed to new clients
+        self.connected = threading.Event()
+        self.disconnected = 0
+        self.dropped_slow = 0
+
         self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.server.bind((self.host, self.port))
-        self.server.listen(1)
+        self.server.listen(16)
+        self.server.setblocking(False)
+
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.server, selectors.EVENT_READ, "accept")
+        self.wake_r, self.wake_w = socket.socketpair()
+        self.wake_r.setblocking(False)
+        self.selector.register(self.wake_r, selectors.EVENT_READ, "wake")
+        self.running = True
+        self.io_thread = threading.Thread(target=self._io_loop, name=f"unity-bridge-{port}", daemon=True)
+        self.io_thread.start()
 
         print(f"[Python] UnityBridge server started at {host}:{port}")
-        #threading.Thread(target=self.wait_for_unity, daemon=True).start()
 
-    def wait_for_unity(self):
+    @property
+    def conn(self):
+        """
+        first attached client socket or None (kept for callers that check for a viewer)
+        """
+        with self.send_lock:
+            return next(iter(self.clients), None)
+
+    def wait_for_unity(self, timeout=None):
         print("[Python] Waiting for Unity connection...")
-        self.conn, addr = self.server.accept()
-        print(f"[Python] Unity connected from: {addr}")
+        if self.connected.wait(timeout):
+            print(f"[Python] Unity connected, {len(self.clients)} client(s)")
+            return True
+        return False
 
     def send(self, data:dict):
-        if self.conn is None:
+        key = data.get("event") if data.get("event") in COALESCE_EVENTS else None
+        with self.send_lock:
+            if key is not None:
+                self.latest[key] = data
+            if not self.clients:
+                return
+            slow = []
+            encoded = {}            # encode once per wire format
+            for client in self.clients.values():
+                payload = encoded.get(client.codec.name)
+                if payload is None:
+                    payload = encoded[client.codec.name] = client.codec.encode(data)
+                client.enqueue(key, payload)
+                if client.depth() > self.max_queue:
+                    slow.append(client)
+            for client in slow:
+                print(f"[Python] Unity client {client.addr} too slow ({client.depth()} queued), disconnecting")
+                self.dropped_slow += 1
+                self._drop(client)
+        self._wake()
+
+    def _wake(self):
+        try:
+            self.wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass
+
+    # ---------------- io thread ----------------
+    def _io_loop(self):
+        while self.running:
+            with self.send_lock:
+                for client in self.clients.values():
+                    events = selectors.EVENT_READ
+                    if client.depth():
+                        events |= selectors.EVENT_WRITE
+                    self.selector.modify(client.sock, events, client)
+            for key, mask in self.selector.select(timeout=1.0):
+                if key.data == "accept":
+                    self._accept()
+                elif key.data == "wake":
+                    try:
+                        while self.wake_r.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                else:
+                    client = key.data
+                    if mask & selectors.EVENT_READ:
+                        self._read(client)
+                    if mask & selectors.EVENT_WRITE:
+                        self._write(client)
+
+    def _accept(self):
+        try:
+            sock, addr = self.server.accept()
+        except (BlockingIOError, OSError):
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client = UnityClient(sock, addr)
+        with self.send_lock:
+            for key, data in self.latest.items():
+                client.enqueue(key, client.codec.encode(data))
+            self.clients[sock] = client
+            self.selector.register(sock, selectors.EVENT_READ, client)
+        self.connected.set()
+        print(f"[Python] Unity connected from: {addr}")
+
+    def _read(self, client):
+        try:
+            data = client.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            with self.send_lock:
+                self._drop(client)
+            return
+
+        client.inbox += data
+        while b"\n" in client.inbox:
+            line, client.inbox = client.inbox.split(b"\n", 1)
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(message, dict) and "hello" in message:
+                self._negotiate(client, message["hello"])
+
+    def _negotiate(self, client, hello):
+        codec = negotiate(hello.get("formats") if isinstance(hello, dict) else None)
+        with self.send_lock:
+            ack = client.codec.encode({"event": "format", "format": codec.name})
+            client.enqueue(None, ack)
+            # nothing queued before the ack may be replaced by a message in the new format
+            client.pending.clear()
+            client.codec = codec
+        print(f"[Python] Unity client {client.addr} uses wire format: {codec.name}")
+
+    def _write(self, client):
+        with self.send_lock:
+            if not client.buffer and client.queue:
+                key, payload = client.queue.popleft()
+                if key is not None:
+                    client.pending.pop(key, None)
+                client.buffer = payload
+                client.messages_sent += 1
+            if not client.buffer:
+                return
+            try:
+                sent = client.sock.send(client.buffer)
+            except BlockingIOError:
+                return
+            except OSError:
+                self._drop(client)
+                return
+            client.bytes_sent += sent
+            client.buffer = client.buffer[sent:]
+
+    def _drop(self, client):
+        # caller holds send_lock
+        if self.clients.pop(client.sock, None) is None:
             return
-        
-        msg = json.dumps(data) + "\n"
-        self.conn.sendall(msg.encode("utf-8"))
+        try:
+            self.selector.unregister(client.sock)
+        except (KeyError, ValueError):
+            pass
+        client.sock.close()
+        self.disconnected += 1
+        if not self.clients:
+            self.connected.clear()
+        print(f"[Python] Unity client {client.addr} disconnected")
+
+    def stats(self):
+        with self.send_lock:
+            return {
+                "clients": [c.stats() for c in self.clients.values()],
+                "disconnected": self.disconnected,
+                "dropped_slow": self.dropped_slow,
+            }
+
+    def close(self):
+        self.running = False
+        self._wake()
+        self.io_thread.join(timeout=2)
+        with self.send_lock:
+            for client in list(self.clients.values()):
+                self._drop(client)
+        self.selector.close()
+        self.server.close()
+        self.wake_r.close()
+        self.wake_w.close()
 
     def send_time(self, time_str:str):
         self.send({
@@ -55,12 +296,34 @@ class UnityBridge:
         }
         self.send(message)
 
-    def send_cover_image(self, url:str, game_time):
+    def send_cover_image(self, url:str, game_time, asset=None):
+        """
+        asset: stored copy from utils/asset_store, Unity loads path (or a thumbnail) from disk
+        instead of the remote url, which expires
+        """
         game_time_str = game_time.strftime("%Y-%m-%d")
-        self.send({
+        message = {
         "event": "cover_image",
         "url": url,
         "game_time": game_time_str
+        }
+        if asset is not None:
+            message["sha256"] = asset["sha256"]
+            message["path"] = asset["path"]
+            message["thumbnails"] = asset["thumbnails"]
+        self.send(message)
+
+    def send_asset(self, asset, data, variant="full"):
+        """
+        image bytes for Unity clients on another machine, sent before the message that uses them;
+        bin1 clients get the raw bytes, JSON clients base64
+        """
+        self.send({
+            "event": "asset",
+            "sha256": asset["sha256"],
+            "variant": variant,
+            "mime": asset["mime"] if variant == "full" else "image/jpeg",
+            "data": data
         })
 
     def send_stream_start(self,game_time):
@@ -71,11 +334,26 @@ class UnityBridge:
             "game_time": game_time_str
         })
 
-    def send_stream_talk(self,talk):
-        self.send({
+    def send_stream_talk(self,talk,talk_id=None):
+        message = {
             "event": "stream",
             "action": "talk",
             "talk": talk
+        }
+        if talk_id is not None:
+            # the finished line, replaces the talk_delta text shown so far
+            message["talk_id"] = talk_id
+        self.send(message)
+
+    def send_talk_delta(self, talk_id, seq, delta):
+        """
+        partial talk while it is generated, Unity appends deltas of one talk_id in seq order
+        """
+        self.send({
+            "event": "talk_delta",
+            "talk_id": talk_id,
+            "seq": seq,
+            "delta": delta
         })
 
     def send_stream_end(self):
@@ -116,3 +394,46 @@ class UnityBridge:
                     "mode": mode,
                 })
                 print(f"[Python] Background changed to: {mode}")
+
+
+class NullUnityBridge(UnityBridge):
+    """
+    headless sink: same interface as UnityBridge, no socket, messages are only counted
+    """
+    def __init__(self):
+        self.host = None
+        self.port = None
+        self.clients = {}
+        self.last_background_state = None
+        self.send_lock = threading.Lock()
+        self.sent = 0
+
+    def wait_for_unity(self, timeout=None):
+        return True
+
+    def stats(self):
+        return {"clients": [], "sent": self.sent}
+
+    def close(self):
+        pass
+
+    def send(self, data:dict):
+        with self.send_lock:
+            self.sent += 1
+
+
+class RecordingUnityBridge(NullUnityBridge):
+    """
+    headless sink that keeps every message (or the last `limit` ones) for inspection
+    """
+    def __init__(self, limit=None):
+        super().__init__()
+        self.messages = deque(maxlen=limit)
+
+    def send(self, data:dict):
+        with self.send_lock:
+            self.sent += 1
+            self.messages.append(data)
+
+    def events(self, event):
+        return [m for m in self.messages if m.get("event") == event]
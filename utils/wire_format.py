@@ -0,0 +1,162 @@
+import json
+import base64
+import struct
+
+try:
+    import msgpack
+except ImportError:     # without it the server only offers bin1 (JSON bodies)
+    msgpack = None
+
+
+class JsonLineCodec:
+    """
+    original protocol: one JSON object per line
+    """
+    name = "json"
+
+    def encode(self, data: dict) -> bytes:
+        if isinstance(data.get("data"), bytes):
+            # asset bytes can't go into a JSON line as they are
+            data = dict(data, data=base64.b64encode(data["data"]).decode("ascii"), encoding="base64")
+        return (json.dumps(data) + "\n").encode("utf-8")
+
+    def decoder(self):
+        return JsonLineDecoder()
+
+
+class JsonLineDecoder:
+    def __init__(self):
+        self.buffer = b""
+
+    def feed(self, chunk: bytes):
+        self.buffer += chunk
+        messages = []
+        while b"\n" in self.buffer:
+            line, self.buffer = self.buffer.split(b"\n", 1)
+            if line.strip():
+                messages.append(json.loads(line))
+        return messages
+
+
+# ---------------- binary frames ----------------
+# frame = uint32 body length (big endian) | uint8 frame type | body
+FRAME_HEADER = struct.Struct(">IB")
+
+TYPE_JSON = 0           # body: utf-8 JSON
+TYPE_MSGPACK = 1        # body: msgpack
+TYPE_TIME = 2           # body: hour, minute
+TYPE_BACKGROUND = 3     # body: mode index
+TYPE_ACTION = 4         # body: (event, action) index, for messages without payload
+TYPE_ASSET = 5          # body: uint32 JSON header length | JSON header | raw bytes (data)
+
+TIME_BODY = struct.Struct(">BB")
+INDEX_BODY = struct.Struct(">B")
+ASSET_HEADER = struct.Struct(">I")
+
+BACKGROUND_MODES = ["day", "evening", "night", "rainday", "rainnight"]
+BARE_ACTIONS = [("tweet", "show"), ("tweet", "hide"), ("stream", "end")]
+
+
+class BinaryCodec:
+    """
+    length-prefixed frames, fixed struct layout for the hot events
+    (time_update and background are sent every tick), JSON bodies for the rest
+    the body encoding is part of the format name, a client only gets msgpack
+    frames when it asked for "bin1+msgpack"
+    """
+    name = "bin1"
+    use_msgpack = False
+
+    def encode(self, data: dict) -> bytes:
+        frame_type, body = self._encode_body(data)
+        return FRAME_HEADER.pack(len(body), frame_type) + body
+
+    def _encode_body(self, data):
+        event = data.get("event")
+        if event == "time_update" and len(data) == 2:
+            hh, _, mm = str(data.get("time", "")).partition(":")
+            if hh.isdigit() and mm.isdigit() and len(mm) == 2 and int(hh) < 24 and int(mm) < 60 \
+                    and f"{int(hh):02d}:{mm}" == data["time"]:
+                return TYPE_TIME, TIME_BODY.pack(int(hh), int(mm))
+        elif event == "background" and len(data) == 2 and data.get("mode") in BACKGROUND_MODES:
+            return TYPE_BACKGROUND, INDEX_BODY.pack(BACKGROUND_MODES.index(data["mode"]))
+        elif len(data) == 2 and (event, data.get("action")) in BARE_ACTIONS:
+            return TYPE_ACTION, INDEX_BODY.pack(BARE_ACTIONS.index((event, data["action"])))
+        elif isinstance(data.get("data"), bytes):
+            header = json.dumps({k: v for k, v in data.items() if k != "data"}, ensure_ascii=False).encode("utf-8")
+            return TYPE_ASSET, ASSET_HEADER.pack(len(header)) + header + data["data"]
+
+        if self.use_msgpack:
+            return TYPE_MSGPACK, msgpack.packb(data, use_bin_type=True)
+        return TYPE_JSON, json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+    def decoder(self):
+        return BinaryDecoder()
+
+
+class MsgpackBinaryCodec(BinaryCodec):
+    """
+    bin1 frames with msgpack bodies instead of JSON
+    """
+    name = "bin1+msgpack"
+    use_msgpack = True
+
+
+class BinaryDecoder:
+    def __init__(self):
+        self.buffer = b""
+
+    def feed(self, chunk: bytes):
+        self.buffer += chunk
+        messages = []
+        while len(self.buffer) >= FRAME_HEADER.size:
+            length, frame_type = FRAME_HEADER.unpack_from(self.buffer)
+            end = FRAME_HEADER.size + length
+            if len(self.buffer) < end:
+                break
+            body = self.buffer[FRAME_HEADER.size:end]
+            self.buffer = self.buffer[end:]
+            messages.append(decode_body(frame_type, body))
+        return messages
+
+
+def decode_body(frame_type, body):
+    if frame_type == TYPE_TIME:
+        hh, mm = TIME_BODY.unpack(body)
+        return {"event": "time_update", "time": f"{hh:02d}:{mm:02d}"}
+    if frame_type == TYPE_BACKGROUND:
+        return {"event": "background", "mode": BACKGROUND_MODES[INDEX_BODY.unpack(body)[0]]}
+    if frame_type == TYPE_ACTION:
+        event, action = BARE_ACTIONS[INDEX_BODY.unpack(body)[0]]
+        return {"event": event, "action": action}
+    if frame_type == TYPE_ASSET:
+        (length,) = ASSET_HEADER.unpack_from(body)
+        start = ASSET_HEADER.size + length
+        message = json.loads(body[ASSET_HEADER.size:start].decode("utf-8"))
+        message["data"] = bytes(body[start:])
+        return message
+    if frame_type == TYPE_MSGPACK:
+        if msgpack is None:
+            raise ValueError("msgpack frame received but msgpack is not installed")
+        return msgpack.unpackb(body, raw=False)
+    if frame_type == TYPE_JSON:
+        return json.loads(body.decode("utf-8"))
+    raise ValueError(f"unknown frame type {frame_type}")
+
+
+CODECS = {
+    JsonLineCodec.name: JsonLineCodec(),
+    BinaryCodec.name: BinaryCodec(),
+}
+if msgpack is not None:
+    CODECS[MsgpackBinaryCodec.name] = MsgpackBinaryCodec()
+
+
+def negotiate(offered):
+    """
+    pick the first format the client offers that we support, JSON lines otherwise
+    """
+    for name in offered or []:
+        if name in CODECS:
+            return CODECS[name]
+    return CODECS[JsonLineCodec.name]